@@ -0,0 +1,651 @@
+# -*- coding: utf-8 -*-
+"""変換パイプラインのベンチマーク.
+
+Benchmarks for the conversion pipeline.
+
+合成した文書ツリー（小さなファイル多数、巨大ファイル少数、図の多い文書、
+深いフォルダ、除外パターン多数）を生成し、convert_folder・should_exclude・
+build_metadata_args・ローカルHTTPサーバの処理時間を計測します。結果は
+JSONに保存し、以前の結果（ベースライン）と比較して性能の劣化を検出できます。
+
+既定では pandoc・mmdc・java を小さな代替スクリプトに置き換えるため、
+外部ツールやネットワークなしで実行できます（代替スクリプトはPOSIX環境のみ）。
+
+Usage::
+
+    python benchmark.py --output bench.json
+    python benchmark.py --compare bench.json --tolerance 0.25
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from __version__ import __version__
+from pandoc_service import PandocService, get_app_dir
+
+BENCHMARK_FORMAT_VERSION = 1
+
+# シナリオ名 -> 説明
+SCENARIOS = {
+    "small_files": "many small Markdown files",
+    "huge_files": "a few very large Markdown files",
+    "diagrams": "documents with many Mermaid/PlantUML blocks",
+    "deep_folders": "deeply nested folders",
+    "excludes": "many exclude patterns and excluded folders",
+}
+
+# 代替ツールのスクリプト（{python} は実行中のインタプリタ）
+FAKE_PANDOC = '''#!{python}
+"""pandoc の代替: 入力を出力にコピーし、図の描画コマンドを起動する."""
+import os, re, subprocess, sys, tempfile
+args = sys.argv[1:]
+if not args or args[0] == "--version":
+    print("pandoc 0.0 (benchmark stand-in)")
+    sys.exit(0)
+source = args[0]
+output = args[args.index("-o") + 1]
+filters = [a for f, a in zip(args, args[1:]) if f == "--lua-filter"]
+with open(source, "rb") as f:
+    data = f.read()
+if any(os.path.basename(p) == "diaglam.lua" for p in filters):
+    text = data.decode("utf-8", "replace")
+    blocks = re.findall(r"```(mermaid|plantuml)\\n(.*?)```", text, re.S)
+    work = tempfile.mkdtemp(prefix="bench-pandoc-")
+    mermaid = [body for kind, body in blocks if kind == "mermaid"]
+    if len(mermaid) >= 2:
+        batch = os.path.join(work, "batch.md")
+        with open(batch, "w", encoding="utf-8") as f:
+            for body in mermaid:
+                f.write("```mermaid\\n" + body + "```\\n\\n")
+        subprocess.run(["mmdc", "-i", batch, "-o",
+                        os.path.join(work, "out.md"), "-e", "svg"],
+                       check=False)
+    else:
+        for i, body in enumerate(mermaid):
+            path = os.path.join(work, f"m{{i}}.mmd")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(body)
+            subprocess.run(["mmdc", "-i", path, "-o", path + ".svg"],
+                           check=False)
+    java = os.environ.get("JAVA_PATH", "java")
+    for i, (kind, body) in enumerate(blocks):
+        if kind != "plantuml":
+            continue
+        path = os.path.join(work, f"p{{i}}.puml")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        subprocess.run([java, "-jar", "plantuml.jar", "-tsvg", path],
+                       check=False)
+with open(output, "wb") as f:
+    f.write(data)
+'''
+
+FAKE_MMDC = '''#!{python}
+"""mmdc の代替: 図ごとに最小のSVGを書き出す."""
+import sys
+args = sys.argv[1:]
+source = args[args.index("-i") + 1]
+output = args[args.index("-o") + 1]
+SVG = '<svg xmlns="http://www.w3.org/2000/svg" id="my-svg"></svg>'
+if source.endswith(".md"):
+    with open(source, encoding="utf-8") as f:
+        count = f.read().count("```mermaid")
+    base = output[:-3] if output.endswith(".md") else output
+    for i in range(1, count + 1):
+        with open(f"{{base}}-{{i}}.svg", "w", encoding="utf-8") as f:
+            f.write(SVG)
+else:
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(SVG)
+'''
+
+FAKE_JAVA = '''#!{python}
+"""java -jar plantuml.jar の代替: 入力の隣に最小のSVGを書き出す."""
+import os, sys
+args = sys.argv[1:]
+if "-version" in args:
+    print("openjdk version 0 (benchmark stand-in)", file=sys.stderr)
+    sys.exit(0)
+for path in args:
+    if path.endswith(".puml"):
+        with open(os.path.splitext(path)[0] + ".svg", "w",
+                  encoding="utf-8") as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg"></svg>')
+'''
+
+MERMAID_BLOCK = "```mermaid\ngraph TD\n  A{n}[Start] --> B{n}[End]\n```\n"
+PLANTUML_BLOCK = "```plantuml\n@startuml\nAlice -> Bob: hello {n}\n@enduml\n```\n"
+
+
+def make_paragraph(rng: random.Random, words: int) -> str:
+    """ランダムな単語からなる段落を作成する."""
+    vocabulary = ("pandoc", "filter", "diagram", "output", "folder", "lorem",
+                  "ipsum", "dolor", "amet", "document", "section", "value")
+    return " ".join(rng.choice(vocabulary) for _ in range(words)) + "\n\n"
+
+
+def make_document(rng: random.Random, size: int, mermaid: int = 0,
+                  plantuml: int = 0) -> str:
+    """見出し・段落・図を含む Markdown 文書を作成する.
+
+    Parameters
+    ----------
+    rng : random.Random
+        乱数生成器（結果を再現できるよう固定シードで作成する）
+    size : int
+        本文のおよそのバイト数
+    mermaid : int, optional
+        Mermaidブロックの数
+    plantuml : int, optional
+        PlantUMLブロックの数
+
+    Returns
+    -------
+    str
+        Markdown 文書
+    """
+    parts = ["---\ntitle: Benchmark\n---\n\n"]
+    length = 0
+    section = 0
+    while length < size:
+        section += 1
+        paragraph = make_paragraph(rng, 60)
+        parts.append(f"## Section {section}\n\n{paragraph}")
+        length += len(paragraph) + 16
+    for n in range(mermaid):
+        parts.append(MERMAID_BLOCK.format(n=n))
+    for n in range(plantuml):
+        parts.append(PLANTUML_BLOCK.format(n=n))
+    return "".join(parts)
+
+
+def generate_tree(root: Path, scenario: str, scale: float = 1.0,
+                  seed: int = 0) -> dict:
+    """シナリオに応じた合成文書ツリーを作成する.
+
+    Generate a synthetic document tree for a scenario.
+
+    Parameters
+    ----------
+    root : Path
+        作成先のフォルダ
+    scenario : str
+        SCENARIOS のいずれか
+    scale : float, optional
+        ファイル数・サイズの倍率
+    seed : int, optional
+        乱数のシード
+
+    Returns
+    -------
+    dict
+        {"files": 作成したファイル数, "bytes": 合計バイト数,
+         "exclude_patterns": 除外パターンのリスト}
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario: {scenario}")
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    files = []
+    exclude_patterns = []
+
+    def count(n):
+        return max(1, int(n * scale))
+
+    def write(relative, text):
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        files.append(path)
+
+    if scenario == "small_files":
+        for i in range(count(400)):
+            write(Path(f"dir{i % 8}") / f"note{i}.md",
+                  make_document(rng, 800))
+    elif scenario == "huge_files":
+        for i in range(count(3)):
+            write(f"book{i}.md", make_document(rng, 2 * 1024 * 1024))
+    elif scenario == "diagrams":
+        for i in range(count(40)):
+            write(f"diagrams{i}.md",
+                  make_document(rng, 2000, mermaid=5, plantuml=5))
+    elif scenario == "deep_folders":
+        depth = 6
+        directories = [Path(".")]
+        for _ in range(depth):
+            directories = [d / name for d in directories for name in "ab"]
+            for directory in directories[:count(len(directories))]:
+                for i in range(2):
+                    write(directory / f"page{i}.md", make_document(rng, 500))
+    else:  # excludes
+        exclude_patterns = [f"*.tmp{i}" for i in range(40)]
+        exclude_patterns += ["node_modules", ".git", "__pycache__",
+                             "draft_*", "*_backup", "build"]
+        for i in range(count(300)):
+            name = rng.choice(["doc", "draft_doc", "doc_backup", "page"])
+            write(Path(f"part{i % 10}") / f"{name}{i}.md",
+                  make_document(rng, 500))
+            if i % 5 == 0:
+                write(Path(f"part{i % 10}") / f"cache{i}.tmp{i % 40}", "x")
+        for excluded in ("node_modules", ".git", "build"):
+            for i in range(count(100)):
+                write(Path(excluded) / f"sub{i % 10}" / f"file{i}.md", "# x")
+
+    return {
+        "files": len(files),
+        "bytes": sum(path.stat().st_size for path in files),
+        "exclude_patterns": exclude_patterns,
+    }
+
+
+def install_fake_tools(bin_dir: Path) -> dict:
+    """pandoc・mmdc・java の代替スクリプトを作成する.
+
+    Write stand-in scripts for pandoc, mmdc and java into ``bin_dir``.
+    Put the directory first on PATH to use them.
+
+    Parameters
+    ----------
+    bin_dir : Path
+        スクリプトの作成先
+
+    Returns
+    -------
+    dict
+        ツール名 -> スクリプトのパス
+    """
+    if os.name == "nt":
+        raise OSError("Stand-in tools need a POSIX shell; "
+                      "use --real-pandoc on Windows")
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    tools = {}
+    for name, template in (("pandoc", FAKE_PANDOC), ("mmdc", FAKE_MMDC),
+                           ("java", FAKE_JAVA)):
+        path = bin_dir / name
+        path.write_text(template.format(python=sys.executable),
+                        encoding="utf-8")
+        path.chmod(0o755)
+        tools[name] = path
+    return tools
+
+
+def measure(func, repeat: int) -> dict:
+    """関数を repeat 回実行して所要時間を集計する.
+
+    Parameters
+    ----------
+    func : callable
+        計測する関数（引数なし）
+    repeat : int
+        実行回数
+
+    Returns
+    -------
+    dict
+        {"median": 中央値, "min": 最小値, "runs": [各回の秒数]}
+    """
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(round(time.perf_counter() - started, 6))
+    return {
+        "median": round(statistics.median(runs), 6),
+        "min": min(runs),
+        "runs": runs
+    }
+
+
+class PipelineBenchmark:
+    """変換パイプラインのベンチマークを実行するクラス.
+
+    Run the pipeline benchmarks in a temporary workspace.
+    """
+
+    def __init__(self,
+                 workspace: Path,
+                 scale: float = 1.0,
+                 repeat: int = 3,
+                 jobs: int = None,
+                 real_pandoc: bool = False):
+        """初期化.
+
+        Parameters
+        ----------
+        workspace : Path
+            合成ツリーと出力を作成する作業フォルダ
+        scale : float, optional
+            ファイル数・サイズの倍率
+        repeat : int, optional
+            各計測の実行回数
+        jobs : int, optional
+            convert_folder の並列数（省略時はCPU数）
+        real_pandoc : bool, optional
+            インストール済みの pandoc と Lua フィルタを使う（mmdc と java は
+            代替スクリプトのまま）
+        """
+        self.workspace = workspace
+        self.scale = scale
+        self.repeat = repeat
+        self.jobs = jobs
+        self.real_pandoc = real_pandoc
+        self.logger = logging.getLogger("benchmark")
+        # 変換ごとのログは計測の邪魔になるため警告以上のみ出力する
+        self.service_logger = logging.getLogger("benchmark.pandoc")
+        self.service_logger.setLevel(logging.WARNING)
+        self.tools = {}
+
+    def create_service(self) -> PandocService:
+        """キャッシュを使わない計測用の PandocService を作成する."""
+        service = PandocService(self.service_logger)
+        service.output_format = "html"
+        service.mermaid_mode = "mmdc"
+        service.css_file = None
+        service.diagram_cache = False
+        service.ast_cache = False
+        service.plantuml_daemon = False
+        service.max_workers = self.jobs
+        return service
+
+    def setup_tools(self):
+        """代替ツールを作成して PATH の先頭に追加する."""
+        bin_dir = self.workspace / "bin"
+        self.tools = install_fake_tools(bin_dir)
+        if self.real_pandoc:
+            (bin_dir / "pandoc").unlink()
+            del self.tools["pandoc"]
+        os.environ["PATH"] = str(bin_dir) + os.pathsep + os.environ["PATH"]
+        os.environ["JAVA_PATH"] = str(self.tools["java"])
+
+    def bench_convert_folder(self, scenario: str) -> dict:
+        """シナリオのツリーに対する convert_folder を計測する."""
+        source = self.workspace / "trees" / scenario
+        info = generate_tree(source, scenario, self.scale)
+        service = self.create_service()
+        service.exclude_patterns = info["exclude_patterns"]
+        if scenario == "diagrams":
+            service.enabled_filters = [get_app_dir() / "filters" /
+                                       "diaglam.lua"]
+        jar = self.workspace / "plantuml.jar"
+        jar.touch()
+        run = [0]
+        failures = []
+
+        def convert():
+            run[0] += 1
+            output = self.workspace / "out" / f"{scenario}{run[0]}"
+            _, failed, _ = service.convert_folder(source, output, ".html",
+                                                  str(self.tools["java"]),
+                                                  str(jar))
+            failures.append(failed)
+            shutil.rmtree(output, ignore_errors=True)
+
+        result = measure(convert, self.repeat)
+        result.update(files=info["files"],
+                      bytes=info["bytes"],
+                      failures=max(failures))
+        return result
+
+    def bench_should_exclude(self) -> dict:
+        """除外パターンの照合と除外を考慮した走査を計測する."""
+        source = self.workspace / "trees" / "exclude_walk"
+        info = generate_tree(source, "excludes", self.scale)
+        service = self.create_service()
+        service.exclude_patterns = info["exclude_patterns"]
+        paths = [
+            path.relative_to(source) for path in source.rglob("*")
+            if path.is_file()
+        ]
+
+        def check():
+            for path in paths:
+                service.should_exclude(path)
+            for _ in service.iter_folder_files(source):
+                pass
+
+        result = measure(check, self.repeat)
+        result.update(paths=len(paths))
+        return result
+
+    def bench_build_metadata_args(self, calls: int = 2000) -> dict:
+        """フィルタ設定のメタデータ引数の作成を計測する."""
+        document = self.workspace / "metadata.md"
+        document.write_text(make_document(random.Random(0), 4000, 2, 2),
+                            encoding="utf-8")
+        service = self.create_service()
+        service.enabled_filters = [get_app_dir() / "filters" / "diaglam.lua"]
+
+        def build():
+            for _ in range(calls):
+                service.build_metadata_args(document,
+                                            str(self.tools.get("java", "")),
+                                            "plantuml.jar")
+
+        result = measure(build, self.repeat)
+        result.update(calls=calls)
+        return result
+
+    def bench_local_server(self, requests: int = 200) -> dict:
+        """ローカルHTTPサーバへの keep-alive 要求を計測する."""
+        root = self.workspace / "served"
+        root.mkdir(parents=True, exist_ok=True)
+        rng = random.Random(0)
+        names = []
+        for i in range(50):
+            name = f"page{i}.html"
+            (root / name).write_text(make_document(rng, 4000),
+                                     encoding="utf-8")
+            names.append(name)
+        service = self.create_service()
+        port = service.start_local_server(root)
+        if not port:
+            raise OSError("Local server did not start")
+
+        def fetch():
+            connection = http.client.HTTPConnection("127.0.0.1",
+                                                    port,
+                                                    timeout=10)
+            try:
+                for i in range(requests):
+                    connection.request("GET", "/" + names[i % len(names)])
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        raise OSError(f"HTTP {response.status}")
+            finally:
+                connection.close()
+
+        try:
+            result = measure(fetch, self.repeat)
+        finally:
+            service.stop_local_server()
+        result.update(requests=requests)
+        return result
+
+    def run(self, scenarios: list = None) -> dict:
+        """ベンチマークを実行し、結果を返す.
+
+        Parameters
+        ----------
+        scenarios : list, optional
+            convert_folder を計測するシナリオ（省略時はすべて）
+
+        Returns
+        -------
+        dict
+            ベンチマーク結果（save_results で保存する形式）
+        """
+        saved_environ = dict(os.environ)
+        self.setup_tools()
+        results = {}
+        try:
+            for scenario in scenarios or list(SCENARIOS):
+                self.logger.info("convert_folder: %s", scenario)
+                results[f"convert_folder:{scenario}"] = (
+                    self.bench_convert_folder(scenario))
+            self.logger.info("should_exclude")
+            results["should_exclude"] = self.bench_should_exclude()
+            self.logger.info("build_metadata_args")
+            results["build_metadata_args"] = self.bench_build_metadata_args()
+            self.logger.info("local_server")
+            results["local_server"] = self.bench_local_server()
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_environ)
+        return {
+            "format": BENCHMARK_FORMAT_VERSION,
+            "version": __version__,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "tools": "real-pandoc" if self.real_pandoc else "stand-in",
+            "scale": self.scale,
+            "repeat": self.repeat,
+            "jobs": self.jobs,
+            "results": results,
+        }
+
+
+def compare_results(current: dict, baseline: dict,
+                    tolerance: float = 0.25) -> list:
+    """ベースラインと比較して、各計測の変化を返す.
+
+    Compare benchmark results with a baseline.
+
+    Parameters
+    ----------
+    current : dict
+        今回の結果
+    baseline : dict
+        比較対象の結果
+    tolerance : float, optional
+        劣化とみなす中央値の増加率（0.25 = 25%）
+
+    Returns
+    -------
+    list
+        [(名前, ベースラインの中央値, 今回の中央値, 比率, 劣化したか), ...]
+        片方にしかない計測は含まない
+    """
+    rows = []
+    previous = baseline.get("results", {})
+    for name, result in current.get("results", {}).items():
+        if name not in previous:
+            continue
+        before = previous[name]["median"]
+        after = result["median"]
+        ratio = after / before if before else float("inf")
+        rows.append((name, before, after, ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def save_results(results: dict, path: Path):
+    """結果をJSONとして保存する."""
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2),
+                    encoding="utf-8")
+
+
+def load_results(path: Path) -> dict:
+    """保存した結果を読み込む."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv: list = None) -> int:
+    """コマンドラインからベンチマークを実行する.
+
+    Returns
+    -------
+    int
+        終了コード（劣化を検出した場合は1）
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the Pandoc GUI conversion pipeline')
+    parser.add_argument('--scenario',
+                        action='append',
+                        choices=list(SCENARIOS),
+                        help='convert_folder scenario to run (repeatable; '
+                        'default: all)')
+    parser.add_argument('--scale',
+                        type=float,
+                        default=1.0,
+                        help='Multiplier for the number and size of files')
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=3,
+                        help='Runs per measurement (the median is compared)')
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=None,
+                        help='Parallel conversions (default: CPU count)')
+    parser.add_argument('--real-pandoc',
+                        action='store_true',
+                        help='Use the installed pandoc and Lua filters '
+                        '(mmdc and java stay stand-ins)')
+    parser.add_argument('--workspace',
+                        help='Directory for generated trees (default: a '
+                        'temporary directory that is removed afterwards)')
+    parser.add_argument('-o', '--output', help='Write results to this JSON')
+    parser.add_argument('--compare',
+                        metavar='BASELINE',
+                        help='Compare with a previous results JSON')
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=0.25,
+                        help='Allowed median slowdown before a benchmark '
+                        'counts as a regression (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    temp_dir = None
+    if args.workspace:
+        workspace = Path(args.workspace)
+    else:
+        temp_dir = tempfile.TemporaryDirectory(prefix="pandoc-gui-bench-")
+        workspace = Path(temp_dir.name)
+    try:
+        benchmark = PipelineBenchmark(workspace, args.scale, args.repeat,
+                                      args.jobs, args.real_pandoc)
+        results = benchmark.run(args.scenario)
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+
+    for name, result in results["results"].items():
+        print(f"{name:32} median {result['median']:9.4f}s  "
+              f"min {result['min']:9.4f}s")
+    if args.output:
+        save_results(results, Path(args.output))
+
+    if not args.compare:
+        return 0
+    baseline = load_results(Path(args.compare))
+    for key in ("scale", "tools", "jobs"):
+        if baseline.get(key) != results[key]:
+            print(f"warning: baseline {key} is {baseline.get(key)!r}, "
+                  f"this run uses {results[key]!r}")
+    rows = compare_results(results, baseline, args.tolerance)
+    regressions = 0
+    print()
+    for name, before, after, ratio, regressed in rows:
+        mark = "REGRESSION" if regressed else ""
+        print(f"{name:32} {before:9.4f}s -> {after:9.4f}s  "
+              f"x{ratio:5.2f} {mark}")
+        regressions += regressed
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,6 +12,11 @@ end
 
 -- 一時ファイル作成関数（Pandoc 3.0以降とそれ以前の互換性対応）
 local tmp_counter = 0
+-- 並列実行される複数のpandocプロセス間で一時ファイル名が衝突しないよう
+-- プロセス固有の値（テーブルのアドレスとCPU時間）から識別子を作る
+local tmp_run_id = string.format("%s%d",
+                                 tostring({}):match("0x(%x+)") or tostring({}):match("(%x+)$") or "",
+                                 math.floor(os.clock() * 1000000))
 local tmp
 if pandoc.path and pandoc.path.make_temp_file then
   -- Pandoc 3.0以降
@@ -23,10 +28,11 @@ else
   tmp = function(suffix)
     local tmpdir = os.getenv("TEMP") or os.getenv("TMP") or os.getenv("TMPDIR") or "/tmp"
     tmp_counter = tmp_counter + 1
-    local name = string.format("%s%spandoc_diagram_%d_%d%s", 
-                               tmpdir, 
+    local name = string.format("%s%spandoc_diagram_%d_%s_%d%s",
+                               tmpdir,
                                package.config:sub(1,1),
                                os.time(),
+                               tmp_run_id,
                                tmp_counter,
                                suffix or "")
     return name
@@ -39,12 +45,51 @@ local plantuml_jar = trim_quotes(os.getenv("PLANTUML_JAR"))  -- nil の場合は
 -- PlantUMLサーバ設定
 local plantuml_use_server = false
 local plantuml_server_url = "http://www.plantuml.com/plantuml"
+-- JAR方式でアプリ側が起動した常駐PlantUMLサーバ（メタデータ plantuml_daemon_url）
+local plantuml_daemon_url = nil
 
 -- Mermaidモード設定 (mmdc or browser)
 local mermaid_mode = "mmdc"
 -- ブラウザモードで処理したブロック数（handle_doc で参照）
 local diagram_count = 0
 
+-- 図の描画ごとのタイミングイベントを標準エラー出力に書く（メタデータ pandoc_gui_timings）
+-- アプリ側が行の受信時刻から所要時間を求める
+local timings = false
+-- 直近に描画した図の生成方法（cache / batch / mmdc / browser / server / daemon / jar / error）
+local render_source = nil
+
+local function timing_event(diagram, phase, source)
+  if not timings then return end
+  if source then
+    io.stderr:write(string.format('[pandoc-gui-timing] {"diagram":"%s","phase":"%s","source":"%s"}\n',
+                                  diagram, phase, source))
+  else
+    io.stderr:write(string.format('[pandoc-gui-timing] {"diagram":"%s","phase":"%s"}\n', diagram, phase))
+  end
+  io.stderr:flush()
+end
+
+-- 図の描画に使うファイルを標準エラー出力に通知する（メタデータ pandoc_gui_dependencies）
+-- アプリ側がインクリメンタルビルドの依存ファイルとして記録する
+local dependencies = false
+
+local function json_string(s)
+  return '"' .. (s:gsub('[%c"\\]', function(c)
+    return string.format("\\u%04x", c:byte())
+  end)) .. '"'
+end
+
+local function dependency_event(diagram)
+  if not dependencies then return end
+  if diagram == "mermaid" and mermaid_mode == "browser" then
+    io.stderr:write('[pandoc-gui-dependency] {"uses":"mermaid_js"}\n')
+  elseif diagram == "plantuml" and not plantuml_use_server then
+    io.stderr:write('[pandoc-gui-dependency] {"dependency":'
+                    .. json_string(plantuml_jar or "plantuml.jar") .. ',"kind":"renderer"}\n')
+  end
+end
+
 -- Mermaid.jsのパス設定（スタンドアロン版を使用）
 local mermaid_js_path = "mermaid/mermaid.min.js"
 
@@ -61,46 +106,247 @@ local function file_exists(path)
   return false
 end
 
--- Base64エンコード関数（画像をdata URIとして埋め込むため）
-local function base64_encode(filepath)
+-- 図のSVGキャッシュ（メタデータ diagram_cache_dir が指定された場合のみ有効）
+-- キーはレンダラ名・レンダラのバージョン/設定・ブロック本文のハッシュ
+local diagram_cache_dir = nil
+local mermaid_renderer_version = ""
+local plantuml_renderer_version = ""
+
+local function cache_path(renderer, version, text)
+  if not diagram_cache_dir or diagram_cache_dir == "" then return nil end
+  local key = pandoc.utils.sha1(renderer .. "\n" .. (version or "") .. "\n" .. text)
+  return diagram_cache_dir .. sep .. key .. ".svg"
+end
+
+local function cache_lookup(renderer, version, text)
+  local path = cache_path(renderer, version, text)
+  if path and file_exists(path) then return path end
+  return nil
+end
+
+local function cache_store(renderer, version, text, svg_path)
+  local path = cache_path(renderer, version, text)
+  if not path then return end
+  local src = io.open(svg_path, "rb")
+  if not src then return end
+  local data = src:read("*a")
+  src:close()
+  if not data or data == "" then return end
+  -- 並列実行中の他プロセスが書きかけのファイルを読まないよう一時名で書いてから置き換える
+  local partial = string.format("%s.%s.part", path, tmp_run_id)
+  local dst = io.open(partial, "wb")
+  if not dst then return end
+  dst:write(data)
+  dst:close()
+  if not os.rename(partial, path) then os.remove(partial) end
+end
+
+-- mmdc の実行コマンドを組み立てる
+local function mmdc_command(input, output)
   if package.config:sub(1,1) == '\\' then
-    -- Windows: PowerShellを使用してBase64エンコード
-    local cmd = string.format('powershell -Command "[Convert]::ToBase64String([IO.File]::ReadAllBytes(\'%s\'))"', filepath)
-    local handle = io.popen(cmd)
-    if not handle then return nil end
-    local result = handle:read("*a")
-    handle:close()
-    return result:gsub("%s+", "")
-  else
-    -- Unix-like
-    local handle = io.popen(string.format('base64 "%s"', filepath))
-    if not handle then return nil end
-    local result = handle:read("*a")
-    handle:close()
-    return result:gsub("%s+", "")
+    -- Windows: cmdを使用し、パスをダブルクォートで囲む
+    return string.format('cmd /c mmdc -i "%s" -o "%s"', input, output)
   end
+  -- Unix-like systems
+  return string.format('mmdc -i "%s" -o "%s"', input, output)
 end
 
-local function render_zoomable_image_html(src, alt)
-  return string.format([[
+-- mmdcモードのバッチ描画
+-- 文書内の未キャッシュのMermaidブロックを1つのMarkdownにまとめ、mmdc を1回だけ
+-- 実行する（Chromiumの起動は文書ごとに1回）。結果は本文 -> SVGパスで保持し、
+-- 生成できなかったブロックは従来どおりブロック単位で描画する
+local mermaid_batch_texts = {}
+local mermaid_batch_seen = {}
+local mermaid_prerendered = {}
 
-<div style="margin: 10px 0;">
-  <img src="%s" style="max-width: 600px; cursor: zoom-in; display: block;" onclick="showImageModal(this.src)" alt="%s" />
-</div>
+local function collect_mermaid_block(el)
+  if mermaid_mode == "browser" or not el.classes:includes("mermaid") then return nil end
+  local text = el.text
+  -- フェンスを含む本文はMarkdownにまとめられないため個別描画に回す
+  if mermaid_batch_seen[text] or text:find("```", 1, true) then return nil end
+  if cache_lookup("mermaid", mermaid_renderer_version, text) then return nil end
+  mermaid_batch_seen[text] = true
+  table.insert(mermaid_batch_texts, text)
+  return nil
+end
+
+local function prerender_mermaid_batch(doc)
+  -- 1ブロックだけなら個別描画と同じなのでバッチ化しない
+  if #mermaid_batch_texts < 2 then return nil end
+
+  local input = tmp(".md")
+  local f = io.open(input, "w")
+  if not f then
+    io.stderr:write(string.format("⚠️ Failed to create mermaid batch file: %s\n", input))
+    return nil
+  end
+  for _, text in ipairs(mermaid_batch_texts) do
+    f:write("```mermaid\n", text, "\n```\n\n")
+  end
+  f:close()
+
+  -- mmdc はMarkdown入力の n 番目の図を "<出力名>-n.svg" に書き出す
+  local output = tmp(".md")
+  local base = (output:gsub("%.md$", ""))
+  local cmd = mmdc_command(input, output) .. " -e svg"
+  io.stderr:write(string.format("🔍 Executing mermaid batch command (%d diagram(s)): %s\n",
+                                #mermaid_batch_texts, cmd))
+  timing_event("mermaid_batch", "start")
+  local ok = os.execute(cmd)
+  if not ok then
+    io.stderr:write("⚠️ mmdc batch failed, falling back to per-diagram rendering\n")
+  end
+
+  local rendered = 0
+  for i, text in ipairs(mermaid_batch_texts) do
+    local svg = string.format("%s-%d.svg", base, i)
+    if file_exists(svg) then
+      mermaid_prerendered[text] = svg
+      cache_store("mermaid", mermaid_renderer_version, text, svg)
+      rendered = rendered + 1
+    end
+  end
+  io.stderr:write(string.format("✅ Mermaid batch rendered %d/%d diagram(s)\n",
+                                rendered, #mermaid_batch_texts))
+  timing_event("mermaid_batch", "end", "mmdc")
+  return nil
+end
+
+-- 図の埋め込み方式（メタデータ diagram_embed）
+-- "base64": data URI の <img>、"inline": SVG をそのままHTMLに埋め込む
+local diagram_embed = "base64"
+-- インライン埋め込みしたSVGの連番（SVG内のIDを文書内で一意にするため）
+local inline_svg_count = 0
+
+local function read_file(path)
+  local f = io.open(path, "rb")
+  if not f then return nil end
+  local data = f:read("*a")
+  f:close()
+  return data
+end
+
+-- Base64エンコード（外部プロセスを使わないテーブル参照方式）
+-- 3バイト(24bit)を12bitずつ2回の表引きで4文字に変換する
+local b64chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+local b64pairs = {}
+for i = 0, 4095 do
+  local hi, lo = (i >> 6) + 1, (i & 63) + 1
+  b64pairs[i] = b64chars:sub(hi, hi) .. b64chars:sub(lo, lo)
+end
+
+local function base64_encode_string(data)
+  local out = {}
+  local n = 0
+  local len = #data
+  local full = len - len % 3
+  for i = 1, full, 3 do
+    local a, b, c = data:byte(i, i + 2)
+    local v = (a << 16) | (b << 8) | c
+    n = n + 1
+    out[n] = b64pairs[v >> 12] .. b64pairs[v & 4095]
+  end
+  local rest = len - full
+  if rest == 1 then
+    local v = data:byte(full + 1) << 16
+    n = n + 1
+    out[n] = b64pairs[v >> 12] .. "=="
+  elseif rest == 2 then
+    local a, b = data:byte(full + 1, full + 2)
+    local v = (a << 16) | (b << 8)
+    n = n + 1
+    out[n] = b64pairs[v >> 12] .. b64chars:sub(((v >> 6) & 63) + 1, ((v >> 6) & 63) + 1) .. "="
+  end
+  return table.concat(out)
+end
+
+-- Base64エンコード関数（画像をdata URIとして埋め込むため）
+local function base64_encode(filepath)
+  local data = read_file(filepath)
+  if not data then return nil end
+  return base64_encode_string(data)
+end
+
+local zoom_modal_script = [[
 <script>
 if (typeof showImageModal === 'undefined') {
   function showImageModal(src) {
     var modal = document.createElement('div');
-    modal.style.cssText = 'position:fixed;top:0;left:0;width:100%%;height:100%%;background:rgba(0,0,0,0.9);z-index:9999;display:flex;align-items:center;justify-content:center;cursor:zoom-out;';
+    modal.style.cssText = 'position:fixed;top:0;left:0;width:100%;height:100%;background:rgba(0,0,0,0.9);z-index:9999;display:flex;align-items:center;justify-content:center;cursor:zoom-out;';
     modal.onclick = function() { document.body.removeChild(modal); };
     var img = document.createElement('img');
     img.src = src;
-    img.style.cssText = 'max-width:90%%;max-height:90%%;background:white;';
+    img.style.cssText = 'max-width:90%;max-height:90%;background:white;';
     modal.appendChild(img);
     document.body.appendChild(modal);
   }
 }
-</script>]], src, alt)
+</script>]]
+
+local function render_zoomable_image_html(src, alt)
+  return string.format([[
+
+<div style="margin: 10px 0;">
+  <img src="%s" style="max-width: 600px; cursor: zoom-in; display: block;" onclick="showImageModal(this.src)" alt="%s" />
+</div>
+]], src, alt) .. zoom_modal_script
+end
+
+-- SVGをHTMLに直接埋め込む（XML宣言/DOCTYPEを除去し、IDを文書内で一意にする）
+local function render_inline_svg_html(svg, alt)
+  inline_svg_count = inline_svg_count + 1
+  svg = svg:gsub("^\239\187\191", "")
+  svg = svg:gsub("<%?xml.-%?>", "", 1)
+  svg = svg:gsub("<!DOCTYPE.->", "", 1)
+  -- mmdc は全ての図に id="my-svg" を付け、スタイルもこのIDで指定する
+  svg = svg:gsub("my%-svg", string.format("diagram-svg-%d", inline_svg_count))
+  return string.format([[
+
+<div style="margin: 10px 0; max-width: 600px; cursor: zoom-in;" role="img" aria-label="%s" onclick="showImageModal('data:image/svg+xml;charset=utf-8,' + encodeURIComponent(this.innerHTML))">
+%s
+</div>
+]], alt, svg) .. zoom_modal_script
+end
+
+-- SVGファイルを拡大表示可能な画像として埋め込む
+local function embed_svg(svg_path, alt)
+  if diagram_embed == "inline" then
+    local svg = read_file(svg_path)
+    if svg and svg:find("<svg", 1, true) then
+      io.stderr:write(string.format("✅ SVG inlined, length: %d\n", #svg))
+      return pandoc.RawBlock('html', render_inline_svg_html(svg, alt))
+    end
+  end
+  -- SVGファイルをBase64エンコードしてdata URIとして埋め込む
+  local base64_data = base64_encode(svg_path)
+  if base64_data and base64_data ~= "" then
+    io.stderr:write(string.format("✅ Base64 encoded, length: %d\n", #base64_data))
+    local data_uri = "data:image/svg+xml;base64," .. base64_data
+    return pandoc.RawBlock('html', render_zoomable_image_html(data_uri, alt))
+  end
+  -- Base64エンコードに失敗した場合は通常のファイルパスを返す
+  io.stderr:write("⚠️ Failed to encode image to base64, using file path\n")
+  return pandoc.Para({ pandoc.Image({}, svg_path) })
+end
+
+-- 常駐PlantUMLサーバ（picoweb）でSVGを生成する（失敗時は false を返し JAR 方式にフォールバック）
+-- 外部コマンドを起動せず、pandoc 自身のHTTPクライアントで GET /plantuml/svg/~h<16進> を取得する
+local function render_plantuml_via_daemon(text, output)
+  if not plantuml_daemon_url or plantuml_daemon_url == "" then return false end
+  local encoded = text:gsub(".", function(c) return string.format("%02x", c:byte()) end)
+  local url = plantuml_daemon_url .. "/svg/~h" .. encoded
+  local ok, _mime, svg = pcall(pandoc.mediabag.fetch, url)
+  if ok and svg and svg:find("<svg", 1, true) then
+    local f = io.open(output, "wb")
+    if f then
+      f:write(svg)
+      f:close()
+      io.stderr:write(string.format("⚡ PlantUML rendered by daemon: %s\n", plantuml_daemon_url))
+      return true
+    end
+  end
+  io.stderr:write(string.format("⚠️ PlantUML daemon request failed, falling back to JAR: %s\n", plantuml_daemon_url))
+  return false
 end
 
 local function handle_meta(meta)
@@ -113,6 +359,9 @@ local function handle_meta(meta)
   if meta.plantuml_jar then
     plantuml_jar = trim_quotes(pandoc.utils.stringify(meta.plantuml_jar))
   end
+  if meta.plantuml_daemon_url then
+    plantuml_daemon_url = trim_quotes(pandoc.utils.stringify(meta.plantuml_daemon_url))
+  end
   if meta.java_path then
     java_cmd = trim_quotes(pandoc.utils.stringify(meta.java_path))
   end
@@ -122,10 +371,29 @@ local function handle_meta(meta)
   if meta.mermaid_js_path then
     mermaid_js_path = trim_quotes(pandoc.utils.stringify(meta.mermaid_js_path))
   end
+  if meta.diagram_embed then
+    diagram_embed = trim_quotes(pandoc.utils.stringify(meta.diagram_embed))
+  end
+  if meta.diagram_cache_dir then
+    diagram_cache_dir = trim_quotes(pandoc.utils.stringify(meta.diagram_cache_dir))
+  end
+  if meta.mermaid_renderer_version then
+    mermaid_renderer_version = trim_quotes(pandoc.utils.stringify(meta.mermaid_renderer_version))
+  end
+  if meta.plantuml_renderer_version then
+    plantuml_renderer_version = trim_quotes(pandoc.utils.stringify(meta.plantuml_renderer_version))
+  end
+  if meta.pandoc_gui_timings then
+    timings = meta.pandoc_gui_timings == true or pandoc.utils.stringify(meta.pandoc_gui_timings) == "true"
+  end
+  if meta.pandoc_gui_dependencies then
+    dependencies = meta.pandoc_gui_dependencies == true
+                   or pandoc.utils.stringify(meta.pandoc_gui_dependencies) == "true"
+  end
   return meta
 end
 
-local function handle_code_block(el)
+local function render_code_block(el)
   -- Mermaid
   if el.classes:includes("mermaid") then
     -- browserモードの場合は、mermaid.jsを使うHTMLを出力
@@ -134,6 +402,7 @@ local function handle_code_block(el)
       diagram_count = diagram_count + 1
       local diagram_id = string.format("mermaid-%d", diagram_count)
       io.stderr:write(string.format("🌐 Mermaid browser mode: %s\n", diagram_id))
+      render_source = "browser"
       -- HTML エスケープ
       local escaped = el.text:gsub("&", "&amp;"):gsub("<", "&lt;"):gsub(">", "&gt;")
       return pandoc.RawBlock('html',
@@ -141,6 +410,19 @@ local function handle_code_block(el)
     end
 
     -- mmdcモード（従来の方法）
+    local cached = cache_lookup("mermaid", mermaid_renderer_version, el.text)
+    if cached then
+      io.stderr:write(string.format("♻️ Mermaid diagram cache hit: %s\n", cached))
+      render_source = "cache"
+      return embed_svg(cached, "Mermaid Diagram")
+    end
+    local prerendered = mermaid_prerendered[el.text]
+    if prerendered and file_exists(prerendered) then
+      io.stderr:write(string.format("⚡ Mermaid diagram from batch: %s\n", prerendered))
+      render_source = "batch"
+      return embed_svg(prerendered, "Mermaid Diagram")
+    end
+
     local input = tmp(".mmd")
     local output = tmp(".svg")
     local f = io.open(input, "w")
@@ -157,15 +439,7 @@ local function handle_code_block(el)
       return nil
     end
     
-    -- Windows環境ではcmdを使用してmmdcを実行
-    local cmd
-    if package.config:sub(1,1) == '\\' then
-      -- Windows: パスをダブルクォートで囲む
-      cmd = string.format('cmd /c mmdc -i "%s" -o "%s"', input, output)
-    else
-      -- Unix-like systems
-      cmd = string.format('mmdc -i "%s" -o "%s"', input, output)
-    end
+    local cmd = mmdc_command(input, output)
     
     io.stderr:write(string.format("🔍 Executing mermaid command: %s\n", cmd))
     local ok = os.execute(cmd)
@@ -183,24 +457,22 @@ local function handle_code_block(el)
     end
     
     io.stderr:write(string.format("✅ Mermaid diagram created: %s\n", output))
-    
-    -- SVGファイルをBase64エンコードしてdata URIとして埋め込む
+    render_source = "mmdc"
+    cache_store("mermaid", mermaid_renderer_version, el.text, output)
+
     io.stderr:write("🔍 Starting base64 encoding...\n")
-    local base64_data = base64_encode(output)
-    if base64_data and base64_data ~= "" then
-      io.stderr:write(string.format("✅ Base64 encoded, length: %d\n", #base64_data))
-      local data_uri = "data:image/svg+xml;base64," .. base64_data
-      local html = render_zoomable_image_html(data_uri, "Mermaid Diagram")
-      return pandoc.RawBlock('html', html)
-    else
-      -- Base64エンコードに失敗した場合は通常のファイルパスを返す
-      io.stderr:write("⚠️ Failed to encode image to base64, using file path\n")
-      return pandoc.Para({ pandoc.Image({}, output) })
-    end
+    return embed_svg(output, "Mermaid Diagram")
   end
 
   -- PlantUML
   if el.classes:includes("plantuml") then
+    local cached = cache_lookup("plantuml", plantuml_renderer_version, el.text)
+    if cached then
+      io.stderr:write(string.format("♻️ PlantUML diagram cache hit: %s\n", cached))
+      render_source = "cache"
+      return embed_svg(cached, "PlantUML Diagram")
+    end
+
     local input = tmp(".puml")
     local output = tmp(".svg")
     
@@ -252,6 +524,11 @@ local function handle_code_block(el)
       end
       
       actual_output = output
+      render_source = "server"
+    elseif render_plantuml_via_daemon(el.text, output) then
+      -- 常駐PlantUMLサーバで生成済み（JVMの起動を省略）
+      actual_output = output
+      render_source = "daemon"
     else
       -- JAR方式を使用
       local jar = plantuml_jar or "plantuml.jar"
@@ -304,21 +581,28 @@ local function handle_code_block(el)
           pandoc.CodeBlock(el.text, { class = "plantuml" })
         }, { class = "plantuml-error", style = "border: 2px solid red; padding: 10px; background-color: #fff3cd;" })
       end
+      render_source = "jar"
     end
     
-    -- SVGファイルをBase64エンコードしてdata URIとして埋め込む
-    local base64_data = base64_encode(actual_output)
-    if base64_data and base64_data ~= "" then
-      local data_uri = "data:image/svg+xml;base64," .. base64_data
-      local html = render_zoomable_image_html(data_uri, "PlantUML Diagram")
-      return pandoc.RawBlock('html', html)
-    else
-      -- Base64エンコードに失敗した場合は通常のファイルパスを返す
-      return pandoc.Para({ pandoc.Image({}, actual_output) })
-    end
+    cache_store("plantuml", plantuml_renderer_version, el.text, actual_output)
+    return embed_svg(actual_output, "PlantUML Diagram")
   end
 end
 
+-- 図の描画時間を計測できるよう、Mermaid/PlantUMLブロックの前後でイベントを出力する
+-- あわせて描画に使うファイルを通知する
+local function handle_code_block(el)
+  local diagram = (el.classes:includes("mermaid") and "mermaid")
+                  or (el.classes:includes("plantuml") and "plantuml")
+  if not diagram then return render_code_block(el) end
+  dependency_event(diagram)
+  render_source = "error"
+  timing_event(diagram, "start")
+  local result = render_code_block(el)
+  timing_event(diagram, "end", render_source)
+  return result
+end
+
 -- ドキュメント末尾にmermaid.jsローダースクリプトを追加（browser モード用）
 local function handle_doc(doc)
   if mermaid_mode == "browser" and diagram_count > 0 then
@@ -372,7 +656,8 @@ if (typeof window.showImageModal === 'undefined') {
     if (mjs) mjs.parentNode.removeChild(mjs);
     if (_self && _self.parentNode) _self.parentNode.removeChild(_self);
     // SVGインライン埋め込み済みHTMLを /save-html に POST して上書き
-    var fname = decodeURIComponent(window.location.pathname.split('/').pop());
+    // サーバのルートからの相対パス（サブフォルダのHTMLも同じサーバで保存する）
+    var fname = decodeURIComponent(window.location.pathname.replace(/^\/+/, ''));
     try {
       var html = '<!DOCTYPE html>\n' + document.documentElement.outerHTML;
       var r = await fetch('/save-html', {
@@ -399,6 +684,8 @@ end
 
 return {
   { Meta = handle_meta },
+  { CodeBlock = collect_mermaid_block },
+  { Pandoc = prerender_mermaid_batch },
   { CodeBlock = handle_code_block },
   { Pandoc = handle_doc }
 }
\ No newline at end of file
@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""フォルダの変更監視モジュール.
+
+Watch a folder tree for changed files.
+
+Linux では inotify（ctypes 経由）で変更を受け取り、使えない環境では
+os.scandir による stat のポーリングに切り替えます。短時間に続く保存は
+デバウンスしてまとめ、変更されたファイルのパスを1回のコールバックで通知します。
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 最後の変更からコールバックまでの待ち時間（秒）
+WATCH_DEBOUNCE_SEC = 0.3
+# ポーリング時の走査間隔（秒）
+WATCH_POLL_INTERVAL_SEC = 1.0
+# 停止要求を確認する間隔（秒）
+WATCH_STOP_CHECK_SEC = 0.5
+
+# inotify のイベントマスク (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK if hasattr(os, "O_NONBLOCK") else 0
+IN_CLOEXEC = 0o2000000
+
+INOTIFY_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+                | IN_DELETE | IN_DELETE_SELF)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def walk_tree(root: Path, should_ignore=None, base: Path = None):
+    """除外対象を辿らずにフォルダ内のディレクトリとファイルを列挙する.
+
+    Parameters
+    ----------
+    root : Path
+        走査するフォルダ
+    should_ignore : callable, optional
+        base からの相対パスを受け取り、無視する場合 True を返す関数
+    base : Path, optional
+        should_ignore に渡す相対パスの基準（省略時は root）
+
+    Yields
+    ------
+    tuple
+        (path: Path, entry: os.DirEntry, is_dir: bool)
+    """
+    base = base or root
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    path = Path(entry.path)
+                    if should_ignore and should_ignore(path.relative_to(base)):
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_dir:
+                        stack.append(path)
+                    yield (path, entry, is_dir)
+        except OSError:
+            # 走査中に削除されたフォルダ等
+            continue
+
+
+class InotifyBackend:
+    """inotify による変更検出.
+
+    Detect changes with Linux inotify, adding a watch for every directory
+    in the tree (including directories created later).
+    """
+
+    name = "inotify"
+
+    def __init__(self, root: Path, should_ignore=None):
+        """初期化.
+
+        Parameters
+        ----------
+        root : Path
+            監視するフォルダ
+        should_ignore : callable, optional
+            相対パスを受け取り、無視する場合 True を返す関数
+
+        Raises
+        ------
+        OSError
+            inotify が使えない場合
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc = libc
+        self.root = root
+        self.should_ignore = should_ignore
+        self.fd = -1
+        self.watches = {}  # wd -> ディレクトリ
+        self._open()
+
+    def _open(self):
+        """inotify を初期化し、フォルダ全体を監視対象に追加する."""
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        try:
+            self._add_tree(self.root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: Path):
+        """ディレクトリを監視対象に追加する."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory),
+                                          INOTIFY_MASK | IN_ONLYDIR)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOSPC, errno.ENOMEM):
+                # 監視数の上限 (fs.inotify.max_user_watches)
+                raise OSError(err, f"inotify watch limit reached: {directory}")
+            # 追加前に削除されたフォルダ等は無視する
+            return
+        self.watches[wd] = directory
+
+    def _add_tree(self, directory: Path) -> set:
+        """フォルダ配下を監視対象に追加し、既に存在するファイルを返す."""
+        self._add_watch(directory)
+        files = set()
+        for path, _entry, is_dir in walk_tree(directory, self.should_ignore,
+                                              self.root):
+            if is_dir:
+                self._add_watch(path)
+            else:
+                files.add(path)
+        return files
+
+    def _is_ignored(self, path: Path) -> bool:
+        """root からの相対パスで無視対象か判定する."""
+        if not self.should_ignore:
+            return False
+        try:
+            return self.should_ignore(path.relative_to(self.root))
+        except ValueError:
+            return True
+
+    def read_changes(self, timeout: float, stop_event=None) -> set:
+        """最大 timeout 秒待ち、変更されたファイルのパスを返す.
+
+        Parameters
+        ----------
+        timeout : float
+            待ち時間（秒）
+        stop_event : threading.Event, optional
+            未使用（select のタイムアウトで停止を確認する）
+
+        Returns
+        -------
+        set
+            変更（作成・更新・移動・削除）されたファイルのパス
+        """
+        del stop_event
+        readable, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # イベントが溢れた場合は監視を作り直し、全ファイルを変更扱いにする
+                self.close()
+                self._open()
+                return {
+                    path for path, _entry, is_dir in walk_tree(
+                        self.root, self.should_ignore) if not is_dir
+                }
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if self._is_ignored(path):
+                continue
+            if mask & IN_ISDIR:
+                # 新しいフォルダは監視を追加し、監視前に作られたファイルも拾う
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed |= self._add_tree(path)
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        """inotify のファイル記述子を閉じる."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.watches = {}
+
+
+class PollingBackend:
+    """stat のポーリングによる変更検出.
+
+    Detect changes by comparing (mtime, size) snapshots taken with
+    os.scandir at a fixed interval.
+    """
+
+    name = "polling"
+
+    def __init__(self,
+                 root: Path,
+                 should_ignore=None,
+                 interval_sec: float = WATCH_POLL_INTERVAL_SEC):
+        """初期化.
+
+        Parameters
+        ----------
+        root : Path
+            監視するフォルダ
+        should_ignore : callable, optional
+            相対パスを受け取り、無視する場合 True を返す関数
+        interval_sec : float, optional
+            走査間隔（秒）
+        """
+        self.root = root
+        self.should_ignore = should_ignore
+        self.interval_sec = interval_sec
+        self._next_scan = time.monotonic() + interval_sec
+        self.snapshot = self.scan()
+
+    def scan(self) -> dict:
+        """ファイルごとの (更新日時, サイズ) を取得する."""
+        snapshot = {}
+        for path, entry, is_dir in walk_tree(self.root, self.should_ignore):
+            if is_dir:
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def read_changes(self, timeout: float, stop_event=None) -> set:
+        """次の走査時刻まで（最大 timeout 秒）待ち、変更されたファイルを返す."""
+        wait = min(max(0.0, timeout), self._next_scan - time.monotonic())
+        if wait > 0:
+            if stop_event:
+                stop_event.wait(wait)
+            else:
+                time.sleep(wait)
+        if time.monotonic() < self._next_scan:
+            return set()
+
+        self._next_scan = time.monotonic() + self.interval_sec
+        snapshot = self.scan()
+        previous = self.snapshot
+        self.snapshot = snapshot
+        changed = {
+            path for path, state in snapshot.items()
+            if previous.get(path) != state
+        }
+        changed.update(path for path in previous if path not in snapshot)
+        return changed
+
+    def close(self):
+        """後処理（ポーリングでは何もしない）."""
+
+
+class FolderWatcher:
+    """フォルダを監視し、変更されたファイルをまとめて通知するクラス.
+
+    Watch a folder on a background thread and call ``callback`` with the
+    sorted list of changed files once a burst of changes has settled for
+    ``debounce_sec`` seconds. The callback runs on the watcher thread, so
+    changes made while it runs are reported in the next batch.
+    """
+
+    def __init__(self,
+                 root: Path,
+                 callback,
+                 should_ignore=None,
+                 debounce_sec: float = WATCH_DEBOUNCE_SEC,
+                 poll_interval_sec: float = WATCH_POLL_INTERVAL_SEC,
+                 backend: str = "auto",
+                 logger: logging.Logger = None):
+        """初期化.
+
+        Parameters
+        ----------
+        root : Path
+            監視するフォルダ
+        callback : callable
+            変更されたファイルのパスのリストを受け取る関数
+        should_ignore : callable, optional
+            root からの相対パスを受け取り、無視する場合 True を返す関数。
+            無視したフォルダの配下は監視しない
+        debounce_sec : float, optional
+            最後の変更から通知までの待ち時間（秒）
+        poll_interval_sec : float, optional
+            ポーリング時の走査間隔（秒）
+        backend : str, optional
+            "auto"（inotify、使えなければポーリング）、"inotify"、"polling"
+        logger : logging.Logger, optional
+            ロガー
+        """
+        self.root = Path(root)
+        self.callback = callback
+        self.should_ignore = should_ignore
+        self.debounce_sec = debounce_sec
+        self.poll_interval_sec = poll_interval_sec
+        self.backend_preference = backend
+        self.logger = logger or logging.getLogger(__name__)
+        self.backend = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def backend_name(self) -> str:
+        """使用中の検出方法（開始前は None）."""
+        return self.backend.name if self.backend else None
+
+    def _create_backend(self):
+        """inotify を優先して検出方法を作成する."""
+        if self.backend_preference in ("auto", "inotify"):
+            try:
+                return InotifyBackend(self.root, self.should_ignore)
+            except OSError as e:
+                if self.backend_preference == "inotify":
+                    raise
+                self.logger.info("inotify unavailable, polling instead: %s",
+                                 e)
+        return PollingBackend(self.root, self.should_ignore,
+                              self.poll_interval_sec)
+
+    def start(self):
+        """監視を開始する.
+
+        Raises
+        ------
+        OSError
+            監視を開始できない場合
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.backend = self._create_backend()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.logger.info("Watching %s (%s)", self.root, self.backend_name)
+
+    def stop(self, timeout: float = 5.0):
+        """監視を停止する（実行中のコールバックの完了を待つ）."""
+        self._stop_event.set()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def is_alive(self) -> bool:
+        """監視スレッドが動作中かを返す."""
+        return bool(self._thread and self._thread.is_alive())
+
+    def join(self, timeout: float = None):
+        """監視スレッドの終了を待つ."""
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def _run(self):
+        """変更を受け取り、デバウンスしてコールバックを呼び出す."""
+        pending = set()
+        deadline = None
+        try:
+            while not self._stop_event.is_set():
+                if deadline is None:
+                    timeout = WATCH_STOP_CHECK_SEC
+                else:
+                    timeout = min(WATCH_STOP_CHECK_SEC,
+                                  max(0.0, deadline - time.monotonic()))
+                try:
+                    changed = self.backend.read_changes(timeout,
+                                                        self._stop_event)
+                except OSError as e:
+                    self.logger.error("Folder watch failed: %s", e)
+                    return
+                if changed:
+                    pending |= changed
+                    deadline = time.monotonic() + self.debounce_sec
+                if (pending and deadline is not None
+                        and time.monotonic() >= deadline
+                        and not self._stop_event.is_set()):
+                    batch = sorted(pending)
+                    pending = set()
+                    deadline = None
+                    try:
+                        self.callback(batch)
+                    except Exception:  # pylint: disable=broad-except
+                        # コールバックの失敗で監視を止めない
+                        self.logger.exception("Watch callback failed")
+        finally:
+            self.backend.close()
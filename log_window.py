@@ -1,23 +1,115 @@
 # -*- coding: utf-8 -*-
 """ログウィンドウクラス定義."""
 import logging
+import queue
 import tkinter as tk
+from collections import deque
+
+# ログウィジェットに保持する最大行数
+LOG_MAX_LINES = 5000
+
+# キューからウィジェットへ書き込む間隔（ミリ秒）
+LOG_POLL_INTERVAL_MS = 100
 
 
 class TextHandler(logging.Handler):
     """ログテキストウィジェット用ハンドラー.
 
     Handler for log text widget.
+
+    emit はどのスレッドから呼ばれてもキューに積むだけで、ウィジェットへの
+    書き込みは Tk の after タイマーでまとめて行います。ウィジェットの行数は
+    max_lines を超えないよう古い行から削除します。
     """
 
-    def __init__(self, widget):
+    def __init__(self,
+                 widget,
+                 max_lines: int = LOG_MAX_LINES,
+                 poll_interval_ms: int = LOG_POLL_INTERVAL_MS):
+        """初期化.
+
+        Initialize.
+
+        Parameters
+        ----------
+        widget : tk.Text
+            ログを表示するテキストウィジェット
+        max_lines : int
+            ウィジェットに保持する最大行数
+        poll_interval_ms : int
+            キューを確認する間隔（ミリ秒）
+        """
         super().__init__()
         self.widget = widget
+        self.max_lines = max_lines
+        self.poll_interval_ms = poll_interval_ms
+        self.queue = queue.SimpleQueue()
+        self._after_id = None
+        self._closed = False
+        self._schedule()
 
     def emit(self, record):
-        msg = self.format(record)
-        self.widget.insert(tk.END, msg + "\n")
-        self.widget.see(tk.END)
+        try:
+            msg = self.format(record)
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.handleError(record)
+            return
+        self.queue.put(msg)
+
+    def _schedule(self):
+        """次回のキュー処理を予約する."""
+        if self._closed:
+            return
+        try:
+            self._after_id = self.widget.after(self.poll_interval_ms,
+                                               self.flush_queue)
+        except tk.TclError:
+            # ウィジェットが破棄済み
+            self._after_id = None
+
+    def flush_queue(self):
+        """キューに溜まったログをまとめてウィジェットに書き込む.
+
+        Write the queued records to the widget in one batch. Runs on the Tk
+        thread. Only the last max_lines records are kept, since older ones
+        would be trimmed right away.
+        """
+        lines = deque(maxlen=self.max_lines)
+        while True:
+            try:
+                lines.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if lines:
+            try:
+                self.widget.insert(tk.END, "\n".join(lines) + "\n")
+                self._trim()
+                self.widget.see(tk.END)
+            except tk.TclError:
+                self._closed = True
+                return
+
+        self._schedule()
+
+    def _trim(self):
+        """max_lines を超えた古い行を削除する."""
+        # 末尾の改行の後ろに空行が1つあるため、行数は end-1c の行番号 - 1
+        line_count = int(self.widget.index("end-1c").split(".")[0]) - 1
+        excess = line_count - self.max_lines
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+
+    def close(self):
+        """キュー処理のタイマーを停止する."""
+        self._closed = True
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        super().close()
 
 
 class LogWindow(tk.Toplevel):
@@ -26,7 +118,7 @@ class LogWindow(tk.Toplevel):
     Floating window for log display.
     """
 
-    def __init__(self, parent):
+    def __init__(self, parent, max_lines: int = LOG_MAX_LINES):
         """初期化.
 
         Initialize.
@@ -35,6 +127,8 @@ class LogWindow(tk.Toplevel):
         ----------
         parent : tk.Tk
             親ウィンドウ (Parent window)
+        max_lines : int
+            ログに保持する最大行数 (Maximum number of log lines kept)
         """
         super().__init__(parent)
         self.title("ログ")
@@ -42,6 +136,7 @@ class LogWindow(tk.Toplevel):
         self.logger = parent.logger
         self.parent = parent
         self.i18n = parent.i18n
+        self.max_lines = max_lines
 
         # ログレベル変数（内部で管理）
         self.log_level_var = tk.StringVar(value="INFO")
@@ -71,11 +166,11 @@ class LogWindow(tk.Toplevel):
 
         scrollbar.config(command=self.log_text.yview)
 
-        # テキストハンドラーを追加
-        text_handler = TextHandler(self.log_text)
-        text_handler.setFormatter(
+        # テキストハンドラーを追加（ワーカースレッドからはキュー経由で書き込む）
+        self.text_handler = TextHandler(self.log_text, self.max_lines)
+        self.text_handler.setFormatter(
             logging.Formatter("%(asctime)s - %(message)s"))
-        self.logger.addHandler(text_handler)
+        self.logger.addHandler(self.text_handler)
 
         # ログレベル選択
         control_frame = tk.Frame(self, padx=5, pady=5)
@@ -123,6 +218,17 @@ class LogWindow(tk.Toplevel):
         self.withdraw()
         self.parent.log_button.config(text=self.i18n.t("log_window_show"))
 
+    def destroy(self):
+        """ウィンドウを破棄する.
+
+        Destroy window and detach the log handler.
+        """
+        handler = getattr(self, "text_handler", None)
+        if handler:
+            self.logger.removeHandler(handler)
+            handler.close()
+        super().destroy()
+
     def clear_log(self):
         """ログをクリアする.
 
@@ -6,6 +6,7 @@ import logging
 import os
 import platform
 import shutil
+import signal
 import sys
 import threading
 import tkinter as tk
@@ -20,11 +21,11 @@ from exclude_window import ExcludeWindow
 from filter_window import FilterWindow
 from i18n import I18n
 from log_window import LogWindow
-from pandoc_service import (PandocService, check_pandoc_installed, get_app_dir,
-                            get_data_dir, get_default_data_dir,
-                            get_settings_file, init_default_profile,
-                            load_profile, save_profile, set_data_dir)
-from subprocessex import terminate_process
+from pandoc_service import (FORMAT_EXTENSIONS, PandocService,
+                            check_pandoc_installed, get_app_dir, get_data_dir,
+                            get_default_data_dir, get_settings_file,
+                            init_default_profile, load_profile, save_profile,
+                            set_data_dir, split_output_formats)
 
 # Windowsでのプロセス管理用フラグ
 if platform.system() == "Windows":
@@ -427,14 +428,19 @@ class MainWindow(tk.Tk):
                                     font=("Arial", 10, "bold"))
         self.run_button.pack(fill=tk.X)
 
+        # 監視モード（変換後に入力を監視し、変更されたファイルだけを再変換）
+        self.watch_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(exec_frame,
+                       text=self.i18n.t("watch_changes"),
+                       variable=self.watch_var,
+                       command=self._on_watch_toggled).pack(anchor=tk.W,
+                                                            pady=(3, 0))
+        self.folder_watcher = None
+
         # ステータス表示
         self.status_label = tk.Label(exec_frame, text="", fg="#666")
         self.status_label.pack(fill=tk.X, pady=(5, 0))
 
-        # プロセス管理
-        self.current_proc = None
-        self.proc_lock = threading.Lock()
-
         # ウィンドウクローズで子プロセスを終了させる
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
@@ -1175,6 +1181,26 @@ class MainWindow(tk.Tk):
         if hasattr(self, 'mermaid_mode_var'):
             self.pandoc_service.mermaid_mode = self.mermaid_mode_var.get()
 
+        ext, output = self._get_conversion_output()
+        if self.input_path.is_file():
+            self._run_single_file_conversion(self.input_path, output)
+        else:
+            # フォルダ選択の場合
+            self._run_folder_conversion(self.input_path, output, ext)
+
+        # 監視モードでは変換した入力の監視を（再）開始する
+        if self.watch_var.get():
+            self._start_watching()
+
+    def _get_conversion_output(self):
+        """現在の入出力設定から出力拡張子と出力先を返す.
+
+        Returns
+        -------
+        tuple
+            (ext: str, output: Path) 入力がファイルなら出力ファイル、
+            フォルダなら出力フォルダ
+        """
         # 出力形式に応じた拡張子マップ
         format_ext_map = {
             "html": ".html",
@@ -1187,13 +1213,102 @@ class MainWindow(tk.Tk):
         if self.input_path.is_file():
             # 入力がファイルの場合、output_pathがファイルかフォルダかで処理を分ける
             if self.output_path.suffix:  # 拡張子がある=ファイルとして指定された
-                output_file = self.output_path
-            else:  # フォルダとして指定された
-                output_file = self.output_path / (self.input_path.stem + ext)
-            self._run_single_file_conversion(self.input_path, output_file)
+                return (ext, self.output_path)
+            # フォルダとして指定された
+            return (ext, self.output_path / (self.input_path.stem + ext))
+        return (ext, self.output_path)
+
+    def _on_watch_toggled(self):
+        """監視モードの切り替え時の処理.
+
+        Start watching the selected input when watch mode is turned on, and
+        stop watching when it is turned off.
+        """
+        if self.watch_var.get():
+            self._start_watching()
         else:
-            # フォルダ選択の場合
-            self._run_folder_conversion(self.input_path, self.output_path, ext)
+            self._stop_watching()
+
+    def _start_watching(self):
+        """選択中の入力の監視を開始する（監視中なら開始し直す）."""
+        self._stop_watching()
+        if not self.input_path or not self.output_path:
+            self.logger.error(self.i18n.t("error_no_input_output"))
+            self.watch_var.set(False)
+            return
+
+        input_path = self.input_path
+        ext, output = self._get_conversion_output()
+        watcher = self.pandoc_service.create_folder_watcher(
+            input_path,
+            output,
+            lambda changed: self._on_watch_changes(input_path, output, ext,
+                                                   changed))
+        try:
+            watcher.start()
+        except OSError as e:
+            self.logger.error(self.i18n.t("watch_failed", error=str(e)))
+            self.watch_var.set(False)
+            return
+        self.folder_watcher = watcher
+        self.logger.info(self.i18n.t("watch_started", path=input_path))
+
+    def _stop_watching(self):
+        """入力の監視を停止する."""
+        watcher = self.folder_watcher
+        self.folder_watcher = None
+        if watcher:
+            watcher.stop()
+            self.logger.info(self.i18n.t("watch_stopped"))
+
+    def _on_watch_changes(self, input_path, output, ext, changed_files):
+        """監視で検出した変更を再変換する（監視スレッドで実行）.
+
+        Parameters
+        ----------
+        input_path : Path
+            監視中の入力ファイルまたはフォルダ
+        output : Path
+            出力ファイルまたは出力フォルダ
+        ext : str
+            出力ファイルの拡張子
+        changed_files : list
+            変更されたファイルのパス
+        """
+        java_path_override = self.java_path_field.get().strip()
+        plantuml_jar_override = self.plantuml_jar_field.get().strip()
+        browser_mode = (ext == ".html"
+                        and self.pandoc_service.mermaid_mode == 'browser')
+        try:
+            self._set_converting_status(True)
+            if input_path.is_file():
+                success, _stdout, _stderr, _returncode = (
+                    self.pandoc_service.convert_file(input_path, output,
+                                                     java_path_override,
+                                                     plantuml_jar_override))
+                if (success and output.suffix.lower() == '.html'
+                        and self.pandoc_service.mermaid_mode == 'browser'):
+                    self._open_html_with_server(output)
+                return
+
+            self.pandoc_service.convert_changed_files(input_path, output, ext,
+                                                      changed_files,
+                                                      java_path_override,
+                                                      plantuml_jar_override)
+            if browser_mode:
+                html_files = []
+                for path in changed_files:
+                    try:
+                        relative_path = Path(path).relative_to(input_path)
+                    except ValueError:
+                        continue
+                    html_file = (output / relative_path.parent /
+                                 (relative_path.stem + ext))
+                    if html_file.exists():
+                        html_files.append(html_file)
+                self._finalize_mermaid_htmls(html_files)
+        finally:
+            self._set_converting_status(False)
 
     def _run_single_file_conversion(self, input_file, output_file):
         """単一ファイルの変換を実行する.
@@ -1349,6 +1464,10 @@ class MainWindow(tk.Tk):
             self.logger.info("No HTML file found to open via local server")
             return
 
+        self._finalize_mermaid_htmls(html_files)
+
+    def _finalize_mermaid_htmls(self, html_files: list):
+        """Mermaidを含むHTMLだけをheadlessブラウザで最終化する."""
         mermaid_html_files = []
         for html_file in html_files:
             try:
@@ -1368,8 +1487,12 @@ class MainWindow(tk.Tk):
 
         self.logger.info("Opening Mermaid HTML files via local server: %d",
                          len(mermaid_html_files))
-        for html_file in mermaid_html_files:
-            self._open_html_with_server(html_file)
+        try:
+            # 1つのheadlessブラウザで全ファイルを最終化する
+            self.pandoc_service.render_htmls_in_background_browser(
+                mermaid_html_files)
+        except (OSError, IOError, ValueError) as e:
+            self.logger.error("Failed to open HTML with server: %s", e)
 
     def on_close(self):
         """アプリ終了時に実行中プロセスを終了させてからウィンドウを破棄する.
@@ -1378,22 +1501,15 @@ class MainWindow(tk.Tk):
         application.
         """
         self.logger.info(self.i18n.t("app_closing"))
-        proc = None
-        with self.proc_lock:
-            proc = self.current_proc
-
-        if not proc or proc.poll() is not None:
-            # プロセスがないか、すでに終了している
-            self._cleanup_and_close()
-            return
-
-        self.logger.info(self.i18n.t("terminating_child_process", pid=proc.pid))
+        for job in self.pandoc_service.running_jobs():
+            if not job["persistent"]:
+                self.logger.info(
+                    self.i18n.t("terminating_child_process", pid=job["pid"]))
 
-        # プラットフォーム依存のプロセス停止処理を共通関数に移管
+        # 実行中の変換（pandoc・ブラウザとその子プロセス）をまとめて中止する
         try:
-            terminate_process(proc, logger=self.logger, timeout=5.0)
+            self.pandoc_service.cancel()
         except (OSError, IOError, ValueError) as e:
-            self.logger.exception("terminate_process failed: %s", e)
             self.logger.exception(
                 self.i18n.t("child_process_termination_error", error=str(e)))
 
@@ -1408,6 +1524,15 @@ class MainWindow(tk.Tk):
         if self.pandoc_service.local_server:
             self.pandoc_service.stop_local_server()
 
+        # 入力の監視を停止
+        self._stop_watching()
+
+        # 常駐PlantUMLサーバ・pandoc serverを停止
+        self.pandoc_service.stop_plantuml_daemon()
+        self.pandoc_service.stop_pandoc_server()
+        # 残っている子プロセスを終了させる
+        self.pandoc_service.terminate_processes()
+
         # ログウィンドウを閉じる
         if self.log_window:
             try:
@@ -1461,6 +1586,13 @@ def run_cli_mode(cli_args):
         logger.error("Pandoc is not installed or not in PATH")
         return 1
 
+    # 出力形式（カンマ区切りで複数指定可）
+    try:
+        output_formats = split_output_formats(cli_args.format)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 1
+
     # PandocServiceのインスタンスを作成
     pandoc_service = PandocService(logger)
 
@@ -1468,8 +1600,73 @@ def run_cli_mode(cli_args):
     pandoc_service.load_profile_data(cli_args.profile)
 
     # コマンドライン引数で上書き
-    pandoc_service.output_format = cli_args.format
+    pandoc_service.output_format = output_formats[0]
+    jobs = getattr(cli_args, "jobs", None)
+    if jobs:
+        pandoc_service.max_workers = jobs
+    if getattr(cli_args, "incremental", False):
+        pandoc_service.incremental = True
+    if getattr(cli_args, "pandoc_server", False):
+        pandoc_service.pandoc_server = True
+    timings = getattr(cli_args, "timings", None)
+    if timings:
+        pandoc_service.timings = True
+        if isinstance(timings, str):
+            pandoc_service.timings_file = Path(timings)
+    timeout = getattr(cli_args, "timeout", None)
+    if timeout is not None:
+        pandoc_service.pandoc_timeout = timeout
+
+    # Ctrl+C では実行中のpandoc（別のプロセスグループ）も中止してから終了する
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+
+        def on_sigint(signum, frame):
+            pandoc_service.cancel()
+            signal.default_int_handler(signum, frame)
+
+        previous_handler = signal.signal(signal.SIGINT, on_sigint)
+
+    try:
+        exit_code = _run_cli_conversion(pandoc_service, cli_args,
+                                        output_formats, logger)
+        if not getattr(cli_args, "watch", False):
+            return exit_code
+        return _run_cli_watch(pandoc_service, cli_args, output_formats,
+                              logger)
+    except KeyboardInterrupt:
+        logger.warning("Conversion cancelled")
+        return 130
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+        # 常駐PlantUMLサーバ・pandoc serverを停止
+        pandoc_service.stop_plantuml_daemon()
+        pandoc_service.stop_pandoc_server()
+        pandoc_service.terminate_processes()
+
+
+def _run_cli_conversion(pandoc_service, cli_args, output_formats, logger):
+    """コマンドラインモードの変換処理本体.
+
+    Run the conversion part of command-line mode.
 
+    Parameters
+    ----------
+    pandoc_service : PandocService
+        設定済みのPandocサービス
+    cli_args : argparse.Namespace
+        コマンドライン引数
+    output_formats : list
+        出力形式のリスト
+    logger : logging.Logger
+        ロガー
+
+    Returns
+    -------
+    int
+        終了コード (0: 成功, 1: 失敗)
+    """
     # 入出力パスの処理
     input_path = Path(cli_args.input)
     output_path = Path(cli_args.output)
@@ -1479,6 +1676,33 @@ def run_cli_mode(cli_args):
         return 1
 
     # 入力がファイルかフォルダかを判定
+    if input_path.is_file() and len(output_formats) > 1:
+        # 1回の解析から複数形式を出力（拡張子は形式ごとに置き換える）
+        outputs = {
+            output_format: output_path.with_suffix(
+                FORMAT_EXTENSIONS[output_format])
+            for output_format in output_formats
+        }
+        logger.info("Converting file: %s -> %s", input_path,
+                    ", ".join(str(p) for p in outputs.values()))
+        results = pandoc_service.convert_file_formats(input_path, outputs)
+
+        exit_code = 0
+        for output_format, (success, stdout, stderr,
+                            returncode) in results.items():
+            if success:
+                logger.info("Conversion successful: %s",
+                            outputs[output_format])
+                if stdout.strip():
+                    print(stdout)
+            else:
+                logger.error("Conversion to %s failed (exit code %s)",
+                             output_format, returncode)
+                if stderr.strip():
+                    print(stderr, file=sys.stderr)
+                exit_code = 1
+        return exit_code
+
     if input_path.is_file():
         # ファイル変換
         logger.info("Converting file: %s -> %s", input_path, output_path)
@@ -1502,19 +1726,16 @@ def run_cli_mode(cli_args):
             output_path.mkdir(parents=True)
 
         # 出力拡張子を決定
-        format_ext_map = {
-            "html": ".html",
-            "pdf": ".pdf",
-            "docx": ".docx",
-            "epub": ".epub",
-            "markdown": ".md"
-        }
-        ext = format_ext_map.get(cli_args.format, ".html")
+        ext = FORMAT_EXTENSIONS.get(output_formats[0], ".html")
 
         logger.info("Converting folder: %s -> %s", input_path, output_path)
 
-        success_count, fail_count, _errors = pandoc_service.convert_folder(
-            input_path, output_path, ext)
+        if len(output_formats) > 1:
+            success_count, fail_count, _errors = pandoc_service.convert_folder(
+                input_path, output_path, ext, output_formats=output_formats)
+        else:
+            success_count, fail_count, _errors = pandoc_service.convert_folder(
+                input_path, output_path, ext)
 
         total_count = success_count + fail_count
         logger.info("Conversion completed: %s/%s files successful",
@@ -1528,6 +1749,73 @@ def run_cli_mode(cli_args):
         return 1
 
 
+def _run_cli_watch(pandoc_service, cli_args, output_formats, logger):
+    """入力を監視し、変更されたファイルだけを再変換する（Ctrl+Cで終了）.
+
+    Watch the input and reconvert only the changed files until
+    interrupted.
+
+    Parameters
+    ----------
+    pandoc_service : PandocService
+        設定済みのPandocサービス
+    cli_args : argparse.Namespace
+        コマンドライン引数
+    output_formats : list
+        出力形式のリスト
+    logger : logging.Logger
+        ロガー
+
+    Returns
+    -------
+    int
+        終了コード (0: Ctrl+Cで終了, 1: 監視を開始・継続できない)
+    """
+    input_path = Path(cli_args.input)
+    output_path = Path(cli_args.output)
+    ext = FORMAT_EXTENSIONS.get(output_formats[0], ".html")
+
+    def on_change(changed_files):
+        if input_path.is_file():
+            logger.info("Change detected: %s", input_path)
+            _run_cli_conversion(pandoc_service, cli_args, output_formats,
+                                logger)
+            return
+        success_count, fail_count, errors = (
+            pandoc_service.convert_changed_files(
+                input_path,
+                output_path,
+                ext,
+                changed_files,
+                output_formats=output_formats))
+        for relative_path, error in errors:
+            logger.error("Conversion failed: %s\n%s", relative_path, error)
+        if success_count or fail_count:
+            logger.info("Rebuilt changed files: %s/%s successful",
+                        success_count, success_count + fail_count)
+
+    watcher = pandoc_service.create_folder_watcher(input_path, output_path,
+                                                   on_change)
+    try:
+        watcher.start()
+    except OSError as e:
+        logger.error("Failed to watch %s: %s", input_path, e)
+        return 1
+
+    logger.info("Watching for changes in %s (press Ctrl+C to stop)",
+                input_path)
+    try:
+        while watcher.is_alive():
+            watcher.join(0.5)
+    except KeyboardInterrupt:
+        logger.info("Watch stopped")
+        return 0
+    finally:
+        watcher.stop()
+    # 監視スレッドがエラーで終了した
+    return 1
+
+
 # -------------------------
 # 起動
 # -------------------------
@@ -1539,15 +1827,55 @@ if __name__ == "__main__":
     parser.add_argument('-o', '--output', help='Output file or folder path')
     parser.add_argument('-f',
                         '--format',
-                        choices=['html', 'pdf', 'docx', 'epub', 'markdown'],
                         default='html',
-                        help='Output format (default: html)')
+                        help='Output format: html, pdf, docx, epub or '
+                        'markdown. Comma-separate several formats (e.g. '
+                        'html,pdf,docx) to parse each input once and write '
+                        'all of them (default: html)')
     parser.add_argument('-p',
                         '--profile',
                         default='default',
                         help='Profile name to use (default: default)')
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=None,
+                        help='Number of parallel conversions for folder input '
+                        '(default: profile setting or CPU count)')
+    parser.add_argument('--incremental',
+                        action='store_true',
+                        help='Skip files whose content and settings are '
+                        'unchanged since the previous folder conversion')
+    parser.add_argument('--pandoc-server',
+                        action='store_true',
+                        help='Convert filterless HTML/Markdown output through '
+                        'a long-lived pandoc server instead of one pandoc '
+                        'process per file')
+    parser.add_argument('--watch',
+                        action='store_true',
+                        help='After converting, watch the input and '
+                        'reconvert only changed files (Ctrl+C to stop)')
+    parser.add_argument('--timings',
+                        nargs='?',
+                        const=True,
+                        default=None,
+                        metavar='PATH',
+                        help='Record per-stage timings of each conversion as '
+                        'JSON lines (default: timings.jsonl next to the log)')
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=None,
+                        metavar='SEC',
+                        help='Stop a pandoc run that takes longer than SEC '
+                        'seconds and continue with the remaining files; 0 '
+                        'disables the limit (default: profile setting, no '
+                        'limit)')
 
     args = parser.parse_args()
+    try:
+        split_output_formats(args.format)
+    except ValueError as e:
+        parser.error(str(e))
 
     # 入力が指定されている場合はCLIモード
     if args.input:
@@ -1,20 +1,38 @@
 # -*- coding: utf-8 -*-
 """Pandoc変換サービス."""
+import base64
+import functools
+import gzip
+import hashlib
 import http.server
 import json
 import logging
 import os
 import platform
+import re
 import shutil
-import socketserver
+import socket
 import subprocess
 import sys
 import tempfile
 import threading
 import time
-from fnmatch import fnmatch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from fnmatch import translate
 from pathlib import Path
+from urllib.error import HTTPError
 from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from folder_watcher import FolderWatcher
+from subprocessex import ProcessRegistry, terminate_process
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 # Windowsでのプロセス管理用フラグ
 if platform.system() == "Windows":
@@ -181,6 +199,281 @@ DATA_DIR = get_data_dir(create_if_missing=False)
 # プロファイルディレクトリ（DATA_DIR配下）
 PROFILE_DIR = DATA_DIR / "profiles"
 
+# インクリメンタルビルド用マニフェストのファイル名（出力フォルダ直下）
+BUILD_MANIFEST_NAME = ".pandoc_gui_manifest.json"
+BUILD_MANIFEST_VERSION = 2
+
+# ローカルサーバで追加ルートを配信するURLパスの接頭辞
+LOCAL_SERVER_ROOT_PREFIX = "_root/"
+
+# 変換対象外ファイルのコピー方式
+# copy: 常にコピー / skip: 未変更ならスキップ /
+# reflink: skip + copy-on-write 複製 / hardlink: skip + ハードリンク
+COPY_STRATEGIES = ("copy", "skip", "reflink", "hardlink")
+
+# Linux の FICLONE ioctl（Btrfs/XFS 等で copy-on-write 複製）
+FICLONE = 0x40049409
+
+# フォルダ変換で pandoc に渡す入力拡張子（それ以外はコピーする）
+CONVERTIBLE_EXTENSIONS = frozenset({
+    ".md", ".markdown", ".html", ".htm", ".tex", ".rst", ".org", ".textile",
+    ".xml", ".epub", ".docx"
+})
+
+# 出力形式ごとの出力ファイル拡張子
+FORMAT_EXTENSIONS = {
+    "html": ".html",
+    "pdf": ".pdf",
+    "docx": ".docx",
+    "epub": ".epub",
+    "markdown": ".md",
+}
+
+# 埋め込みメディアが JSON AST に残らないため、形式ごとに変換する入力
+BINARY_INPUT_EXTENSIONS = (".docx", ".epub")
+
+# PlantUMLブロックの有無を調べるときの読み込み単位（バイト）
+PLANTUML_SCAN_CHUNK = 64 * 1024
+
+# ASTキャッシュのキーから除外するメタデータ（セッションごとに変わる値）
+AST_CACHE_VOLATILE_METADATA = ("plantuml_daemon_url", "pandoc_gui_timings")
+
+# Luaフィルタが標準エラー出力に書くタイミングイベント行の接頭辞
+TIMING_PREFIX = "[pandoc-gui-timing] "
+
+# Luaフィルタが標準エラー出力に書く参照ファイル通知行の接頭辞
+DEPENDENCY_PREFIX = "[pandoc-gui-dependency] "
+
+# 文書が参照するローカルファイル（画像など）を通知するフィルタ
+# 相対パスは入力ファイルのフォルダと作業ディレクトリの両方を候補として報告する
+DEPENDENCY_FILTER = r"""-- pandoc_gui: 参照ファイルの通知（自動生成）
+local function quote(s)
+  return '"' .. (s:gsub('[%c"\\]', function(c)
+    return string.format('\\u%04x', c:byte())
+  end)) .. '"'
+end
+
+local bases = { '.' }
+local input = PANDOC_STATE.input_files[1]
+if input and input ~= '-' then
+  local dir = pandoc.path.directory(input)
+  if dir ~= '.' then table.insert(bases, 1, dir) end
+end
+
+local function report(src)
+  -- URL・data URI・プロトコル相対URLは対象外
+  if src:match('^%a[%w+.-]+:') or src:sub(1, 2) == '//' then return end
+  src = src:gsub('[?#].*$', '')
+  if src == '' then return end
+  local candidates = { src }
+  if not pandoc.path.is_absolute(src) then
+    candidates = {}
+    for _, base in ipairs(bases) do
+      table.insert(candidates, pandoc.path.join({ base, src }))
+    end
+  end
+  for _, path in ipairs(candidates) do
+    io.stderr:write('[pandoc-gui-dependency] {"dependency":' .. quote(path)
+                    .. ',"kind":"resource"}\n')
+  end
+end
+
+function Image(el)
+  report(el.src)
+end
+
+function Pandoc(doc)
+  io.stderr:flush()
+  return nil
+end
+"""
+
+# 各Luaフィルタの前後に挟み、フィルタごとの所要時間を区切るマーカー
+TIMING_MARK_FILTER = """-- pandoc_gui: Luaフィルタごとの所要時間計測用マーカー（自動生成）
+function Pandoc(doc)
+  io.stderr:write('[pandoc-gui-timing] {"mark":true}\\n')
+  io.stderr:flush()
+  return nil
+end
+"""
+
+# pandoc server の起動コマンド候補（{port} と {timeout} を置換）
+PANDOC_SERVER_COMMANDS = (
+    ("pandoc", "server", "--port", "{port}", "--timeout", "{timeout}"),
+    ("pandoc-server", "--port", "{port}", "--timeout", "{timeout}"),
+)
+
+# pandoc server で変換できる入力拡張子と入力形式
+PANDOC_SERVER_INPUT_FORMATS = {
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".html": "html",
+    ".htm": "html",
+    ".rst": "rst",
+    ".tex": "latex",
+    ".org": "org",
+    ".textile": "textile",
+}
+
+# pandoc server で変換できる出力形式（外部ファイルを読まないテキスト出力）
+PANDOC_SERVER_OUTPUT_FORMATS = ("html", "markdown")
+
+
+def split_output_formats(value: str) -> list:
+    """カンマ区切りの出力形式指定を分割する.
+
+    Split a comma-separated output format list such as ``html,pdf,docx``.
+
+    Parameters
+    ----------
+    value : str
+        出力形式（カンマ区切り）
+
+    Returns
+    -------
+    list
+        重複を除いた出力形式のリスト（指定順）
+
+    Raises
+    ------
+    ValueError
+        未対応の出力形式が含まれる場合
+    """
+    formats = []
+    for name in value.split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unsupported output format: {name} "
+                             f"(choose from {', '.join(FORMAT_EXTENSIONS)})")
+        if name not in formats:
+            formats.append(name)
+    if not formats:
+        raise ValueError("No output format specified")
+    return formats
+
+
+def split_timing_events(lines: list) -> tuple:
+    """pandocの標準エラー出力からイベント行を取り出す.
+
+    Separate the timing event lines (TIMING_PREFIX) and the dependency
+    event lines (DEPENDENCY_PREFIX) from pandoc's stderr.
+
+    Parameters
+    ----------
+    lines : list
+        (受信時刻, 行) のリスト
+
+    Returns
+    -------
+    tuple
+        (イベント行を除いた標準エラー出力: str,
+         [(受信時刻, イベント: dict), ...])
+    """
+    text = []
+    events = []
+    for received, line in lines:
+        prefix = next((p for p in (TIMING_PREFIX, DEPENDENCY_PREFIX)
+                       if line.startswith(p)), None)
+        if prefix:
+            try:
+                event = json.loads(line[len(prefix):])
+            except ValueError:
+                event = None
+            if isinstance(event, dict):
+                events.append((received, event))
+                continue
+        text.append(line)
+    return ("".join(text), events)
+
+
+def _conversion_run(method):
+    """変換の入口となるメソッドを1回の実行として数えるデコレータ.
+
+    Wrap a conversion entry point so that the outermost run clears a
+    cancellation left over from an earlier run. Nested calls (e.g.
+    convert_file from a folder worker) keep the current request.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._run_lock:
+            if not self._active_runs:
+                self.cancel_event.clear()
+            self._active_runs += 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            with self._run_lock:
+                self._active_runs -= 1
+
+    return wrapper
+
+
+def _is_relative_to(path: Path, other: Path) -> bool:
+    """path が other 自身またはその配下か（解決済みパスで比較する）."""
+    try:
+        Path(path).resolve().relative_to(Path(other).resolve())
+    except ValueError:
+        return False
+    return True
+
+
+def hash_file(path: Path) -> str:
+    """ファイル内容のSHA-256ハッシュを返す.
+
+    Return SHA-256 hex digest of file contents.
+
+    Parameters
+    ----------
+    path : Path
+        対象ファイル (Target file)
+
+    Returns
+    -------
+    str
+        16進ダイジェスト (Hex digest)
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reflink_file(src: Path, dst: Path) -> bool:
+    """copy-on-write でファイルを複製する.
+
+    Clone ``src`` to ``dst`` with the Linux FICLONE ioctl. Returns False
+    (leaving no ``dst``) when the platform or file system does not support
+    it.
+
+    Parameters
+    ----------
+    src : Path
+        複製元 (Source file)
+    dst : Path
+        複製先 (Destination file)
+
+    Returns
+    -------
+    bool
+        複製できた場合True (True if cloned)
+    """
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
 
 def to_relative_path(path: Path) -> str:
     """パスをデータディレクトリ基準の相対パスに変換.
@@ -320,6 +613,20 @@ def init_default_profile():
         "plantuml_use_server": False,
         "plantuml_server_url": "http://www.plantuml.com/plantuml",
         "mermaid_mode": "browser",  # mmdc or browser
+        "max_workers": None,  # None = CPU数 (CPU count)
+        "incremental": False,
+        "copy_strategy": "reflink",
+        "diagram_cache": True,
+        "diagram_cache_max_mb": 256,
+        "diagram_cache_max_age_days": 30,
+        "plantuml_daemon": True,
+        "diagram_embed": "base64",
+        "pandoc_server": False,
+        "ast_cache": True,
+        "ast_cache_max_mb": 512,
+        "ast_cache_max_age_days": 30,
+        "timings": False,
+        "pandoc_timeout": 0,
     }
     path = PROFILE_DIR / "default.json"
     if not path.exists():
@@ -327,6 +634,76 @@ def init_default_profile():
             json.dump(default_data, f, indent=2, ensure_ascii=False)
 
 
+class ExcludeMatcher:
+    """除外パターンを事前コンパイルした照合器.
+
+    Exclude patterns compiled once. Wildcard-free patterns go into a set and
+    the rest into a single combined regular expression; both are checked
+    against every path component and the whole path, with the same
+    case handling as ``fnmatch.fnmatch``.
+    """
+
+    def __init__(self, patterns):
+        """照合器を作成する.
+
+        Parameters
+        ----------
+        patterns : list
+            除外パターン (Exclude patterns)
+        """
+        self.patterns = tuple(patterns)
+        literals = set()
+        wildcards = []
+        for pattern in self.patterns:
+            normalized = os.path.normcase(pattern)
+            if any(char in normalized for char in "*?["):
+                wildcards.append(translate(normalized))
+            else:
+                literals.add(normalized)
+        self._literals = frozenset(literals)
+        self._regex = (re.compile("|".join(wildcards)).match
+                       if wildcards else None)
+
+    def _match_one(self, text: str) -> bool:
+        """正規化済みの文字列がいずれかのパターンに一致するか."""
+        if text in self._literals:
+            return True
+        return bool(self._regex and self._regex(text))
+
+    def matches(self, relative_path: Path) -> bool:
+        """パスが除外パターンに一致するかチェックする.
+
+        Parameters
+        ----------
+        relative_path : Path
+            チェックするファイルパス (File path to check)
+
+        Returns
+        -------
+        bool
+            除外する場合True (True if should be excluded)
+        """
+        if not self.patterns:
+            return False
+        # ファイル名・フォルダ名は各部分に含まれる
+        for part in relative_path.parts:
+            if self.matches_name(part):
+                return True
+        # パス全体でマッチング
+        return self._match_one(os.path.normcase(str(relative_path)))
+
+    def matches_name(self, name: str) -> bool:
+        """ファイル名またはフォルダ名（パスの1要素）が一致するか."""
+        return bool(self.patterns) and self._match_one(os.path.normcase(name))
+
+    def matches_file(self, relative_path: Path) -> bool:
+        """親フォルダを照合済みのファイルが一致するか（名前とパス全体のみ）."""
+        if not self.patterns:
+            return False
+        return (self.matches_name(relative_path.name)
+                or self._match_one(os.path.normcase(str(relative_path))))
+
+
 class PandocService:
     """Pandoc変換サービスクラス.
 
@@ -346,6 +723,7 @@ class PandocService:
         self.logger = logger
         self.enabled_filters = []
         self.exclude_patterns = []
+        self._exclude_matcher = ExcludeMatcher([])
         self.css_file = None
         self.embed_css = True
         self.output_format = "html"
@@ -354,10 +732,59 @@ class PandocService:
         self.plantuml_use_server = False
         self.plantuml_server_url = "http://www.plantuml.com/plantuml"
         self.mermaid_mode = "browser"  # mmdc or browser
+        self.max_workers = None  # None = CPU数 (CPU count)
+        self.incremental = False
+        # pandoc 1回あたりの制限時間（秒、0またはNone = 無制限）
+        self.pandoc_timeout = 0
+        # 変換の中止要求（GUIの終了時・CLIのCtrl+Cで設定する）
+        self.cancel_event = threading.Event()
+        # 実行中の変換の数（最も外側の実行の開始時に中止要求を解除する）
+        self._active_runs = 0
+        self._run_lock = threading.Lock()
+        # 起動した子プロセス（pandoc・ブラウザ・常駐サーバ）
+        self.processes = ProcessRegistry(logger)
+        self.copy_strategy = "reflink"
+        self.diagram_cache = True
+        self.diagram_cache_max_mb = 256
+        self.diagram_cache_max_age_days = 30
+        self._diagram_cache_pruned_at = None
+        self._diagram_cache_lock = threading.Lock()
+        self.ast_cache = True
+        self.ast_cache_max_mb = 512
+        self.ast_cache_max_age_days = 30
+        self._ast_cache_pruned_at = None
+        self._ast_cache_lock = threading.Lock()
+        # 変換ステージのタイミング記録（JSON Lines）
+        self.timings = False
+        self.timings_file = None  # None = DATA_DIR/log/timings.jsonl
+        self._timing = threading.local()
+        self._timing_lock = threading.Lock()
+        # 変換で参照されたファイル（インクリメンタルビルドの依存関係）
+        self._dependencies = threading.local()
+        self.plantuml_daemon = True
+        self.diagram_embed = "base64"
+        self.plantuml_daemon_proc = None
+        self.plantuml_daemon_url = None
+        self._plantuml_daemon_key = None
+        self._plantuml_daemon_lock = threading.Lock()
+        self.pandoc_server = False
+        self.pandoc_server_proc = None
+        self.pandoc_server_url = None
+        self._pandoc_server_unavailable = False
+        self._pandoc_server_lock = threading.Lock()
         self.local_server = None
         self.server_port = None
         self.server_thread = None
         self.output_dir = None
+        # 追加の配信ルート（ID -> ディレクトリ）
+        self.server_roots = {}
+        self._server_roots_lock = threading.Lock()
+        # /save-html による保存完了通知（正規化パス -> threading.Event）
+        self._html_save_events = {}
+        self._html_save_lock = threading.Lock()
+        # メモリ上に保持する mermaid.min.js（初回配信時に読み込む）
+        self._mermaid_asset = None
+        self._mermaid_asset_lock = threading.Lock()
 
     def get_mermaid_browser_asset_path(self) -> Path:
         """browserモード用 mermaid.min.js の配置元パスを返す."""
@@ -367,6 +794,35 @@ class PandocService:
         ]
         return next((path for path in source_candidates if path.exists()), None)
 
+    def get_mermaid_browser_asset(self) -> dict:
+        """browserモード用 mermaid.min.js をメモリに読み込んで返す.
+
+        Load mermaid.min.js once and keep it in memory together with a
+        gzip-compressed copy and an ETag, so the local server does not read
+        and stat the asset on every request.
+
+        Returns
+        -------
+        dict or None
+            {"body": bytes, "gzip": bytes, "etag": str}、アセットがない場合はNone
+        """
+        with self._mermaid_asset_lock:
+            if self._mermaid_asset is None:
+                asset_file = self.get_mermaid_browser_asset_path()
+                if not asset_file:
+                    return None
+                try:
+                    content = asset_file.read_bytes()
+                except (OSError, IOError) as e:
+                    self.logger.warning("Failed to load Mermaid asset: %s", e)
+                    return None
+                self._mermaid_asset = {
+                    "body": content,
+                    "gzip": gzip.compress(content, compresslevel=9, mtime=0),
+                    "etag": f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+                }
+            return self._mermaid_asset
+
     def cleanup_output_mermaid_asset(self, output_dir: Path) -> None:
         """出力先に残った不要な mermaid/min.js を削除する."""
         mermaid_file = output_dir / "mermaid" / "mermaid.min.js"
@@ -437,17 +893,21 @@ class PandocService:
             ],
         ]
 
+        # ブラウザ起動前に登録し、起動中に保存された場合も取りこぼさない
+        saved_event = self._expect_html_save(html_file)
+
         launched = False
         for cmd in cmd_variants:
             try:
-                proc = subprocess.run(cmd,
-                                      capture_output=True,
-                                      text=True,
-                                      encoding="utf-8",
-                                      errors="replace",
-                                      timeout=timeout_sec,
-                                      check=False,
-                                      creationflags=creationflags)
+                proc = self.processes.run(cmd,
+                                          label=f"browser: {html_file.name}",
+                                          capture_output=True,
+                                          text=True,
+                                          encoding="utf-8",
+                                          errors="replace",
+                                          timeout=timeout_sec,
+                                          check=False,
+                                          creationflags=creationflags)
                 launched = True
                 if proc.returncode not in (0, 1):
                     self.logger.warning(
@@ -459,48 +919,333 @@ class PandocService:
                 self.logger.warning("Headless launch failed: %s", e)
 
         if not launched:
+            self._forget_html_save(html_file, saved_event)
             self.logger.error("Failed to launch headless browser")
             return False
 
-        # save-html の反映を短時間待機して確認
-        deadline = time.time() + max(timeout_sec, 3)
-        while time.time() < deadline:
-            try:
-                html = html_file.read_text(encoding='utf-8', errors='ignore')
-                has_mermaid_block = ('class="mermaid"' in html
-                                     or "class='mermaid'" in html)
-                if not has_mermaid_block and "<svg" in html:
-                    self.cleanup_output_mermaid_asset(html_file.parent)
-                    self.logger.info("Mermaid HTML finalized in background: %s",
-                                     html_file)
-                    return True
-            except (OSError, IOError):
-                pass
-            time.sleep(0.2)
-
+        # save-html の完了通知を待機して確認
+        finalized = self._wait_for_mermaid_finalized(html_file,
+                                                     max(timeout_sec, 3),
+                                                     saved_event)
         self.cleanup_output_mermaid_asset(html_file.parent)
+        if finalized:
+            self.logger.info("Mermaid HTML finalized in background: %s",
+                             html_file)
+            return True
+
         self.logger.warning(
             "Background Mermaid finalization timeout or incomplete: %s",
             html_file)
         return False
 
+    @staticmethod
+    def _html_save_key(html_file: Path) -> str:
+        """保存完了通知の照合に使う正規化パスを返す."""
+        return os.path.normcase(str(Path(html_file).resolve()))
+
+    def _expect_html_save(self, html_file: Path) -> threading.Event:
+        """HTMLの /save-html による保存完了を待つEventを登録する.
+
+        Register an event that the local server sets when the page posts
+        its finalized HTML to ``/save-html``.
+
+        Parameters
+        ----------
+        html_file : Path
+            保存を待つHTMLファイル
+
+        Returns
+        -------
+        threading.Event
+            保存完了時にセットされるEvent
+        """
+        key = self._html_save_key(html_file)
+        with self._html_save_lock:
+            event = self._html_save_events.get(key)
+            if event is None:
+                event = threading.Event()
+                self._html_save_events[key] = event
+            return event
+
+    def _forget_html_save(self, html_file: Path, event: threading.Event):
+        """登録済みの保存完了Eventを解除する."""
+        key = self._html_save_key(html_file)
+        with self._html_save_lock:
+            if self._html_save_events.get(key) is event:
+                del self._html_save_events[key]
+
+    def _notify_html_saved(self, html_file: Path):
+        """HTMLの保存完了を待機中の呼び出し元に通知する."""
+        key = self._html_save_key(html_file)
+        with self._html_save_lock:
+            event = self._html_save_events.pop(key, None)
+        if event:
+            event.set()
+
+    @staticmethod
+    def _is_mermaid_finalized(html_file: Path) -> bool:
+        """HTMLがSVGインライン化済みかどうかを判定する."""
+        try:
+            html = html_file.read_text(encoding='utf-8', errors='ignore')
+        except (OSError, IOError):
+            return False
+        has_mermaid_block = ('class="mermaid"' in html
+                             or "class='mermaid'" in html)
+        return not has_mermaid_block and "<svg" in html
+
+    def _wait_for_mermaid_finalized(self,
+                                    html_file: Path,
+                                    timeout_sec: float,
+                                    saved_event: threading.Event = None
+                                    ) -> bool:
+        """HTMLがSVGインライン化済みで保存されるまで待機する.
+
+        Wait until the local server reports that ``html_file`` was saved,
+        then check its content once. No polling of the file is done.
+
+        Parameters
+        ----------
+        html_file : Path
+            対象のHTMLファイル
+        timeout_sec : float
+            待機秒数
+        saved_event : threading.Event, optional
+            事前に _expect_html_save で登録したEvent
+
+        Returns
+        -------
+        bool
+            最終化済みであればTrue
+        """
+        if saved_event is None:
+            saved_event = self._expect_html_save(html_file)
+        try:
+            if not saved_event.is_set() and self._is_mermaid_finalized(
+                    html_file):
+                return True
+            saved_event.wait(timeout_sec)
+            return self._is_mermaid_finalized(html_file)
+        finally:
+            self._forget_html_save(html_file, saved_event)
+
+    def _launch_devtools_browser(self,
+                                 browser_exe: Path,
+                                 profile_dir: Path,
+                                 timeout_sec: float = 10.0) -> tuple:
+        """リモートデバッグを有効にしたheadlessブラウザを起動する.
+
+        Launch a headless browser with the DevTools remote debugging
+        endpoint enabled on a free port.
+
+        Parameters
+        ----------
+        browser_exe : Path
+            ブラウザ実行ファイル
+        profile_dir : Path
+            一時ユーザーデータディレクトリ
+        timeout_sec : float
+            DevToolsの待ち受け開始を待つ秒数
+
+        Returns
+        -------
+        tuple
+            (proc: subprocess.Popen, port: int)、失敗時は (None, None)
+        """
+        creationflags = 0
+        if platform.system() == "Windows":
+            creationflags = CREATE_NO_WINDOW | CREATE_NEW_PROCESS_GROUP
+
+        # ポート0を指定するとブラウザが選んだポートが DevToolsActivePort に書かれる
+        port_file = profile_dir / "DevToolsActivePort"
+        for headless_flag in ("--headless=new", "--headless"):
+            cmd = [
+                str(browser_exe), headless_flag, "--disable-gpu",
+                "--hide-scrollbars", "--no-first-run",
+                "--no-default-browser-check", "--remote-debugging-port=0",
+                f"--user-data-dir={profile_dir}", "about:blank"
+            ]
+            try:
+                proc = self.processes.popen(cmd,
+                                            label="browser: DevTools",
+                                            stdin=subprocess.DEVNULL,
+                                            stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL,
+                                            creationflags=creationflags)
+            except (OSError, ValueError, subprocess.SubprocessError) as e:
+                self.logger.warning("Headless launch failed: %s", e)
+                continue
+
+            deadline = time.time() + timeout_sec
+            while time.time() < deadline and proc.poll() is None:
+                try:
+                    lines = port_file.read_text(encoding="ascii").splitlines()
+                    return proc, int(lines[0])
+                except (OSError, ValueError, IndexError):
+                    time.sleep(0.1)
+
+            self._terminate_child(proc)
+        return None, None
+
+    def render_htmls_in_background_browser(self,
+                                           html_files: list,
+                                           max_tabs: int = None,
+                                           timeout_sec: int = 20) -> int:
+        """複数のHTMLを1つのheadlessブラウザでMermaid最終化する.
+
+        Finalize Mermaid rendering for many HTML files; see
+        _render_htmls_in_background_browser. With timings enabled, the
+        duration is written as a "browser" timing record.
+        """
+        started = time.perf_counter()
+        finalized = self._render_htmls_in_background_browser(
+            html_files, max_tabs, timeout_sec)
+        if self.timings and html_files:
+            self.write_timing_record({
+                "type": "browser",
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "files": len(html_files),
+                "finalized": finalized,
+                "stages": {
+                    "total": round(time.perf_counter() - started, 6)
+                },
+            })
+        return finalized
+
+    def _render_htmls_in_background_browser(self,
+                                            html_files: list,
+                                            max_tabs: int = None,
+                                            timeout_sec: int = 20) -> int:
+        """複数のHTMLを1つのheadlessブラウザでMermaid最終化する.
+
+        Finalize Mermaid rendering for many HTML files with a single headless
+        browser. Pages are opened and closed through the DevTools HTTP
+        endpoints with at most ``max_tabs`` tabs open at once. Falls back to
+        one browser launch per file when DevTools cannot be started.
+
+        Parameters
+        ----------
+        html_files : list
+            最終化するHTMLファイルのリスト
+        max_tabs : int, optional
+            同時に開くタブ数の上限（省略時は並列数と4の小さい方）
+        timeout_sec : int
+            1ファイルあたりの待機秒数
+
+        Returns
+        -------
+        int
+            最終化できたファイル数
+        """
+        html_files = [Path(f) for f in html_files]
+        if (not html_files or self.output_format != "html"
+                or self.mermaid_mode != "browser"):
+            return 0
+
+        browser_exe = self._find_headless_browser_executable()
+        if not browser_exe:
+            self.logger.error(
+                "No headless-capable browser found (Edge/Chrome/Chromium)")
+            return 0
+
+        # 全HTMLを配信できるよう共通の親フォルダをサーバのルートにする
+        # （ドライブが異なる場合は各フォルダを追加ルートとして登録）
+        parents = sorted({f.resolve().parent for f in html_files})
+        try:
+            roots = [Path(os.path.commonpath([str(p) for p in parents]))]
+        except ValueError:
+            roots = parents
+        if not self.start_local_server(roots[0]):
+            return 0
+        for extra_root in roots[1:]:
+            self.add_local_server_root(extra_root)
+
+        if max_tabs is None:
+            max_tabs = min(4, self.get_max_workers())
+
+        profile_dir = Path(tempfile.mkdtemp(prefix="pandoc_gui_browser_"))
+        proc, devtools_port = self._launch_devtools_browser(
+            browser_exe, profile_dir)
+        if not proc:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            self.logger.warning(
+                "DevTools browser unavailable, finalizing files one by one")
+            return sum(1 for html_file in html_files
+                       if self.render_html_in_background_browser(
+                           html_file, timeout_sec))
+
+        devtools_url = f"http://127.0.0.1:{devtools_port}"
+
+        def finalize(html_file: Path) -> bool:
+            url = self.get_local_server_url(html_file)
+            if not url:
+                return False
+            saved_event = self._expect_html_save(html_file)
+            try:
+                req = Request(f"{devtools_url}/json/new?{url}", method="PUT")
+                with urlopen(req, timeout=5) as response:
+                    target = json.loads(response.read().decode('utf-8'))
+            except (OSError, ValueError) as e:
+                self._forget_html_save(html_file, saved_event)
+                self.logger.warning("Failed to open browser tab for %s: %s",
+                                    html_file, e)
+                return False
+            try:
+                return self._wait_for_mermaid_finalized(
+                    html_file, timeout_sec, saved_event)
+            finally:
+                try:
+                    with urlopen(f"{devtools_url}/json/close/{target.get('id')}",
+                                 timeout=5):
+                        pass
+                except OSError:
+                    pass
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_tabs)) as executor:
+                results = list(executor.map(finalize, html_files))
+        finally:
+            self._terminate_child(proc)
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+        for parent in {html_file.parent for html_file in html_files}:
+            self.cleanup_output_mermaid_asset(parent)
+
+        finalized = sum(1 for result in results if result)
+        for html_file, result in zip(html_files, results):
+            if not result:
+                self.logger.warning(
+                    "Background Mermaid finalization timeout or incomplete: %s",
+                    html_file)
+        self.logger.info("Mermaid HTML finalized in background: %d/%d",
+                         finalized, len(html_files))
+        return finalized
+
     def get_local_server_url(self, file_path: Path) -> str:
         """ローカルサーバ上のURLを返す.
 
         Build a local server URL for a file under the current output
-        directory.
+        directory or one of the extra roots added with
+        add_local_server_root().
         """
         if not self.server_port or not self.output_dir:
             return None
 
         resolved_path = file_path.resolve()
-        try:
-            relative_path = resolved_path.relative_to(self.output_dir)
-        except ValueError:
-            return None
-
-        encoded_path = "/".join(quote(part) for part in relative_path.parts)
-        return f"http://127.0.0.1:{self.server_port}/{encoded_path}"
+        # 他のスレッドがルートを追加しても反復できるよう写しを使う
+        with self._server_roots_lock:
+            server_roots = dict(self.server_roots)
+        roots = [("", self.output_dir)]
+        roots.extend((f"{LOCAL_SERVER_ROOT_PREFIX}{root_id}/", root)
+                     for root_id, root in server_roots.items())
+        for prefix, root in roots:
+            try:
+                relative_path = resolved_path.relative_to(root)
+            except ValueError:
+                continue
+            encoded_path = "/".join(
+                quote(part) for part in relative_path.parts)
+            return f"http://127.0.0.1:{self.server_port}/{prefix}{encoded_path}"
+        return None
 
     def prepare_browser_mode_server(self, html_file: Path) -> str:
         """browserモード用のローカルサーバを起動し、HTMLのURLを返す.
@@ -531,6 +1276,11 @@ class PandocService:
 
         Start local HTTP server for Mermaid SVG saving.
 
+        サーバは複数スレッドでHTTP/1.1 keep-aliveの要求を処理します。
+        既に起動している場合は再起動せず、ディレクトリを別IDの追加ルート
+        （/_root/<id>/）として登録します。処理中の要求があり得るため、
+        最初のルートは停止するまで切り替えません。
+
         Parameters
         ----------
         directory : Path
@@ -541,14 +1291,21 @@ class PandocService:
         int
             割り当てられたポート番号、失敗時はNone
         """
-        if self.local_server:
-            self.logger.info("Stopping existing local server...")
-            self.stop_local_server()
-
         try:
             if not directory.exists():
                 directory.mkdir(parents=True, exist_ok=True)
+        except (OSError, IOError) as e:
+            self.logger.error("Failed to start local server: %s", e)
+            return None
+
+        if self.local_server:
+            if directory.resolve() != self.output_dir:
+                prefix = self.add_local_server_root(directory)
+                self.logger.info("Local HTTP server root added: %s -> %s",
+                                 prefix, directory.resolve())
+            return self.server_port
 
+        try:
             self.output_dir = directory.resolve()
             logger = self.logger
             service_self = self
@@ -557,11 +1314,42 @@ class PandocService:
                                             ):
                 """Mermaid SVG保存用カスタムHTTPハンドラ."""
 
+                # keep-alive のため全レスポンスで Content-Length を送る
+                protocol_version = "HTTP/1.1"
+                # アイドル状態の keep-alive 接続を閉じるまでの秒数
+                timeout = 30
+                # ヘッダと本文を1回の送信にまとめ、Nagle と遅延ACKによる
+                # 応答ごとの待ち（約40ms）を避ける
+                wbufsize = -1
+                disable_nagle_algorithm = True
+
                 def __init__(self, *args, **kwargs):
                     super().__init__(*args,
-                                     directory=str(directory.resolve()),
+                                     directory=str(service_self.output_dir),
                                      **kwargs)
 
+                def translate_path(self, path):
+                    """URLパスを対応するルート配下のファイルパスに変換する."""
+                    root, rest = service_self.resolve_local_server_path(path)
+                    self.directory = str(root)
+                    return super().translate_path(rest)
+
+                def _send_json(self, status: int, payload: dict):
+                    """JSONレスポンスを送信する."""
+                    body = json.dumps(payload).encode('utf-8')
+                    self.send_response(status)
+                    self.send_header('Content-type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def _send_empty(self, status: int):
+                    """本文なしのレスポンスを送信する."""
+                    self.send_response(status)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+
                 def do_POST(self) -> None:  # pylint: disable=C0103
                     """Handle POST requests to save SVG data / SVGデータを受け取って保存.
                     This method processes POST requests to the '/save-svg'
@@ -582,106 +1370,104 @@ class PandocService:
                         500: Error occurred while processing or saving the SVG
                         404: Request path does not match '/save-svg'
                     """
-                    if self.path.startswith('/save-svg'):
-                        content_length = int(self.headers['Content-Length'])
-                        post_data = self.rfile.read(content_length)
+                    content_length = int(self.headers.get('Content-Length', 0))
+                    post_data = self.rfile.read(content_length)
 
+                    if self.path.startswith('/save-svg'):
                         # JSONとして解析
                         try:
                             data = json.loads(post_data.decode('utf-8'))
                             svg_content = data.get('svg', '')
                             filename = data.get('filename', 'diagram.svg')
 
-                            # SVGファイルを保存
-                            svg_path = directory / filename
+                            # SVGファイルを保存（ルート外は保存しない）
+                            svg_path = (
+                                service_self.resolve_local_server_save_path(
+                                    filename, 'diagram.svg'))
                             with open(svg_path, 'w', encoding='utf-8') as f:
                                 f.write(svg_content)
 
                             logger.info("Saved SVG: %s", svg_path)
 
                             # 成功レスポンス
-                            self.send_response(200)
-                            self.send_header('Content-type', 'application/json')
-                            self.send_header('Access-Control-Allow-Origin', '*')
-                            self.end_headers()
-                            response = json.dumps({'status': 'success'})
-                            self.wfile.write(response.encode('utf-8'))
+                            self._send_json(200, {'status': 'success'})
 
                         except (json.JSONDecodeError, IOError) as e:
                             logger.error("Failed to save SVG: %s", e)
-                            self.send_response(500)
-                            self.end_headers()
+                            self._send_empty(500)
 
                     elif self.path.startswith('/save-html'):
-                        content_length = int(self.headers['Content-Length'])
-                        post_data = self.rfile.read(content_length)
-
                         try:
                             data = json.loads(post_data.decode('utf-8'))
                             html_content = data.get('html', '')
-                            # セキュリティ: ファイル名はベース名のみ許可
-                            filename = os.path.basename(
-                                data.get('filename', 'output.html'))
-                            if not filename.endswith('.html'):
-                                filename = 'output.html'
+                            filename = data.get('filename', 'output.html')
+                            html_path = (
+                                service_self.resolve_local_server_save_path(
+                                    filename, 'output.html'))
 
-                            html_path = directory / filename
                             with open(html_path, 'w', encoding='utf-8') as f:
                                 f.write(html_content)
 
                             logger.info("Saved HTML with inline SVGs: %s",
                                         html_path)
+                            service_self._notify_html_saved(html_path)
 
-                            self.send_response(200)
-                            self.send_header('Content-type', 'application/json')
-                            self.send_header('Access-Control-Allow-Origin', '*')
-                            self.end_headers()
-                            response = json.dumps({'status': 'success'})
-                            self.wfile.write(response.encode('utf-8'))
+                            self._send_json(200, {'status': 'success'})
 
                         except (json.JSONDecodeError, IOError) as e:
                             logger.error("Failed to save HTML: %s", e)
-                            self.send_response(500)
-                            self.end_headers()
+                            self._send_empty(500)
 
                     else:
-                        self.send_response(404)
-                        self.end_headers()
+                        self._send_empty(404)
 
                 def do_GET(self):  # pylint: disable=C0103
                     """必要な静的アセットを仮想パスで配信する."""
                     path_only = self.path.split('?', 1)[0]
                     if path_only.endswith('/mermaid/mermaid.min.js'):
-                        service = service_self
-                        asset_file = service.get_mermaid_browser_asset_path()
-                        if asset_file and asset_file.exists():
-                            try:
-                                with open(asset_file, 'rb') as f:
-                                    content = f.read()
-                                self.send_response(200)
-                                self.send_header(
-                                    'Content-type',
-                                    'application/javascript; charset=utf-8')
-                                self.send_header('Content-Length',
-                                                 str(len(content)))
-                                self.send_header('Cache-Control', 'no-store')
-                                self.end_headers()
-                                self.wfile.write(content)
-                                return
-                            except (OSError, IOError):
-                                self.send_response(500)
-                                self.end_headers()
-                                return
+                        asset = service_self.get_mermaid_browser_asset()
+                        if asset:
+                            self._send_mermaid_asset(asset)
+                            return
                     super().do_GET()
 
+                def _send_mermaid_asset(self, asset: dict):
+                    """メモリ上の mermaid.min.js をキャッシュ可能な形で送信する."""
+                    # ポートはセッションごとに変わるため、同一オリジン内では
+                    # 内容が変わらない前提で長期キャッシュを許可する
+                    cache_control = 'public, max-age=31536000, immutable'
+                    if asset["etag"] in self.headers.get('If-None-Match', ''):
+                        self.send_response(304)
+                        self.send_header('ETag', asset["etag"])
+                        self.send_header('Cache-Control', cache_control)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+
+                    accept_encoding = self.headers.get('Accept-Encoding', '')
+                    use_gzip = 'gzip' in accept_encoding.lower()
+                    body = asset["gzip"] if use_gzip else asset["body"]
+                    self.send_response(200)
+                    self.send_header('Content-type',
+                                     'application/javascript; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.send_header('ETag', asset["etag"])
+                    self.send_header('Cache-Control', cache_control)
+                    self.send_header('Vary', 'Accept-Encoding')
+                    if use_gzip:
+                        self.send_header('Content-Encoding', 'gzip')
+                    self.end_headers()
+                    self.wfile.write(body)
+
                 def log_message(self, fmt, *args):  # pylint: disable=W0221
                     """ログ出力を抑制."""
 
-            class _ReusableTCPServer(socketserver.TCPServer):
+            class _ReusableThreadingHTTPServer(http.server.ThreadingHTTPServer):
                 allow_reuse_address = True
+                daemon_threads = True
 
-            self.local_server = _ReusableTCPServer(("127.0.0.1", 0),
-                                                   MermaidHTTPRequestHandler)
+            self.local_server = _ReusableThreadingHTTPServer(
+                ("127.0.0.1", 0), MermaidHTTPRequestHandler)
             self.server_port = self.local_server.server_address[1]
 
             self.server_thread = threading.Thread(
@@ -698,6 +1484,87 @@ class PandocService:
             self.server_port = None
             return None
 
+    def add_local_server_root(self, directory: Path) -> str:
+        """ローカルサーバに追加のルートディレクトリを登録する.
+
+        Register an extra output root on the running local server so one
+        server can serve several output folders at once.
+
+        Parameters
+        ----------
+        directory : Path
+            追加するルートディレクトリ
+
+        Returns
+        -------
+        str
+            ルートのURLパス接頭辞（例: "/_root/1/"）、サーバ未起動時はNone
+        """
+        if not self.local_server:
+            return None
+        resolved = directory.resolve()
+        with self._server_roots_lock:
+            for root_id, root in self.server_roots.items():
+                if root == resolved:
+                    return f"/{LOCAL_SERVER_ROOT_PREFIX}{root_id}/"
+            root_id = str(len(self.server_roots) + 1)
+            self.server_roots[root_id] = resolved
+        return f"/{LOCAL_SERVER_ROOT_PREFIX}{root_id}/"
+
+    def resolve_local_server_path(self, url_path: str) -> tuple:
+        """URLパスを (ルートディレクトリ, ルート内のURLパス) に分解する.
+
+        Parameters
+        ----------
+        url_path : str
+            リクエストのURLパス
+
+        Returns
+        -------
+        tuple
+            (root: Path, path: str)
+        """
+        prefix = "/" + LOCAL_SERVER_ROOT_PREFIX
+        if url_path.startswith(prefix):
+            root_id, _, rest = url_path[len(prefix):].partition("/")
+            with self._server_roots_lock:
+                root = self.server_roots.get(root_id)
+            if root:
+                return root, "/" + rest
+        return self.output_dir, url_path
+
+    def resolve_local_server_save_path(self, filename: str,
+                                       default_name: str) -> Path:
+        """保存要求のファイル名を対応するルート配下のパスに変換する.
+
+        セキュリティのため、ルート外を指す場合はベース名のみを使い、
+        拡張子が default_name と異なる場合は default_name で保存します。
+
+        Parameters
+        ----------
+        filename : str
+            ブラウザから送られたファイル名（ルートからの相対URLパス）
+        default_name : str
+            不正なファイル名の代わりに使うファイル名
+
+        Returns
+        -------
+        Path
+            保存先のパス（必ずルート配下）
+        """
+        root, rest = self.resolve_local_server_path(
+            "/" + filename.lstrip('/'))
+        root = root.resolve()
+        save_path = (root / rest.lstrip('/')).resolve()
+        try:
+            save_path.relative_to(root)
+        except ValueError:
+            save_path = root / os.path.basename(rest)
+        if (save_path.parent != root and root not in save_path.parents) or \
+                save_path.suffix != Path(default_name).suffix:
+            save_path = root / default_name
+        return save_path
+
     def stop_local_server(self):
         """ローカルHTTPサーバを停止する.
 
@@ -715,63 +1582,645 @@ class PandocService:
                 self.server_port = None
                 self.server_thread = None
                 self.output_dir = None
+                with self._server_roots_lock:
+                    self.server_roots = {}
 
-    def should_exclude(self, relative_path: Path) -> bool:
-        """ファイルパスが除外パターンに一致するかチェックする.
+    def start_plantuml_daemon(self,
+                              java_path: str,
+                              plantuml_jar: str,
+                              timeout_sec: float = 30.0) -> str:
+        """常駐PlantUMLレンダリングサーバ（picoweb）を起動する.
 
-        Check if file path matches exclude patterns.
+        Start a long-lived local PlantUML render server (picoweb mode) so the
+        JVM starts once per session instead of once per diagram.
+
+        同じJava/JARで起動済みかつ稼働中の場合は再利用し、
+        停止していた場合は再起動します。
 
         Parameters
         ----------
-        relative_path : Path
-            チェックするファイルパス (File path to check)
+        java_path : str
+            Java実行ファイルのパス（空の場合は "java"）
+        plantuml_jar : str
+            PlantUML JARのパス
+        timeout_sec : float
+            起動待ちのタイムアウト秒数
 
         Returns
         -------
-        bool
-            除外する場合True (True if should be excluded)
+        str or None
+            サーバのベースURL、起動できない場合はNone
         """
-        path_str = str(relative_path)
-        parts = relative_path.parts
+        java_cmd = java_path or "java"
+        key = (java_cmd, str(plantuml_jar))
+
+        with self._plantuml_daemon_lock:
+            proc = self.plantuml_daemon_proc
+            if proc and proc.poll() is None and self._plantuml_daemon_key == key:
+                return self.plantuml_daemon_url
+            if proc:
+                if proc.poll() is not None:
+                    self.logger.warning(
+                        "PlantUML daemon exited (code=%s), restarting",
+                        proc.returncode)
+                self._stop_plantuml_daemon_locked()
 
-        for pattern in self.exclude_patterns:
-            # ファイル名またはフォルダ名でマッチング
-            if fnmatch(relative_path.name, pattern):
-                return True
-            # パス全体でマッチング
-            if fnmatch(path_str, pattern):
-                return True
-            # パスの各部分でマッチング（フォルダ名での除外用）
-            for part in parts:
-                if fnmatch(part, pattern):
-                    return True
+            # 空きポートを確保してからpicowebに渡す
+            port = self._find_free_port()
 
-        return False
+            creationflags = 0
+            if platform.system() == "Windows":
+                creationflags = CREATE_NO_WINDOW | CREATE_NEW_PROCESS_GROUP
 
-    def create_metadata_file(self,
-                             input_file: Path,
-                             java_path_override: str = None,
-                             plantuml_jar_override: str = None) -> Path:
-        """Java/PlantUML設定用の一時メタデータファイルを作成する.
+            cmd = [
+                java_cmd, "-jar",
+                str(plantuml_jar), f"-picoweb:{port}:127.0.0.1"
+            ]
+            try:
+                proc = self.processes.popen(cmd,
+                                            label="PlantUML daemon",
+                                            persistent=True,
+                                            stdin=subprocess.DEVNULL,
+                                            stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL,
+                                            creationflags=creationflags)
+            except (OSError, ValueError, subprocess.SubprocessError) as e:
+                self.logger.warning("Failed to start PlantUML daemon: %s", e)
+                return None
+
+            # ポートが接続を受け付けるまで待機
+            if not self._wait_for_port(proc, port, timeout_sec):
+                if proc.poll() is not None:
+                    self.logger.warning(
+                        "PlantUML daemon exited during startup (code=%s)",
+                        proc.returncode)
+                else:
+                    self.logger.warning("PlantUML daemon startup timed out")
+                self._terminate_child(proc)
+                return None
 
-        Create temporary metadata file for Java/PlantUML settings.
+            self.plantuml_daemon_proc = proc
+            self.plantuml_daemon_url = f"http://127.0.0.1:{port}/plantuml"
+            self._plantuml_daemon_key = key
+            self.logger.info("PlantUML daemon started (PID: %s): %s",
+                             proc.pid, self.plantuml_daemon_url)
+            return self.plantuml_daemon_url
+
+    def stop_plantuml_daemon(self):
+        """常駐PlantUMLレンダリングサーバを停止する.
+
+        Stop the local PlantUML render server.
+        """
+        with self._plantuml_daemon_lock:
+            self._stop_plantuml_daemon_locked()
+
+    def _stop_plantuml_daemon_locked(self):
+        """ロック取得済みの状態でPlantUMLデーモンを停止する."""
+        proc = self.plantuml_daemon_proc
+        self.plantuml_daemon_proc = None
+        self.plantuml_daemon_url = None
+        self._plantuml_daemon_key = None
+        if proc:
+            self._terminate_child(proc)
+            self.logger.info("PlantUML daemon stopped")
+
+    @staticmethod
+    def _find_free_port() -> int:
+        """ローカルの空きTCPポート番号を返す."""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    @staticmethod
+    def _wait_for_port(proc, port: int, timeout_sec: float) -> bool:
+        """子プロセスのポートが接続を受け付けるまで待機する.
+
+        Wait until the child process accepts connections on the port.
 
         Parameters
         ----------
-        input_file : Path
-            入力ファイルパス (Input file path)
-        java_path_override : str, optional
-            GUI設定のJavaパス（オーバーライド用）
-        plantuml_jar_override : str, optional
-            GUI設定のPlantUML JARパス（オーバーライド用）
+        proc : subprocess.Popen
+            待機対象のプロセス
+        port : int
+            待機するポート番号
+        timeout_sec : float
+            タイムアウト秒数
 
         Returns
         -------
-        Path or None
-            一時メタデータファイルのパス、設定が不要な場合はNone
-            (Path to temporary metadata file, or None if not needed)
+        bool
+            接続できた場合True（プロセス終了・タイムアウト時はFalse）
         """
-        # GUI設定を優先
+        deadline = time.time() + timeout_sec
+        while time.time() < deadline:
+            if proc.poll() is not None:
+                return False
+            try:
+                with socket.create_connection(("127.0.0.1", port),
+                                              timeout=0.5):
+                    return True
+            except OSError:
+                time.sleep(0.1)
+        return False
+
+    def start_pandoc_server(self,
+                            timeout_sec: float = 10.0,
+                            request_timeout_sec: int = 120) -> str:
+        """常駐 pandoc server を起動する.
+
+        Start a long-lived ``pandoc server`` (or ``pandoc-server``) so that
+        filterless conversions skip per-file process startup.
+
+        起動済みかつ稼働中の場合は再利用します。起動できなかった場合は
+        セッション中は再試行せず、サブプロセス変換を使用します。
+
+        Parameters
+        ----------
+        timeout_sec : float
+            起動待ちのタイムアウト秒数
+        request_timeout_sec : int
+            サーバ側の1リクエストあたりのタイムアウト秒数
+
+        Returns
+        -------
+        str or None
+            サーバのベースURL、起動できない場合はNone
+        """
+        with self._pandoc_server_lock:
+            proc = self.pandoc_server_proc
+            if proc and proc.poll() is None:
+                return self.pandoc_server_url
+            if proc:
+                self.logger.warning(
+                    "Pandoc server exited (code=%s), restarting",
+                    proc.returncode)
+                self._stop_pandoc_server_locked()
+            if self._pandoc_server_unavailable:
+                return None
+
+            creationflags = 0
+            if platform.system() == "Windows":
+                creationflags = CREATE_NO_WINDOW | CREATE_NEW_PROCESS_GROUP
+
+            for template in PANDOC_SERVER_COMMANDS:
+                port = self._find_free_port()
+                cmd = [
+                    arg.format(port=port, timeout=request_timeout_sec)
+                    for arg in template
+                ]
+                try:
+                    proc = self.processes.popen(cmd,
+                                                label="pandoc server",
+                                                persistent=True,
+                                                stdin=subprocess.DEVNULL,
+                                                stdout=subprocess.DEVNULL,
+                                                stderr=subprocess.DEVNULL,
+                                                creationflags=creationflags)
+                except (OSError, ValueError,
+                        subprocess.SubprocessError) as e:
+                    self.logger.debug("Cannot start %s: %s", cmd[0], e)
+                    continue
+
+                if self._wait_for_port(proc, port, timeout_sec):
+                    self.pandoc_server_proc = proc
+                    self.pandoc_server_url = f"http://127.0.0.1:{port}/"
+                    self.logger.info("Pandoc server started (PID: %s): %s",
+                                     proc.pid, self.pandoc_server_url)
+                    return self.pandoc_server_url
+
+                self._terminate_child(proc)
+                self.logger.debug("%s did not start (code=%s)",
+                                  " ".join(cmd[:2]), proc.returncode)
+
+            self._pandoc_server_unavailable = True
+            self.logger.warning(
+                "Pandoc server is not available, using pandoc subprocesses")
+            return None
+
+    def stop_pandoc_server(self):
+        """常駐 pandoc server を停止する.
+
+        Stop the long-lived pandoc server.
+        """
+        with self._pandoc_server_lock:
+            self._stop_pandoc_server_locked()
+
+    def _stop_pandoc_server_locked(self):
+        """ロック取得済みの状態で pandoc server を停止する."""
+        proc = self.pandoc_server_proc
+        self.pandoc_server_proc = None
+        self.pandoc_server_url = None
+        if proc:
+            self._terminate_child(proc)
+            self.logger.info("Pandoc server stopped")
+
+    def should_exclude(self, relative_path: Path) -> bool:
+        """ファイルパスが除外パターンに一致するかチェックする.
+
+        Check if file path matches exclude patterns.
+
+        Parameters
+        ----------
+        relative_path : Path
+            チェックするファイルパス (File path to check)
+
+        Returns
+        -------
+        bool
+            除外する場合True (True if should be excluded)
+        """
+        return self.get_exclude_matcher().matches(relative_path)
+
+    def get_exclude_matcher(self) -> ExcludeMatcher:
+        """現在の除外パターンをコンパイルした照合器を返す.
+
+        Return the compiled matcher for the current exclude patterns,
+        rebuilding it only when the patterns have changed.
+        """
+        matcher = self._exclude_matcher
+        if matcher.patterns != tuple(self.exclude_patterns):
+            matcher = ExcludeMatcher(self.exclude_patterns)
+            self._exclude_matcher = matcher
+        return matcher
+
+    def iter_folder_files(self, input_folder: Path):
+        """除外フォルダを辿らずにフォルダ内のファイルを列挙する.
+
+        Walk ``input_folder`` with os.scandir, pruning excluded directories
+        before descending into them. Directory symlinks are not followed
+        (same as Path.rglob). Files are yielded in sorted path order.
+
+        Parameters
+        ----------
+        input_folder : Path
+            走査するフォルダ
+
+        Yields
+        ------
+        tuple
+            (relative_path: Path, entry: os.DirEntry)
+        """
+        matcher = self.get_exclude_matcher()
+
+        def walk(directory, relative_dir: Path):
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it,
+                                     key=lambda e: os.path.normcase(e.name))
+            except OSError as e:
+                self.logger.warning("Failed to scan folder: %s, %s",
+                                    directory, e)
+                return
+            for entry in entries:
+                relative_path = relative_dir / entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    # フォルダ名が一致すれば配下のファイルはすべて除外される
+                    if not matcher.matches_name(entry.name):
+                        yield from walk(entry.path, relative_path)
+                elif entry.is_file() and not matcher.matches_file(
+                        relative_path):
+                    yield relative_path, entry
+
+        yield from walk(input_folder, Path())
+
+    def get_diagram_cache_dir(self) -> Path:
+        """図のSVGキャッシュディレクトリを返す.
+
+        Return the directory of the rendered diagram (SVG) cache.
+        """
+        return DATA_DIR / "cache" / "diagrams"
+
+    def get_diagram_renderer_versions(self, java_path: str,
+                                      plantuml_jar: str) -> tuple:
+        """キャッシュキー用のレンダラ識別子を返す.
+
+        Return renderer identifiers used as part of the diagram cache key.
+
+        実行ファイル/JARのパス・サイズ・更新日時から作るため、
+        レンダラを更新するとキャッシュは自動的に無効になります。
+
+        Parameters
+        ----------
+        java_path : str
+            Java実行ファイルのパス
+        plantuml_jar : str
+            PlantUML JARのパス
+
+        Returns
+        -------
+        tuple
+            (mermaid_version: str, plantuml_version: str)
+        """
+
+        def describe(path):
+            if not path:
+                return "none"
+            try:
+                resolved = Path(path).resolve()
+                stat = resolved.stat()
+                return f"{resolved}:{stat.st_size}:{stat.st_mtime_ns}"
+            except (OSError, IOError):
+                return str(path)
+
+        mermaid_info = describe(shutil.which("mmdc"))
+        if self.plantuml_use_server:
+            plantuml_info = f"server:{self.plantuml_server_url}"
+        else:
+            plantuml_info = (f"jar:{describe(plantuml_jar)}:"
+                             f"java:{java_path or 'java'}")
+
+        def digest(text):
+            return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+        return (digest(mermaid_info), digest(plantuml_info))
+
+    def prune_diagram_cache(self, force: bool = False) -> int:
+        """図のSVGキャッシュを期限・容量に従って削除する.
+
+        Evict diagram cache entries by age and total size.
+
+        max_age_days より古いエントリを削除し、合計サイズが max_mb を
+        超える場合は古いものから削除します。force=False の場合は
+        10分以内の再実行を省略します。
+
+        Parameters
+        ----------
+        force : bool
+            間隔に関係なく実行する場合True
+
+        Returns
+        -------
+        int
+            削除したエントリ数
+        """
+        with self._diagram_cache_lock:
+            now = time.time()
+            if (not force and self._diagram_cache_pruned_at
+                    and now - self._diagram_cache_pruned_at < 600):
+                return 0
+            self._diagram_cache_pruned_at = now
+
+        removed = self._prune_cache_dir(self.get_diagram_cache_dir(),
+                                        self.diagram_cache_max_age_days,
+                                        self.diagram_cache_max_mb)
+        if removed:
+            self.logger.info("Evicted %d diagram cache entries", removed)
+        return removed
+
+    def _prune_cache_dir(self, cache_dir: Path, max_age_days: int,
+                         max_mb: int) -> int:
+        """キャッシュディレクトリ直下のファイルを期限・容量に従って削除する.
+
+        Evict files directly under ``cache_dir`` that are older than
+        ``max_age_days``, then the oldest ones while the total size exceeds
+        ``max_mb``. Subdirectories are left alone.
+
+        Returns
+        -------
+        int
+            削除したファイル数
+        """
+        if not cache_dir.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        try:
+            with os.scandir(cache_dir) as it:
+                for entry in it:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append(
+                            (stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            self.logger.warning("Failed to scan cache %s: %s", cache_dir, e)
+            return 0
+
+        max_age = (max_age_days or 0) * 86400
+        max_bytes = (max_mb or 0) * 1024 * 1024
+        entries.sort()
+        total_size = sum(size for _mtime, size, _path in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = max_age and now - mtime > max_age
+            oversized = max_bytes and total_size > max_bytes
+            if not expired and not oversized:
+                continue
+            try:
+                os.remove(path)
+                total_size -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def get_ast_cache_dir(self) -> Path:
+        """フィルタ適用済みASTのキャッシュディレクトリを返す.
+
+        Return the directory of the filtered pandoc AST cache.
+        """
+        return DATA_DIR / "cache" / "ast"
+
+    def prune_ast_cache(self, force: bool = False) -> int:
+        """ASTキャッシュを期限・容量に従って削除する.
+
+        Evict AST cache entries by age and total size.
+
+        Parameters
+        ----------
+        force : bool
+            間隔に関係なく実行する場合True
+
+        Returns
+        -------
+        int
+            削除したエントリ数
+        """
+        with self._ast_cache_lock:
+            now = time.time()
+            if (not force and self._ast_cache_pruned_at
+                    and now - self._ast_cache_pruned_at < 600):
+                return 0
+            self._ast_cache_pruned_at = now
+
+        removed = self._prune_cache_dir(self.get_ast_cache_dir(),
+                                        self.ast_cache_max_age_days,
+                                        self.ast_cache_max_mb)
+        if removed:
+            self.logger.info("Evicted %d AST cache entries", removed)
+        return removed
+
+    def use_ast_cache(self, input_file: Path) -> bool:
+        """入力ファイルの変換でASTキャッシュを使用するかを判定する.
+
+        The cache is used when it is enabled and Lua filters run (they are
+        what the cache saves), and not for DOCX/EPUB input, which keeps its
+        embedded media only in a direct conversion.
+        """
+        return bool(self.ast_cache and self.enabled_filters
+                    and input_file.suffix.lower()
+                    not in BINARY_INPUT_EXTENSIONS)
+
+    def get_ast_cache_key(self, input_file: Path, metadata_args: list) -> str:
+        """フィルタ適用済みASTのキャッシュキーを作成する.
+
+        Build the AST cache key from the input content, the input folder
+        (relative image and include paths are resolved against it), the
+        reader, the filter chain (paths and contents), the filter metadata
+        and the pandoc executable. Writer options such as CSS or the PDF
+        engine are not part of the key.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス
+        metadata_args : list
+            build_metadata_args で作成したメタデータ引数
+
+        Returns
+        -------
+        str
+            キャッシュキー（SHA-256）
+
+        Raises
+        ------
+        OSError
+            入力ファイルを読めない場合
+        """
+
+        def describe(path):
+            if not path:
+                return None
+            path = Path(path)
+            try:
+                resolved = path.resolve()
+                stat = resolved.stat()
+                return [str(resolved), stat.st_size, stat.st_mtime_ns]
+            except (OSError, IOError):
+                return [str(path), None, None]
+
+        # 常駐サーバのURL等、出力に影響しない値はキーに含めない
+        metadata = [
+            value for key, value in zip(metadata_args[::2],
+                                        metadata_args[1::2])
+            if key != "-M" or value.split("=", 1)[0] not in
+            AST_CACHE_VOLATILE_METADATA
+        ]
+        filters = []
+        for f in self.enabled_filters:
+            try:
+                filters.append([str(Path(f).resolve()), hash_file(Path(f))])
+            except (OSError, IOError):
+                filters.append([str(f), None])
+
+        key = {
+            "input": hash_file(input_file),
+            "directory": str(input_file.resolve().parent),
+            "reader": input_file.suffix.lower(),
+            "filters": filters,
+            "metadata": metadata,
+            "pandoc": describe(shutil.which("pandoc")),
+        }
+        encoded = json.dumps(key, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _load_cached_ast(self, cache_file: Path, ast_file: Path) -> bool:
+        """キャッシュ済みASTを作業用のパスへリンク（またはコピー）する."""
+        if not cache_file.exists():
+            return False
+        try:
+            try:
+                os.link(cache_file, ast_file)
+            except OSError:
+                shutil.copyfile(cache_file, ast_file)
+            # 使用したエントリを新しく扱う（容量超過時は古いものから削除）
+            os.utime(cache_file)
+        except OSError as e:
+            self.logger.warning("Failed to read AST cache: %s", e)
+            return False
+        return True
+
+    @staticmethod
+    def _dependencies_sidecar(cache_file: Path) -> Path:
+        """キャッシュ済みASTの参照ファイル一覧のパスを返す."""
+        return cache_file.with_suffix(".deps.json")
+
+    def _load_cached_dependencies(self, cache_file: Path) -> list:
+        """キャッシュ済みASTの作成時に収集した参照ファイルを読み込む.
+
+        Returns
+        -------
+        list or None
+            [(kind, path), ...]、記録がない場合はNone
+        """
+        try:
+            with open(self._dependencies_sidecar(cache_file),
+                      "r",
+                      encoding="utf-8") as f:
+                return [tuple(item) for item in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _store_cached_dependencies(self, cache_file: Path, files: set):
+        """ASTの作成時に収集した参照ファイルをキャッシュに保存する."""
+        sidecar = self._dependencies_sidecar(cache_file)
+        temp_file = sidecar.with_name(
+            f".{sidecar.name}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(sorted(files), f, ensure_ascii=False)
+            os.replace(temp_file, sidecar)
+        except OSError as e:
+            self.logger.warning("Failed to store AST cache: %s", e)
+
+    def _store_cached_ast(self, ast_file: Path, cache_file: Path):
+        """作成したASTをキャッシュに保存する."""
+        temp_file = cache_file.with_name(
+            f".{cache_file.name}.{threading.get_ident()}.tmp")
+        try:
+            try:
+                os.link(ast_file, temp_file)
+            except OSError:
+                shutil.copyfile(ast_file, temp_file)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            self.logger.warning("Failed to store AST cache: %s", e)
+            try:
+                temp_file.unlink()
+            except OSError:
+                pass
+
+    def _mentions_plantuml(self, input_file: Path) -> bool:
+        """入力ファイルにPlantUMLブロックが含まれる可能性があるか判定する.
+
+        大きなファイルも一定のメモリで調べられるよう、境界をまたぐ一致を
+        見逃さない分だけ重ねながら一定サイズずつ読み込みます。
+        """
+        marker = b"plantuml"
+        tail = b""
+        try:
+            with open(input_file, "rb") as f:
+                while True:
+                    chunk = f.read(PLANTUML_SCAN_CHUNK)
+                    if not chunk:
+                        return False
+                    if marker in tail + chunk:
+                        return True
+                    tail = chunk[-(len(marker) - 1):]
+        except (OSError, IOError):
+            return False
+
+    def _resolve_plantuml_paths(self,
+                                java_path_override: str = None,
+                                plantuml_jar_override: str = None) -> tuple:
+        """GUI設定・プロファイル・環境変数の順でJava/PlantUML JARのパスを決める.
+
+        Returns
+        -------
+        tuple
+            (java_path: str, plantuml_jar: str)、未設定の場合は空文字列
+        """
+        # GUI設定を優先
         final_java_path = java_path_override or (str(self.java_path)
                                                  if self.java_path else "")
         final_plantuml_jar = plantuml_jar_override or (str(
@@ -782,11 +2231,72 @@ class PandocService:
             final_java_path = os.getenv("JAVA_PATH") or ""
         if not final_plantuml_jar:
             final_plantuml_jar = os.getenv("PLANTUML_JAR") or ""
+        return (final_java_path, final_plantuml_jar)
+
+    def _uses_plantuml_daemon(self, plantuml_jar: str) -> bool:
+        """JAR方式で常駐PlantUMLサーバを使う設定か判定する."""
+        return (not self.plantuml_use_server and self.plantuml_daemon
+                and bool(plantuml_jar) and Path(plantuml_jar).exists())
+
+    def prestart_plantuml_daemon(self,
+                                 java_path_override: str = None,
+                                 plantuml_jar_override: str = None) -> str:
+        """並列変換の開始前に常駐PlantUMLサーバを起動しておく.
+
+        Start the PlantUML daemon once on the calling thread, so that the
+        conversion workers find it running instead of waiting for the JVM
+        to start inside a worker.
+
+        Returns
+        -------
+        str or None
+            サーバのベースURL、使用しない・起動できない場合はNone
+        """
+        final_java_path, final_plantuml_jar = self._resolve_plantuml_paths(
+            java_path_override, plantuml_jar_override)
+        if not self._uses_plantuml_daemon(final_plantuml_jar):
+            return None
+        return self.start_plantuml_daemon(final_java_path, final_plantuml_jar)
+
+    def build_metadata_args(self,
+                            input_file: Path,
+                            java_path_override: str = None,
+                            plantuml_jar_override: str = None) -> list:
+        """Java/PlantUML等のフィルタ設定を渡す --metadata 引数を作成する.
+
+        Build ``-M key=value`` arguments carrying the Java/PlantUML and
+        diagram settings for the Lua filters. The input document is passed
+        to pandoc untouched.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス (Input file path)
+        java_path_override : str, optional
+            GUI設定のJavaパス（オーバーライド用）
+        plantuml_jar_override : str, optional
+            GUI設定のPlantUML JARパス（オーバーライド用）
+
+        Returns
+        -------
+        list
+            pandocに渡す引数のリスト、設定が不要な場合は空リスト
+            (List of pandoc arguments, empty if no settings are needed)
+        """
+        final_java_path, final_plantuml_jar = self._resolve_plantuml_paths(
+            java_path_override, plantuml_jar_override)
 
         # PlantUMLサーバ設定
         use_server = self.plantuml_use_server
         server_url = self.plantuml_server_url if use_server else ""
 
+        # JAR方式では常駐PlantUMLサーバを使用（PlantUMLを含む文書のみ起動）
+        daemon_url = None
+        if (self._uses_plantuml_daemon(final_plantuml_jar)
+                and self._mentions_plantuml(input_file)):
+            daemon_url = self.start_plantuml_daemon(final_java_path,
+                                                    final_plantuml_jar)
+
         # Mermaidモード設定
         mermaid_mode = self.mermaid_mode
 
@@ -794,67 +2304,104 @@ class PandocService:
         # diaglam.lua defaults to mmdc, so browser mode must keep metadata
         # injection to override the filter default.
         no_settings = (not final_java_path and not final_plantuml_jar
-                       and not use_server and mermaid_mode == "mmdc")
+                       and not use_server and mermaid_mode == "mmdc"
+                       and not self.diagram_cache
+                       and self.diagram_embed == "base64"
+                       and not self.timings
+                       and not self._collecting_dependencies())
         if no_settings:
-            return None
-
-        # 一時ファイルを作成
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.md', text=True)
-        temp_file = Path(temp_path)
+            return []
 
-        try:
-            yaml_lines = []
-            yaml_lines.append("---\n")
-
-            # Mermaidモード設定
-            if mermaid_mode:
-                yaml_lines.append(f"mermaid_mode: {mermaid_mode}\n")
-
-            if use_server:
-                # PlantUMLサーバを使用
-                yaml_lines.append("plantuml_server: true\n")
-                if server_url:
-                    yaml_lines.append(f"plantuml_server_url: {server_url}\n")
-            else:
-                # JAR方式を使用
-                if final_java_path:
-                    # Windowsパスをフォワードスラッシュに変換（YAMLで安全）
-                    forward_slash_path = final_java_path.replace('\\', '/')
-                    yaml_lines.append(f"java_path: {forward_slash_path}\n")
-                if final_plantuml_jar:
-                    # Windowsパスをフォワードスラッシュに変換（YAMLで安全）
-                    forward_slash_path = final_plantuml_jar.replace('\\', '/')
-                    yaml_lines.append(f"plantuml_jar: {forward_slash_path}\n")
-            yaml_lines.append("---\n\n")
-
-            with open(temp_fd, 'w', encoding='utf-8') as f:
-                # YAMLメタデータを書き込む
-                f.writelines(yaml_lines)
-
-                # 元のファイル内容を追記
-                with open(input_file, 'r', encoding='utf-8') as input_f:
-                    content = input_f.read()
-                    # 元のファイルに既にYAMLメタデータがある場合は削除
-                    if content.startswith('---\n'):
-                        parts = content.split('---\n', 2)
-                        if len(parts) >= 3:
-                            content = parts[2]
-                    f.write(content)
-
-            return temp_file
+        metadata = {}
 
-        except (OSError, IOError) as e:
-            self.logger.error(f"Failed to create temp metadata file: {e}")
+        # Mermaidモード設定
+        if mermaid_mode:
+            metadata["mermaid_mode"] = mermaid_mode
+
+        if use_server:
+            # PlantUMLサーバを使用
+            metadata["plantuml_server"] = "true"
+            if server_url:
+                metadata["plantuml_server_url"] = server_url
+        else:
+            # JAR方式を使用
+            if final_java_path:
+                # Windowsパスをフォワードスラッシュに変換
+                metadata["java_path"] = final_java_path.replace('\\', '/')
+            if final_plantuml_jar:
+                # Windowsパスをフォワードスラッシュに変換
+                metadata["plantuml_jar"] = final_plantuml_jar.replace(
+                    '\\', '/')
+            if daemon_url:
+                metadata["plantuml_daemon_url"] = daemon_url
+
+        # 図の描画ごとのタイミングイベントを出力させる
+        if self.timings:
+            metadata["pandoc_gui_timings"] = "true"
+
+        # PlantUML JAR・mermaid.min.js の使用を通知させる
+        if self._collecting_dependencies():
+            metadata["pandoc_gui_dependencies"] = "true"
+
+        # 図の埋め込み方式（既定のbase64以外の場合のみ指定）
+        if self.diagram_embed != "base64":
+            metadata["diagram_embed"] = self.diagram_embed
+
+        # 図のSVGキャッシュ設定（ディレクトリを作れない場合はキャッシュなし）
+        if self.diagram_cache:
+            cache_dir = self.get_diagram_cache_dir()
             try:
-                temp_file.unlink()
-            except (OSError, IOError):
-                pass
-            return None
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                mermaid_version, plantuml_version = (
+                    self.get_diagram_renderer_versions(
+                        final_java_path, final_plantuml_jar))
+                metadata["diagram_cache_dir"] = str(cache_dir).replace(
+                    '\\', '/')
+                metadata["mermaid_renderer_version"] = mermaid_version
+                metadata["plantuml_renderer_version"] = plantuml_version
+            except (OSError, IOError) as e:
+                self.logger.warning("Diagram cache disabled: %s", e)
+
+        # -M は文書内のYAMLメタデータより優先される
+        args = []
+        for key, value in metadata.items():
+            args.extend(["-M", f"{key}={value}"])
+        return args
+
+    def needs_extract_media(self,
+                            input_file: Path,
+                            output_format: str = None) -> bool:
+        """--extract-media が必要な変換かを判定する.
+
+        Return True when the conversion extracts embedded media.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス
+        output_format : str, optional
+            出力形式（省略時は output_format 設定）
+
+        Returns
+        -------
+        bool
+            メディア抽出が必要な場合True
+        """
+        output_format = output_format or self.output_format
+        input_format = input_file.suffix.lower().lstrip('.')
+        extract_media_conditions = [
+            (input_format == "docx" and output_format == "markdown"),
+            (input_format == "docx" and output_format == "html"),
+            (input_format == "html" and output_format == "markdown"),
+        ]
+        return any(extract_media_conditions)
 
     def build_pandoc_command(self,
                              input_file: Path,
                              output_file: Path,
-                             temp_metadata_file: Path = None) -> list:
+                             metadata_args: list = None,
+                             output_format: str = None,
+                             ast_file: Path = None) -> list:
         """Pandocコマンドを構築する.
 
         Build Pandoc command.
@@ -865,67 +2412,616 @@ class PandocService:
             入力ファイルパス
         output_file : Path
             出力ファイルパス
-        temp_metadata_file : Path, optional
-            一時メタデータファイル
+        metadata_args : list, optional
+            build_metadata_args で作成したメタデータ引数
+        output_format : str, optional
+            出力形式（省略時は output_format 設定）
+        ast_file : Path, optional
+            build_ast_command で作成済みのJSON AST。指定時はASTから
+            出力のみを行い、メタデータ引数とLuaフィルタは適用しない
 
         Returns
         -------
         list
             コマンドリスト
         """
-        actual_input = temp_metadata_file if temp_metadata_file else input_file
-        cmd = ["pandoc", str(actual_input), "-o", str(output_file)]
+        output_format = output_format or self.output_format
+        if ast_file:
+            # ASTは作業フォルダにあるため、画像等は入力ファイルを直接変換する
+            # 場合と同じく作業ディレクトリと入力ファイルのフォルダから探す
+            cmd = [
+                "pandoc",
+                str(ast_file), "-f", "json", "-o",
+                str(output_file), "--resource-path",
+                os.pathsep.join([".", str(input_file.resolve().parent)])
+            ]
+        else:
+            cmd = ["pandoc", str(input_file), "-o", str(output_file)]
+            if metadata_args:
+                cmd.extend(metadata_args)
+
+            cmd.extend(self.build_filter_args())
+
+        if self.needs_extract_media(input_file, output_format):
+            # 出力ファイルと同じディレクトリにmediaフォルダを作成
+            media_dir = output_file.parent / "media"
+            cmd.extend(["--extract-media", str(media_dir)])
+
+        # CSSを適用（DOCX以外）
+        if (output_format != "docx" and self.css_file
+                and self.css_file.exists()):
+            cmd.extend(["--css", str(self.css_file)])
 
+        # PDF変換時は日本語対応のPDFエンジンを使用
+        if output_format == "pdf":
+            cmd.extend(["--pdf-engine=lualatex"])
+            # 日本語対応のLaTeXテンプレート変数を設定
+            cmd.extend(["-V", "documentclass=ltjsarticle"])
+
+        # スタンドアロン形式（HTML, PDF, EPUB）
+        if output_format in ["html", "pdf", "epub"]:
+            cmd.append("--standalone")
+
+            # HTML出力時は数式レンダリングにMathJaxを使用
+            if output_format == "html":
+                cmd.append("--mathjax")
+
+            # 埋め込みモードの場合はリソースも埋め込む
+            if self.css_file and self.css_file.exists() and self.embed_css:
+                cmd.append("--embed-resources")
+
+        return cmd
+
+    def build_ast_command(self,
+                          input_file: Path,
+                          ast_file: Path,
+                          metadata_args: list = None) -> list:
+        """入力を解析・フィルタ適用してJSON ASTに出力するコマンドを構築する.
+
+        Build the command that parses the input and runs the Lua filters
+        once, writing the result as pandoc JSON AST.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス
+        ast_file : Path
+            JSON AST の出力先
+        metadata_args : list, optional
+            build_metadata_args で作成したメタデータ引数
+
+        Returns
+        -------
+        list
+            コマンドリスト
+        """
+        cmd = ["pandoc", str(input_file), "-t", "json", "-o", str(ast_file)]
+        if metadata_args:
+            cmd.extend(metadata_args)
+
+        cmd.extend(self.build_filter_args())
+
+        return cmd
+
+    def build_filter_args(self) -> list:
+        """有効なLuaフィルタの --lua-filter 引数を作成する.
+
+        Build the ``--lua-filter`` arguments. With timings enabled, a marker
+        filter is placed before and after every filter so that the time of
+        reading, of each filter and of writing can be told apart. While
+        dependencies are collected, the dependency filter runs first so that
+        only files referenced by the document itself are reported.
+
+        Returns
+        -------
+        list
+            pandocに渡す引数のリスト
+        """
+        args = []
+        if self._collecting_dependencies():
+            dependency_filter = self.prepare_dependency_filter()
+            if dependency_filter:
+                args.extend(["--lua-filter", str(dependency_filter)])
+        mark = self.prepare_timing_mark_filter() if self.timings else None
+        if mark:
+            args.extend(["--lua-filter", str(mark)])
         for f in self.enabled_filters:
-            cmd.extend(["--lua-filter", str(f)])
+            args.extend(["--lua-filter", str(f)])
+            if mark:
+                args.extend(["--lua-filter", str(mark)])
+        return args
+
+    def get_timing_mark_filter_path(self) -> Path:
+        """タイミング計測用マーカーフィルタのパスを返す."""
+        return DATA_DIR / "cache" / "timing_mark.lua"
+
+    def prepare_timing_mark_filter(self) -> Path:
+        """タイミング計測用マーカーフィルタを作成してパスを返す.
+
+        Returns
+        -------
+        Path or None
+            マーカーフィルタのパス、作成できない場合はNone
+        """
+        try:
+            return self._write_generated_filter(
+                self.get_timing_mark_filter_path(), TIMING_MARK_FILTER)
+        except OSError as e:
+            self.logger.warning("Timing marker filter unavailable: %s", e)
+            return None
+
+    def get_dependency_filter_path(self) -> Path:
+        """参照ファイル通知フィルタのパスを返す."""
+        return DATA_DIR / "cache" / "dependencies.lua"
+
+    def prepare_dependency_filter(self) -> Path:
+        """参照ファイル通知フィルタを作成してパスを返す.
+
+        Returns
+        -------
+        Path or None
+            フィルタのパス、作成できない場合はNone
+        """
+        try:
+            return self._write_generated_filter(
+                self.get_dependency_filter_path(), DEPENDENCY_FILTER)
+        except OSError as e:
+            self.logger.warning("Dependency filter unavailable: %s", e)
+            return None
+
+    @staticmethod
+    def _write_generated_filter(path: Path, content: str) -> Path:
+        """自動生成フィルタを内容が異なる場合のみ書き込む.
+
+        Raises
+        ------
+        OSError
+            書き込めない場合
+        """
+        if not path.exists() or path.read_text(encoding="utf-8") != content:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(
+                f".{path.name}.{threading.get_ident()}.tmp")
+            temp_path.write_text(content, encoding="utf-8")
+            os.replace(temp_path, path)
+        return path
+
+    @contextmanager
+    def _collect_dependencies(self):
+        """このスレッドの変換が参照したファイルを集める.
+
+        Yields a set of ``(kind, path)`` pairs filled from the events of the
+        filters while the block runs. Nested calls share the outer set.
+        """
+        current = getattr(self._dependencies, "files", None)
+        if current is not None:
+            yield current
+            return
+        files = set()
+        self._dependencies.files = files
+        try:
+            yield files
+        finally:
+            self._dependencies.files = None
+
+    def _collecting_dependencies(self) -> bool:
+        """このスレッドで依存ファイルを収集中か."""
+        return getattr(self._dependencies, "files", None) is not None
+
+    def _record_dependencies(self, events: list):
+        """フィルタが通知した参照ファイルを収集中の集合に加える."""
+        files = getattr(self._dependencies, "files", None)
+        if files is None:
+            return
+        for _received, event in events:
+            if event.get("uses") == "mermaid_js":
+                asset = self.get_mermaid_browser_asset_path()
+                if asset:
+                    files.add(("script", os.path.abspath(asset)))
+            elif event.get("dependency"):
+                files.add((event.get("kind", "resource"),
+                           os.path.abspath(str(event["dependency"]))))
+
+    def get_timings_file(self) -> Path:
+        """タイミング記録（JSON Lines）の出力先を返す."""
+        if self.timings_file:
+            return Path(self.timings_file)
+        return DATA_DIR / "log" / "timings.jsonl"
+
+    def write_timing_record(self, record: dict):
+        """タイミング記録を1行のJSONとして追記する.
+
+        Append a timing record as one JSON line.
+
+        Parameters
+        ----------
+        record : dict
+            記録する内容
+        """
+        path = self.get_timings_file()
+        line = json.dumps(record, ensure_ascii=False, sort_keys=True)
+        try:
+            with self._timing_lock:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            self.logger.warning("Failed to write timing record: %s", e)
+
+    @contextmanager
+    def _timing_record(self, input_file: Path, outputs: dict):
+        """1ファイル分の変換のタイミング記録を開始する.
+
+        Collect the stage timings of one conversion on the current thread
+        and write the record when the outermost conversion finishes. Yields
+        the record, or None when timings are disabled.
+        """
+        current = getattr(self._timing, "record", None)
+        if not self.timings or current is not None:
+            yield current
+            return
+
+        record = {
+            "type": "file",
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "input": str(input_file),
+            "outputs": {fmt: str(path) for fmt, path in outputs.items()},
+            "stages": {},
+        }
+        try:
+            record["input_bytes"] = input_file.stat().st_size
+        except OSError:
+            record["input_bytes"] = None
+        self._timing.record = record
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._timing.record = None
+            record["stages"]["total"] = round(time.perf_counter() - started,
+                                              6)
+            output_bytes = 0
+            for path in outputs.values():
+                try:
+                    output_bytes += Path(path).stat().st_size
+                except OSError:
+                    pass
+            record["output_bytes"] = output_bytes
+            self.write_timing_record(record)
+
+    def _add_timing(self, name: str, seconds: float, record: dict = None):
+        """現在のタイミング記録にステージの所要時間を加算する."""
+        record = record or getattr(self._timing, "record", None)
+        if record is None:
+            return
+        with self._timing_lock:
+            stages = record["stages"]
+            stages[name] = round(stages.get(name, 0) + seconds, 6)
+
+    @contextmanager
+    def _timed_stage(self, name: str):
+        """with ブロックの所要時間を現在のタイミング記録に加算する."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_timing(name, time.perf_counter() - started)
+
+    def _record_pandoc_timing(self, stage: str, cmd: list, started: float,
+                              finished: float, events: list):
+        """pandoc 1回分の所要時間とフィルタのイベントを記録する.
+
+        Record the wall time of one pandoc run under ``stage``, split into
+        reading, each Lua filter and writing by the marker events, and
+        aggregate the diagram render events.
+        """
+        record = getattr(self._timing, "record", None)
+        if record is None:
+            return
+
+        self._add_timing(stage, finished - started, record)
+
+        # マーカーは読み込み完了時と各フィルタの完了時に出力される
+        generated = (str(self.get_timing_mark_filter_path()),
+                     str(self.get_dependency_filter_path()))
+        filters = [
+            Path(arg).name
+            for flag, arg in zip(cmd, cmd[1:])
+            if flag == "--lua-filter" and arg not in generated
+        ]
+        marks = [received for received, event in events if event.get("mark")]
+        if marks:
+            self._add_timing("read", marks[0] - started, record)
+            for name, begin, end in zip(filters, marks, marks[1:]):
+                self._add_timing(f"filter:{name}", end - begin, record)
+            self._add_timing("write", finished - marks[-1], record)
+
+        # 図の描画（start/end の組）
+        begun = None
+        with self._timing_lock:
+            diagrams = record.setdefault("diagrams", {
+                "count": 0,
+                "seconds": 0.0,
+                "by_source": {}
+            })
+            for received, event in events:
+                if "diagram" not in event:
+                    continue
+                if event.get("phase") == "start":
+                    begun = received
+                    continue
+                if event.get("phase") != "end" or begun is None:
+                    continue
+                seconds = received - begun
+                begun = None
+                source = f"{event['diagram']}:{event.get('source', 'unknown')}"
+                entry = diagrams["by_source"].setdefault(
+                    source, {
+                        "count": 0,
+                        "seconds": 0.0
+                    })
+                entry["count"] += 1
+                entry["seconds"] = round(entry["seconds"] + seconds, 6)
+                if event["diagram"] != "mermaid_batch":
+                    diagrams["count"] += 1
+                diagrams["seconds"] = round(diagrams["seconds"] + seconds, 6)
+
+    def can_use_pandoc_server(self,
+                              input_file: Path,
+                              output_format: str = None) -> bool:
+        """pandoc server で変換できる設定かを判定する.
+
+        Check whether the conversion can run on the pandoc server. The server
+        runs conversions without file system or process access, so Lua
+        filters, media extraction, embedded resources and PDF output fall
+        back to the subprocess path.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス
+        output_format : str, optional
+            出力形式（省略時は output_format 設定）
+
+        Returns
+        -------
+        bool
+            pandoc server を使用できる場合True
+        """
+        output_format = output_format or self.output_format
+        if self.enabled_filters:
+            return False
+        if output_format not in PANDOC_SERVER_OUTPUT_FORMATS:
+            return False
+        if input_file.suffix.lower() not in PANDOC_SERVER_INPUT_FORMATS:
+            return False
+        if self.needs_extract_media(input_file, output_format):
+            return False
+        if (output_format == "html" and self.embed_css
+                and self.css_file and self.css_file.exists()):
+            return False
+        return True
+
+    def build_pandoc_server_request(self,
+                                    input_file: Path,
+                                    text: str,
+                                    output_format: str = None) -> dict:
+        """pandoc server へ送る変換リクエストを構築する.
+
+        Build the JSON request for the pandoc server, mirroring the options
+        of build_pandoc_command.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス
+        text : str
+            入力ファイルの内容
+        output_format : str, optional
+            出力形式（省略時は output_format 設定）
+
+        Returns
+        -------
+        dict
+            リクエストボディ
+        """
+        output_format = output_format or self.output_format
+        request = {
+            "text": text,
+            "from": PANDOC_SERVER_INPUT_FORMATS[input_file.suffix.lower()],
+            "to": output_format,
+        }
+        if output_format == "html":
+            request["standalone"] = True
+            request["html-math-method"] = "mathjax"
+            if self.css_file and self.css_file.exists():
+                request["css"] = [str(self.css_file)]
+        return request
+
+    def execute_pandoc_server(self,
+                              input_file: Path,
+                              output_file: Path,
+                              output_format: str = None) -> tuple:
+        """pandoc server で変換を実行する.
+
+        Execute the conversion on the pandoc server.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス
+        output_file : Path
+            出力ファイルパス
+        output_format : str, optional
+            出力形式（省略時は output_format 設定）
+
+        Returns
+        -------
+        tuple or None
+            (success: bool, stdout: str, stderr: str, returncode: int)、
+            サーバを使用できない場合はNone（サブプロセスで変換する）
+        """
+        server_url = self.start_pandoc_server()
+        if not server_url:
+            return None
+
+        try:
+            text = input_file.read_text(encoding="utf-8")
+        except UnicodeDecodeError:
+            return None
+        except OSError as e:
+            self.logger.error(f"Conversion failed: {e}")
+            return (False, "", str(e), -1)
+
+        body = json.dumps(
+            self.build_pandoc_server_request(input_file, text,
+                                             output_format)).encode("utf-8")
+        req = Request(server_url,
+                      data=body,
+                      headers={
+                          "Content-Type": "application/json",
+                          "Accept": "application/json"
+                      },
+                      method="POST")
+        if self.cancel_event.is_set():
+            return (False, "", "Conversion cancelled", -1)
+        try:
+            with urlopen(req, timeout=self.pandoc_timeout or None) as res:
+                result = json.loads(res.read().decode("utf-8"))
+        except TimeoutError:
+            # 制限時間の超過はサブプロセスで再実行しない
+            self.logger.error("Conversion failed (pandoc server): Timed out "
+                              f"after {self.pandoc_timeout} seconds")
+            return (False, "",
+                    f"Timed out after {self.pandoc_timeout} seconds", -1)
+        except HTTPError as e:
+            # pandoc 自体のエラー（サブプロセスでも同じ結果になる）
+            error = e.read().decode("utf-8", errors="replace").strip()
+            self.logger.error(
+                f"Conversion failed (pandoc server): {error or e.reason}")
+            return (False, "", error or str(e.reason), 1)
+        except (OSError, ValueError) as e:
+            self.logger.warning(
+                "Pandoc server request failed, using subprocess: %s", e)
+            return None
+        if self.cancel_event.is_set():
+            return (False, "", "Conversion cancelled", -1)
+
+        messages = "\n".join(
+            f"[{m.get('verbosity', 'INFO')}] {m.get('message', '')}"
+            for m in result.get("messages", []))
+        if result.get("error"):
+            self.logger.error(
+                f"Conversion failed (pandoc server): {result['error']}")
+            return (False, "", result["error"], 1)
+
+        try:
+            if result.get("base64"):
+                output_file.write_bytes(base64.b64decode(result["output"]))
+            else:
+                with open(output_file, "w", encoding="utf-8",
+                          newline="") as f:
+                    f.write(result.get("output", ""))
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Conversion failed: {e}")
+            return (False, "", str(e), -1)
+
+        self.logger.info(f"Conversion success (pandoc server): {output_file}")
+        if messages:
+            self.logger.info(f"STDERR:\n{messages}")
+        return (True, "", messages, 0)
+
+    def cancel(self):
+        """実行中・実行待ちの変換を中止する.
 
-        # 入力形式を判定
-        input_format = input_file.suffix.lower().lstrip('.')
+        Request cancellation: running pandoc and browser processes are
+        terminated with their child processes at once, and folder conversion
+        stops starting new files. The long-lived servers keep running. The
+        request applies to the runs in progress; the next conversion started
+        after they have finished clears it.
+        """
+        if not self.cancel_event.is_set():
+            self.logger.warning("Cancelling conversions")
+        self.cancel_event.set()
+        self.terminate_processes(include_persistent=False)
 
-        # --extract-media オプションを追加する条件
-        extract_media_conditions = [
-            (input_format == "docx" and self.output_format == "markdown"),
-            (input_format == "docx" and self.output_format == "html"),
-            (input_format == "html" and self.output_format == "markdown"),
-        ]
+    def running_jobs(self) -> list:
+        """実行中の子プロセスの一覧を返す.
 
-        if any(extract_media_conditions):
-            # 出力ファイルと同じディレクトリにmediaフォルダを作成
-            media_dir = output_file.parent / "media"
-            cmd.extend(["--extract-media", str(media_dir)])
+        Returns
+        -------
+        list
+            起動順の辞書のリスト（pid, label, persistent, started_at,
+            elapsed, cpu_seconds, rss_bytes）
+        """
+        return self.processes.running()
 
-        # CSSを適用（DOCX以外）
-        if (self.output_format != "docx" and self.css_file
-                and self.css_file.exists()):
-            cmd.extend(["--css", str(self.css_file)])
+    def terminate_processes(self, include_persistent: bool = True) -> int:
+        """登録済みの子プロセスをまとめて終了させる.
 
-        # PDF変換時は日本語対応のPDFエンジンを使用
-        if self.output_format == "pdf":
-            cmd.extend(["--pdf-engine=lualatex"])
-            # 日本語対応のLaTeXテンプレート変数を設定
-            cmd.extend(["-V", "documentclass=ltjsarticle"])
+        Parameters
+        ----------
+        include_persistent : bool
+            常駐PlantUMLサーバ・pandoc server も終了させる場合True
 
-        # スタンドアロン形式（HTML, PDF, EPUB）
-        if self.output_format in ["html", "pdf", "epub"]:
-            cmd.append("--standalone")
+        Returns
+        -------
+        int
+            終了させたプロセス数
+        """
+        count = self.processes.terminate_all(include_persistent)
+        if count:
+            self.logger.info("Terminated %d child process(es)", count)
+        return count
 
-            # HTML出力時は数式レンダリングにMathJaxを使用
-            if self.output_format == "html":
-                cmd.append("--mathjax")
+    def _terminate_child(self, proc: subprocess.Popen):
+        """子プロセスを終了させ、登録を解除する."""
+        terminate_process(proc, logger=self.logger)
+        self.processes.unregister(proc)
 
-            # 埋め込みモードの場合はリソースも埋め込む
-            if self.css_file and self.css_file.exists() and self.embed_css:
-                cmd.append("--embed-resources")
+    def _wait_pandoc(self, proc: subprocess.Popen) -> str:
+        """pandocの終了を待つ。制限時間の超過・中止要求時はプロセスを終了させる.
 
-        return cmd
+        Returns
+        -------
+        str or None
+            "timeout" / "cancelled"、正常に終了した場合はNone
+        """
+        deadline = None
+        if self.pandoc_timeout:
+            deadline = time.monotonic() + float(self.pandoc_timeout)
+        while True:
+            try:
+                proc.wait(timeout=0.2)
+                # cancel() が直接終了させた場合
+                if proc.returncode != 0 and self.cancel_event.is_set():
+                    return "cancelled"
+                return None
+            except subprocess.TimeoutExpired:
+                pass
+            if self.cancel_event.is_set():
+                reason = "cancelled"
+            elif deadline is not None and time.monotonic() >= deadline:
+                reason = "timeout"
+            else:
+                continue
+            # Lua フィルタが起動した mmdc・java 等も含めて終了させる
+            terminate_process(proc, logger=self.logger)
+            try:
+                proc.wait(timeout=5.0)
+            except subprocess.TimeoutExpired:
+                self.logger.error("pandoc did not exit (pid=%s)", proc.pid)
+            return reason
 
     def execute_pandoc(self,
                        cmd: list,
                        output_file: Path,
-                       temp_metadata_file: Path = None) -> tuple:
+                       stage: str = "pandoc") -> tuple:
         """Pandocコマンドを実行する.
 
-        Execute Pandoc command.
+        Execute Pandoc command. The run is bounded by ``pandoc_timeout`` and
+        stops early when ``cancel()`` is called; the process is then
+        terminated together with its child processes.
 
         Parameters
         ----------
@@ -933,32 +3029,78 @@ class PandocService:
             実行するコマンド
         output_file : Path
             出力ファイルパス
-        temp_metadata_file : Path, optional
-            一時メタデータファイル
+        stage : str
+            タイミング記録でのステージ名（"parse"・"write:html"等）
 
         Returns
         -------
         tuple
             (success: bool, stdout: str, stderr: str, returncode: int)
         """
+        if self.cancel_event.is_set():
+            return (False, "", "Conversion cancelled", -1)
+
         try:
-            # Windowsではプロセスグループを作成し、コンソールウィンドウを
-            # 表示しない
+            # プロセスグループを作成し、子プロセスごと終了できるようにする
+            # （Windowsではコンソールウィンドウも表示しない）
             creationflags = 0
-            if platform.system() == "Windows":
+            is_windows = platform.system() == "Windows"
+            if is_windows:
                 creationflags = CREATE_NO_WINDOW | CREATE_NEW_PROCESS_GROUP
 
-            proc = subprocess.Popen(cmd,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,
-                                    text=True,
-                                    encoding="utf-8",
-                                    errors="replace",
-                                    creationflags=creationflags)
-
-            stdout_text, stderr_text = proc.communicate()
-
-            success = proc.returncode == 0
+            started = time.perf_counter()
+            proc = self.processes.popen(
+                cmd,
+                label=f"pandoc: {Path(output_file).name}",
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                creationflags=creationflags,
+                start_new_session=not is_windows)
+
+            # 標準エラー出力は受信時刻付きで読み、フィルタのイベントを計時する
+            # 終了を待つ間に制限時間と中止要求を確認するため、どちらも別スレッドで読む
+            stdout_chunks = []
+            stderr_lines = []
+
+            def read_stdout():
+                stdout_chunks.append(proc.stdout.read())
+
+            def read_stderr():
+                for line in proc.stderr:
+                    stderr_lines.append((time.perf_counter(), line))
+
+            readers = [
+                threading.Thread(target=read_stdout, daemon=True),
+                threading.Thread(target=read_stderr, daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+            try:
+                stopped = self._wait_pandoc(proc)
+            finally:
+                self.processes.unregister(proc)
+            for reader in readers:
+                # 別のセッションに移った孫プロセスがパイプを開いたままでも戻る
+                reader.join(None if stopped is None else 5.0)
+            if not any(reader.is_alive() for reader in readers):
+                proc.stdout.close()
+                proc.stderr.close()
+            finished = time.perf_counter()
+
+            stdout_text = "".join(stdout_chunks)
+            stderr_text, events = split_timing_events(stderr_lines)
+            if stopped == "timeout":
+                stderr_text += (f"\nTimed out after {self.pandoc_timeout} "
+                                f"seconds: {output_file}\n")
+            elif stopped == "cancelled":
+                stderr_text += "\nConversion cancelled\n"
+            self._record_pandoc_timing(stage, cmd, started, finished, events)
+            self._record_dependencies(events)
+
+            success = stopped is None and proc.returncode == 0
             if success:
                 self.logger.info(f"Conversion success: {output_file}")
                 if stdout_text.strip():
@@ -978,22 +3120,13 @@ class PandocService:
             self.logger.exception(f"Pandoc execution error: {e}")
             return (False, "", str(e), -1)
 
-        finally:
-            # 一時メタデータファイルを削除
-            if temp_metadata_file and temp_metadata_file.exists():
-                try:
-                    temp_metadata_file.unlink()
-                    self.logger.info(
-                        f"Temp metadata deleted: {temp_metadata_file}")
-                except (OSError, IOError) as e:
-                    self.logger.warning(f"Failed to delete temp metadata: "
-                                        f"{temp_metadata_file}, {e}")
-
+    @_conversion_run
     def convert_file(self,
                      input_file: Path,
                      output_file: Path,
                      java_path_override: str = None,
-                     plantuml_jar_override: str = None) -> tuple:
+                     plantuml_jar_override: str = None,
+                     output_format: str = None) -> tuple:
         """単一ファイルの変換を実行する.
 
         Execute conversion for a single file.
@@ -1008,12 +3141,35 @@ class PandocService:
             GUI設定のJavaパス
         plantuml_jar_override : str, optional
             GUI設定のPlantUML JARパス
+        output_format : str, optional
+            出力形式（省略時は output_format 設定）
 
         Returns
         -------
         tuple
             (success: bool, stdout: str, stderr: str, returncode: int)
         """
+        output_format = output_format or self.output_format
+        with self._timing_record(input_file,
+                                 {output_format: output_file}) as record:
+            result = self._convert_file(input_file, output_file,
+                                        java_path_override,
+                                        plantuml_jar_override, output_format)
+            if record is not None:
+                record["success"] = result[0]
+            return result
+
+    def _convert_file(self, input_file: Path, output_file: Path,
+                      java_path_override: str, plantuml_jar_override: str,
+                      output_format: str) -> tuple:
+        """convert_file の本体."""
+        # ASTキャッシュを使う場合は、出力オプションだけの変更でフィルタを再実行しない
+        if self.use_ast_cache(input_file):
+            return self._convert_via_ast(input_file,
+                                         {output_format: output_file},
+                                         java_path_override,
+                                         plantuml_jar_override)[output_format]
+
         is_browser_html = (output_file.suffix.lower() == ".html"
                            and self.mermaid_mode == "browser")
         if is_browser_html:
@@ -1021,24 +3177,554 @@ class PandocService:
                 "Mermaid mode: browser (render via background local server)")
             self.cleanup_output_mermaid_asset(output_file.parent)
 
-        temp_metadata_file = self.create_metadata_file(input_file,
-                                                       java_path_override,
-                                                       plantuml_jar_override)
+        if self.pandoc_server and self.can_use_pandoc_server(
+                input_file, output_format):
+            with self._timed_stage("server"):
+                result = self.execute_pandoc_server(input_file, output_file,
+                                                    output_format)
+            if result is not None:
+                return result
+
+        if self.diagram_cache:
+            self.prune_diagram_cache()
+
+        with self._timed_stage("metadata"):
+            metadata_args = self.build_metadata_args(input_file,
+                                                     java_path_override,
+                                                     plantuml_jar_override)
 
-        cmd = self.build_pandoc_command(input_file, output_file,
-                                        temp_metadata_file)
+        cmd = self.build_pandoc_command(input_file,
+                                        output_file,
+                                        metadata_args,
+                                        output_format=output_format)
 
         self.logger.info(f"Command execution: {' '.join(cmd)}")
 
-        return self.execute_pandoc(cmd, output_file, temp_metadata_file)
+        return self.execute_pandoc(cmd, output_file)
+
+    @_conversion_run
+    def convert_file_formats(self,
+                             input_file: Path,
+                             outputs: dict,
+                             java_path_override: str = None,
+                             plantuml_jar_override: str = None,
+                             max_writers: int = None) -> dict:
+        """1つの入力ファイルを複数の出力形式に変換する.
+
+        Convert one input file to several output formats. The input is
+        parsed and run through the Lua filters once into a pandoc JSON AST,
+        and every writer then renders from that AST in parallel.
+
+        DOCX/EPUB入力は埋め込みメディアがASTに残らないため、
+        出力形式ごとに通常の変換を行います。
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス
+        outputs : dict
+            出力形式をキー、出力ファイルパスを値とする辞書
+        java_path_override : str, optional
+            GUI設定のJavaパス
+        plantuml_jar_override : str, optional
+            GUI設定のPlantUML JARパス
+        max_writers : int, optional
+            並列に実行する出力処理の最大数（省略時は出力形式の数）
+
+        Returns
+        -------
+        dict
+            出力形式をキー、
+            (success: bool, stdout: str, stderr: str, returncode: int)
+            を値とする辞書
+        """
+        with self._timing_record(input_file, outputs) as record:
+            results = self._convert_file_formats(input_file, outputs,
+                                                 java_path_override,
+                                                 plantuml_jar_override,
+                                                 max_writers)
+            if record is not None:
+                record["success"] = all(r[0] for r in results.values())
+            return results
+
+    def _convert_file_formats(self, input_file: Path, outputs: dict,
+                              java_path_override: str,
+                              plantuml_jar_override: str,
+                              max_writers: int) -> dict:
+        """convert_file_formats の本体."""
+        if (len(outputs) == 1
+                or input_file.suffix.lower() in BINARY_INPUT_EXTENSIONS):
+            return {
+                output_format:
+                    self.convert_file(input_file,
+                                      output_file,
+                                      java_path_override,
+                                      plantuml_jar_override,
+                                      output_format=output_format)
+                for output_format, output_file in outputs.items()
+            }
+
+        return self._convert_via_ast(input_file, outputs, java_path_override,
+                                     plantuml_jar_override, max_writers)
+
+    def _convert_via_ast(self,
+                         input_file: Path,
+                         outputs: dict,
+                         java_path_override: str = None,
+                         plantuml_jar_override: str = None,
+                         max_writers: int = None) -> dict:
+        """JSON ASTを経由して1つの入力を1つ以上の形式に変換する.
+
+        Parse and filter the input into pandoc JSON AST (or reuse it from
+        the AST cache), then run every writer from it.
+
+        Returns
+        -------
+        dict
+            出力形式をキー、
+            (success: bool, stdout: str, stderr: str, returncode: int)
+            を値とする辞書
+        """
+        if self.mermaid_mode == "browser":
+            for output_file in outputs.values():
+                if output_file.suffix.lower() == ".html":
+                    self.logger.info("Mermaid mode: browser "
+                                     "(render via background local server)")
+                    self.cleanup_output_mermaid_asset(output_file.parent)
+
+        if self.diagram_cache:
+            self.prune_diagram_cache()
+
+        with self._timed_stage("metadata"):
+            metadata_args = self.build_metadata_args(input_file,
+                                                     java_path_override,
+                                                     plantuml_jar_override)
+
+        # ASTキャッシュ（作業ディレクトリも同じ場所に作りハードリンクで共有）
+        cache_file = None
+        temp_parent = None
+        if self.use_ast_cache(input_file):
+            self.prune_ast_cache()
+            cache_dir = self.get_ast_cache_dir()
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                cache_key = self.get_ast_cache_key(input_file, metadata_args)
+                cache_file = cache_dir / f"{cache_key}.json"
+                temp_parent = cache_dir
+            except (OSError, IOError) as e:
+                self.logger.warning("AST cache disabled: %s", e)
+
+        with tempfile.TemporaryDirectory(prefix="pandoc_gui_ast_",
+                                         dir=temp_parent) as temp_dir:
+            # 既定のタイトルが入力ファイル名になるよう同じ名前で出力する
+            ast_file = Path(temp_dir) / f"{input_file.stem}.json"
+            record = getattr(self._timing, "record", None)
+            # 依存ファイルの収集中は、作成時の記録が残っているキャッシュのみ使う
+            files = getattr(self._dependencies, "files", None)
+            cached_files = None
+            if cache_file and files is not None:
+                cached_files = self._load_cached_dependencies(cache_file)
+            if (cache_file and (files is None or cached_files is not None)
+                    and self._load_cached_ast(cache_file, ast_file)):
+                self.logger.info(f"AST cache hit: {input_file}")
+                if record is not None:
+                    record["ast_cache"] = "hit"
+                if cached_files:
+                    files.update(cached_files)
+            else:
+                if cache_file and record is not None:
+                    record["ast_cache"] = "miss"
+                cmd = self.build_ast_command(input_file, ast_file,
+                                             metadata_args)
+                self.logger.info(f"Command execution: {' '.join(cmd)}")
+                parsed = self.execute_pandoc(cmd, ast_file, stage="parse")
+                if not parsed[0]:
+                    return {output_format: parsed for output_format in outputs}
+                if cache_file:
+                    if files is not None:
+                        self._store_cached_dependencies(cache_file, files)
+                    self._store_cached_ast(ast_file, cache_file)
+
+            def write(item):
+                output_format, output_file = item
+                cmd = self.build_pandoc_command(input_file,
+                                                output_file,
+                                                output_format=output_format,
+                                                ast_file=ast_file)
+                self.logger.info(f"Command execution: {' '.join(cmd)}")
+                # 出力スレッドでも呼び出し元のタイミング記録に加算する
+                self._timing.record = record
+                try:
+                    return self.execute_pandoc(
+                        cmd, output_file, stage=f"write:{output_format}")
+                finally:
+                    self._timing.record = None
+
+            workers = max(1, min(len(outputs), max_writers or len(outputs)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(write, outputs.items()))
+
+        return dict(zip(outputs, results))
+
+    def get_max_workers(self) -> int:
+        """フォルダ変換で使用するワーカー数を返す.
+
+        Return the number of worker threads used by folder conversion.
+
+        Returns
+        -------
+        int
+            ワーカー数 (max_workers未設定時はCPU数)
+        """
+        if self.max_workers:
+            return max(1, int(self.max_workers))
+        return os.cpu_count() or 1
+
+    def build_settings_fingerprint(self,
+                                   ext: str,
+                                   java_path_override: str = None,
+                                   plantuml_jar_override: str = None,
+                                   output_formats: list = None) -> str:
+        """出力結果に影響する設定のフィンガープリントを作成する.
+
+        Build a fingerprint of the settings that affect conversion output.
+
+        フィルタとCSSはパスのみを含めます。内容の変更は出力ごとの依存
+        ファイルとして検出するため、影響する出力だけが再変換されます。
+
+        Parameters
+        ----------
+        ext : str
+            出力ファイルの拡張子
+        java_path_override : str, optional
+            GUI設定のJavaパス
+        plantuml_jar_override : str, optional
+            GUI設定のPlantUML JARパス
+        output_formats : list, optional
+            複数形式で出力する場合の出力形式リスト
+
+        Returns
+        -------
+        str
+            設定のSHA-256ダイジェスト
+        """
+
+        def describe(path):
+            return str(Path(path).resolve()) if path else None
+
+        settings = {
+            "output_format": (",".join(output_formats)
+                              if output_formats else self.output_format),
+            "ext": ext,
+            "filters": [describe(f) for f in self.enabled_filters],
+            "css_file": describe(self.css_file),
+            "embed_css": self.embed_css,
+            "mermaid_mode": self.mermaid_mode,
+            "diagram_embed": self.diagram_embed,
+            "java_path": str(java_path_override or self.java_path or ""),
+            "plantuml_jar": str(plantuml_jar_override or self.plantuml_jar
+                                or ""),
+            "plantuml_use_server": self.plantuml_use_server,
+            "plantuml_server_url": self.plantuml_server_url,
+        }
+        encoded = json.dumps(settings, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def load_build_manifest(self, output_folder: Path) -> dict:
+        """出力フォルダのビルドマニフェストを読み込む.
+
+        Load the incremental build manifest from the output folder.
+
+        Returns
+        -------
+        dict
+            相対パスをキーとするエントリ（存在しない・壊れている場合は空）
+        """
+        manifest_path = output_folder / BUILD_MANIFEST_NAME
+        if not manifest_path.exists():
+            return {}
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError, json.JSONDecodeError) as e:
+            self.logger.warning("Failed to read build manifest: %s", e)
+            return {}
+        if data.get("version") != BUILD_MANIFEST_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def save_build_manifest(self, output_folder: Path, entries: dict):
+        """ビルドマニフェストを出力フォルダに保存する.
+
+        Save the incremental build manifest to the output folder.
+        """
+        manifest_path = output_folder / BUILD_MANIFEST_NAME
+        temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+        data = {"version": BUILD_MANIFEST_VERSION, "entries": entries}
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, manifest_path)
+        except (OSError, IOError) as e:
+            self.logger.warning("Failed to save build manifest: %s", e)
+
+    def _embeds_resources(self, output_format: str) -> bool:
+        """出力に画像などの参照ファイルの内容が取り込まれるか.
+
+        HTML only embeds them with ``--embed-resources``; Markdown keeps
+        the references.
+        """
+        if output_format == "html":
+            return bool(self.css_file and self.css_file.exists()
+                        and self.embed_css)
+        return output_format in ("pdf", "docx", "epub")
+
+    def get_output_dependencies(self, input_file: Path, output_format: str,
+                                files: set) -> list:
+        """出力ファイルの内容に影響するファイルの一覧を作成する.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイルパス
+        output_format : str
+            出力形式
+        files : set
+            変換中にフィルタが通知した (kind, path) の集合
+
+        Returns
+        -------
+        list
+            依存ファイルの絶対パス（入力・有効なフィルタ・取り込まれるCSS、
+            取り込まれる画像、PlantUML JAR、HTMLでは mermaid.min.js）
+        """
+        embeds = self._embeds_resources(output_format)
+        paths = [input_file, *self.enabled_filters]
+        if (self.css_file and self.css_file.exists()
+                and (output_format == "epub"
+                     or output_format == "html" and embeds)):
+            paths.append(self.css_file)
+        for kind, path in files:
+            if (kind == "renderer" or kind == "resource" and embeds
+                    or kind == "script" and output_format == "html"):
+                paths.append(path)
+        return sorted({os.path.abspath(path) for path in paths})
+
+    @staticmethod
+    def _hash_dependency(path: str, hashes: dict) -> str:
+        """依存ファイルのハッシュを返す（存在しない場合はNone）.
+
+        ``hashes`` memoizes the digests for one folder conversion, so shared
+        files such as the CSS or the filters are read only once.
+        """
+        if path not in hashes:
+            try:
+                hashes[path] = hash_file(Path(path))
+            except (OSError, IOError):
+                hashes[path] = None
+        return hashes[path]
+
+    def _convert_folder_entry(self, input_file: Path, output_file: Path,
+                              java_path_override: str,
+                              plantuml_jar_override: str,
+                              settings_fingerprint: str,
+                              previous_entry: dict,
+                              outputs: dict = None,
+                              hashes: dict = None) -> tuple:
+        """フォルダ変換の1ファイル分を処理する（ワーカースレッドで実行）.
+
+        Process a single entry of folder conversion on a worker thread.
+        ``outputs`` (format -> path) is given when converting to several
+        output formats at once.
+
+        ``settings_fingerprint`` を指定した場合（インクリメンタルビルド）、
+        設定が前回と同じで、依存ファイルがすべて前回と同じ内容の出力は
+        変換をスキップします。
+
+        Returns
+        -------
+        tuple
+            (success: bool, stderr: str, entry: dict or None, skipped: bool)
+            entry はマニフェストに記録する内容（一部の形式が失敗した場合も
+            成功した出力だけを含む）
+        """
+        targets = outputs or {self.output_format: output_file}
+        if not settings_fingerprint:
+            success, stderr, _failed = self._convert_folder_targets(
+                input_file, output_file, java_path_override,
+                plantuml_jar_override, outputs)
+            return (success, stderr, None, False)
+
+        hashes = {} if hashes is None else hashes
+        previous_outputs = {}
+        if previous_entry and previous_entry.get(
+                "settings") == settings_fingerprint:
+            previous_outputs = previous_entry.get("outputs", {})
+
+        def up_to_date(output_format, path):
+            dependencies = previous_outputs.get(output_format, {}).get(
+                "dependencies")
+            return bool(dependencies and path.exists() and all(
+                self._hash_dependency(dependency, hashes) == digest
+                for dependency, digest in dependencies.items()))
+
+        fresh = {
+            output_format: previous_outputs[output_format]
+            for output_format, path in targets.items()
+            if up_to_date(output_format, path)
+        }
+        stale = {
+            output_format: path
+            for output_format, path in targets.items()
+            if output_format not in fresh
+        }
+        entry = {"settings": settings_fingerprint, "outputs": fresh}
+        if not stale:
+            return (True, "", entry, True)
+
+        with self._collect_dependencies() as files:
+            success, stderr, failed = self._convert_folder_targets(
+                input_file, output_file, java_path_override,
+                plantuml_jar_override, stale if outputs else None)
+        # 変換中に変更されたファイルを見逃さないよう、ここで改めて読む
+        hashes = {}
+        for output_format in stale:
+            if output_format in failed:
+                continue
+            entry["outputs"][output_format] = {
+                "dependencies": {
+                    dependency: self._hash_dependency(dependency, hashes)
+                    for dependency in self.get_output_dependencies(
+                        input_file, output_format, files)
+                },
+            }
+        return (success, stderr, entry, False)
+
+    def _convert_folder_targets(self, input_file: Path, output_file: Path,
+                                java_path_override: str,
+                                plantuml_jar_override: str,
+                                outputs: dict = None) -> tuple:
+        """フォルダ変換の1ファイル分を変換する.
+
+        Returns
+        -------
+        tuple
+            (success: bool, stderr: str, failed: set)
+            failed は変換に失敗した出力形式
+        """
+        if outputs:
+            # ワーカーが複数ある場合はファイル単位の並列で十分なため
+            # 出力処理は順に実行する
+            max_writers = 1 if self.get_max_workers() > 1 else None
+            results = self.convert_file_formats(input_file, outputs,
+                                                java_path_override,
+                                                plantuml_jar_override,
+                                                max_writers)
+            failed = {
+                output_format
+                for output_format, result in results.items() if not result[0]
+            }
+            stderr = "\n".join(
+                f"[{output_format}] {result[2].strip() or 'Unknown error'}"
+                for output_format, result in results.items() if not result[0])
+            return (not failed, stderr, failed)
+
+        success, _stdout, stderr, _returncode = self.convert_file(
+            input_file, output_file, java_path_override, plantuml_jar_override)
+        return (success, stderr, set() if success else {self.output_format})
+
+    def _copy_folder_entry(self,
+                           input_file: Path,
+                           output_file: Path,
+                           relative_path: Path,
+                           source_stat: os.stat_result = None) -> str:
+        """変換対象外のファイルを copy_strategy に従って出力フォルダに配置する.
+
+        Place a non-convertible file in the output folder according to
+        ``copy_strategy``: skip it when the output already has the same size
+        and mtime, otherwise hardlink / reflink / copy it. The file is
+        written under a temporary name and moved into place.
+
+        Parameters
+        ----------
+        input_file : Path
+            入力ファイル
+        output_file : Path
+            出力ファイル
+        relative_path : Path
+            入力フォルダからの相対パス（ログ用）
+        source_stat : os.stat_result, optional
+            走査時に取得済みの入力ファイルの stat
+
+        Returns
+        -------
+        str
+            実施した方法 ("skipped", "hardlink", "reflink", "copy", "failed")
+        """
+        strategy = self.copy_strategy
+        if strategy not in COPY_STRATEGIES:
+            strategy = "copy"
+
+        temp_file = output_file.with_name(
+            f".{output_file.name}.{threading.get_ident()}.tmp")
+        try:
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            if source_stat is None:
+                source_stat = input_file.stat()
+
+            if strategy != "copy" and self._is_copy_up_to_date(
+                    source_stat, output_file):
+                self.logger.info(f"Skipped unchanged copy: {relative_path}")
+                return "skipped"
+
+            method = None
+            if strategy == "hardlink":
+                try:
+                    os.link(input_file, temp_file)
+                    method = "hardlink"
+                except OSError:
+                    # 別ファイルシステム等ではリンクできない
+                    pass
+            if method is None and strategy in ("reflink", "hardlink"):
+                if reflink_file(input_file, temp_file):
+                    shutil.copystat(input_file, temp_file)
+                    method = "reflink"
+            if method is None:
+                shutil.copy2(input_file, temp_file)
+                method = "copy"
+
+            os.replace(temp_file, output_file)
+            self.logger.info(f"Copied file ({method}): {relative_path}")
+            return method
+        except (OSError, IOError) as e:
+            self.logger.error(f"Copy failed: {relative_path}, {e}")
+            try:
+                temp_file.unlink()
+            except (OSError, IOError):
+                pass
+            return "failed"
+
+    @staticmethod
+    def _is_copy_up_to_date(source_stat: os.stat_result,
+                            output_file: Path) -> bool:
+        """出力先がサイズ・更新日時とも入力と一致するか判定する."""
+        try:
+            output_stat = output_file.stat()
+        except OSError:
+            return False
+        # FAT等の更新日時の精度を考慮して1秒未満の差は同一とみなす
+        return (output_stat.st_size == source_stat.st_size
+                and abs(output_stat.st_mtime - source_stat.st_mtime) < 1.0)
 
+    @_conversion_run
     def convert_folder(self,
                        input_folder: Path,
                        output_folder: Path,
                        ext: str,
                        java_path_override: str = None,
                        plantuml_jar_override: str = None,
-                       progress_callback=None) -> tuple:
+                       progress_callback=None,
+                       output_formats: list = None) -> tuple:
         """フォルダ内のファイルを一括変換する.
 
         Convert all files in a folder.
@@ -1057,84 +3743,369 @@ class PandocService:
             GUI設定のPlantUML JARパス
         progress_callback : callable, optional
             進捗コールバック関数 (current, total, relative_path)
+            並列実行時も入力順に呼び出される。走査と変換は並行して進むため、
+            total はその時点までに見つかった変換対象の件数で、走査の進行に
+            合わせて増加する
+        output_formats : list, optional
+            複数の出力形式（例: ["html", "pdf"]）。2つ以上指定した場合は
+            各入力を1回だけ解析し、形式ごとの拡張子で出力する（ext は無視）
+
+        incremental が有効な場合、出力フォルダのマニフェストに出力ごとの
+        依存ファイル（入力・CSS・フィルタ・画像・PlantUML JAR・
+        mermaid.min.js）の内容のハッシュを記録し、設定と依存ファイルが
+        前回と同じ出力は変換をスキップします（成功として数えます）。
 
         Returns
         -------
         tuple
             (成功数, 失敗数, エラーリスト)
         """
-        # 変換対象の拡張子
-        convertible_extensions = {
-            ".md", ".markdown", ".html", ".htm", ".tex", ".rst", ".org",
-            ".textile", ".xml", ".epub", ".docx"
-        }
-
         # 出力フォルダが存在しない場合は作成
         output_folder.mkdir(parents=True, exist_ok=True)
 
-        # 変換対象ファイルのリストを作成
-        files_to_convert = []
-        files_to_copy = []
+        success_count = 0
+        fail_count = 0
+        skipped_count = 0
+        discovered_count = 0
+        completed_count = 0
+        errors = []
 
-        for input_file in input_folder.rglob("*"):
-            if input_file.is_file():
-                relative_path = input_file.relative_to(input_folder)
+        # 複数形式の一括出力
+        if output_formats and len(output_formats) < 2:
+            output_formats = None
+
+        # インクリメンタルビルド: 前回のマニフェストと設定フィンガープリント
+        settings_fingerprint = None
+        previous_entries = {}
+        manifest_entries = {}
+        # 依存ファイルのハッシュ（共有されるCSS・フィルタ等は1回だけ読む）
+        dependency_hashes = {}
+        if self.incremental:
+            settings_fingerprint = self.build_settings_fingerprint(
+                ext, java_path_override, plantuml_jar_override,
+                output_formats)
+            previous_entries = self.load_build_manifest(output_folder)
+            # 中止・失敗で今回処理しなかった入力の記録も引き継ぐ
+            manifest_entries = dict(previous_entries)
+        # 走査で見つかった入力（完走時に削除された入力の記録を除くため）
+        scanned = set()
+
+        # 常駐PlantUMLサーバはワーカー内で起動を待たないよう先に起動する
+        self.prestart_plantuml_daemon(java_path_override,
+                                      plantuml_jar_override)
+
+        # 走査と変換をパイプライン化し、見つけたファイルから順に変換を始める
+        # 実行中のジョブ数を制限してメモリ使用量を一定に保つ
+        max_workers = self.get_max_workers()
+        max_pending = max_workers * 2
+        pending = deque()
+        copy_pending = deque()
+        folder_started = time.perf_counter()
+        copy_stats = {"count": 0, "bytes": 0, "seconds": 0.0, "methods": {}}
+
+        def copy_entry(input_file, output_file, relative_path, source_stat):
+            """コピーを実行し、タイミング記録用に所要時間を返す."""
+            started = time.perf_counter()
+            method = self._copy_folder_entry(input_file, output_file,
+                                             relative_path, source_stat)
+            size = source_stat.st_size if source_stat else 0
+            return (method, size, time.perf_counter() - started)
+
+        def collect_copy():
+            """最も古いコピーの完了を待って集計する."""
+            method, size, seconds = copy_pending.popleft().result()
+            copy_stats["count"] += 1
+            copy_stats["seconds"] += seconds
+            copy_stats["methods"][method] = (
+                copy_stats["methods"].get(method, 0) + 1)
+            if method not in ("skipped", "failed"):
+                copy_stats["bytes"] += size
+
+        def collect_results(limit: int):
+            """完了を待つジョブが limit 件以下になるまで投入順に結果を回収する."""
+            nonlocal success_count, fail_count, skipped_count, completed_count
+            while len(pending) > limit:
+                future, output_file, relative_path = pending.popleft()
+                success, _stderr, entry, skipped = future.result()
+
+                if skipped:
+                    skipped_count += 1
+                    self.logger.info(f"Skipped unchanged file: {relative_path}")
+
+                # 一部の形式が失敗した場合も成功した出力は記録する
+                if entry and entry["outputs"]:
+                    manifest_entries[relative_path.as_posix()] = entry
+                else:
+                    manifest_entries.pop(relative_path.as_posix(), None)
 
-                # 除外パターンチェック
-                if self.should_exclude(relative_path):
+                if success:
+                    success_count += 1
+                else:
+                    fail_count += 1
+                    errors.append((relative_path, _stderr or "Unknown error"))
+
+                # 進捗コールバック（total はその時点までに見つかった件数）
+                completed_count += 1
+                if progress_callback:
+                    progress_callback(completed_count, discovered_count,
+                                      relative_path)
+
+        # 中止されずに走査を終えたか
+        completed = False
+        # コピーは変換とは別のI/O用プールで並行して実行する
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                ThreadPoolExecutor(max_workers=min(4, max_workers)) as copier:
+            # 除外フォルダは走査せず、進捗の順序を決定的にするためパス順に処理する
+            for relative_path, entry in self.iter_folder_files(input_folder):
+                if self.cancel_event.is_set():
+                    self.logger.warning("Folder conversion cancelled")
+                    break
+                input_file = input_folder / relative_path
+
+                if input_file.suffix.lower() not in CONVERTIBLE_EXTENSIONS:
+                    try:
+                        source_stat = entry.stat() if entry else None
+                    except OSError:
+                        source_stat = None
+                    copy_pending.append(
+                        copier.submit(copy_entry, input_file,
+                                      output_folder / relative_path,
+                                      relative_path, source_stat))
+                    while len(copy_pending) > max_pending:
+                        collect_copy()
                     continue
 
-                if input_file.suffix.lower() in convertible_extensions:
-                    output_file = output_folder / relative_path.parent / (
-                        input_file.stem + ext)
-                    files_to_convert.append(
-                        (input_file, output_file, relative_path))
-                else:
-                    output_file = output_folder / relative_path
-                    files_to_copy.append(
-                        (input_file, output_file, relative_path))
+                discovered_count += 1
+                scanned.add(relative_path.as_posix())
+                output_file, outputs = self._folder_outputs(
+                    output_folder, relative_path, ext, output_formats)
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+
+                self.logger.info(f"Converting file: {relative_path} -> "
+                                 f"{output_file.relative_to(output_folder)}")
+
+                future = executor.submit(
+                    self._convert_folder_entry, input_file, output_file,
+                    java_path_override, plantuml_jar_override,
+                    settings_fingerprint,
+                    previous_entries.get(relative_path.as_posix()), outputs,
+                    dependency_hashes)
+                pending.append((future, output_file, relative_path))
+                collect_results(max_pending)
+            else:
+                completed = True
 
-        total_files = len(files_to_convert)
-        success_count = 0
-        fail_count = 0
-        errors = []
+            collect_results(0)
+            while copy_pending:
+                collect_copy()
 
-        # 変換ファイルを順次処理
-        for idx, (input_file, output_file,
-                  relative_path) in enumerate(files_to_convert, 1):
-            output_file.parent.mkdir(parents=True, exist_ok=True)
+        total_files = discovered_count
 
-            self.logger.info(f"Converting file: {relative_path} -> "
-                             f"{output_file.relative_to(output_folder)}")
+        if self.incremental:
+            if completed and not self.cancel_event.is_set():
+                manifest_entries = {
+                    key: value
+                    for key, value in manifest_entries.items()
+                    if key in scanned
+                }
+            self.save_build_manifest(output_folder, manifest_entries)
+            self.logger.info(f"Incremental build: {skipped_count} of "
+                             f"{total_files} file(s) unchanged")
 
-            # 進捗コールバック
-            if progress_callback:
-                progress_callback(idx, total_files, relative_path)
+        self.logger.info("Folder conversion complete")
 
-            # 変換を実行
-            success, _stdout, _stderr, _returncode = self.convert_file(
-                input_file, output_file, java_path_override,
-                plantuml_jar_override)
+        if self.timings:
+            copy_stats["seconds"] = round(copy_stats["seconds"], 6)
+            self.write_timing_record({
+                "type": "folder",
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "input": str(input_folder),
+                "output": str(output_folder),
+                "files": total_files,
+                "succeeded": success_count,
+                "failed": fail_count,
+                "skipped": skipped_count,
+                "workers": max_workers,
+                "copies": copy_stats,
+                "stages": {
+                    "total": round(time.perf_counter() - folder_started, 6)
+                },
+            })
+
+        return (success_count, fail_count, errors)
+
+    @staticmethod
+    def _folder_outputs(output_folder: Path,
+                        relative_path: Path,
+                        ext: str,
+                        output_formats: list = None) -> tuple:
+        """フォルダ変換での入力ファイルに対応する出力先を返す.
+
+        Returns
+        -------
+        tuple
+            (output_file: Path, outputs: dict or None)
+            outputs は複数形式出力時の 形式 -> 出力ファイル
+        """
+        stem = relative_path.stem
+        if output_formats:
+            outputs = {
+                output_format: output_folder / relative_path.parent /
+                (stem + FORMAT_EXTENSIONS[output_format])
+                for output_format in output_formats
+            }
+            return (next(iter(outputs.values())), outputs)
+        return (output_folder / relative_path.parent / (stem + ext), None)
+
+    @_conversion_run
+    def convert_changed_files(self,
+                              input_folder: Path,
+                              output_folder: Path,
+                              ext: str,
+                              changed_files: list,
+                              java_path_override: str = None,
+                              plantuml_jar_override: str = None,
+                              progress_callback=None,
+                              output_formats: list = None) -> tuple:
+        """フォルダ内の変更されたファイルだけを変換する.
+
+        Convert only the given changed files of a folder, with the same
+        output layout, exclude patterns and copy handling as convert_folder.
+        Used by watch mode. Deleted files are skipped and their outputs are
+        left in place.
+
+        Parameters
+        ----------
+        input_folder : Path
+            入力フォルダパス
+        output_folder : Path
+            出力フォルダパス
+        ext : str
+            出力ファイルの拡張子
+        changed_files : list
+            変更されたファイルのパス（input_folder 配下の絶対パス）
+        java_path_override : str, optional
+            GUI設定のJavaパス
+        plantuml_jar_override : str, optional
+            GUI設定のPlantUML JARパス
+        progress_callback : callable, optional
+            進捗コールバック関数 (current, total, relative_path)
+        output_formats : list, optional
+            複数の出力形式（convert_folder と同じ）
+
+        Returns
+        -------
+        tuple
+            (成功数, 失敗数, エラーリスト)
+        """
+        if output_formats and len(output_formats) < 2:
+            output_formats = None
+
+        conversions = []
+        for path in changed_files:
+            input_file = Path(path)
+            try:
+                relative_path = input_file.relative_to(input_folder)
+            except ValueError:
+                continue
+            if self.should_exclude(relative_path) or _is_relative_to(
+                    input_file, output_folder):
+                continue
+            if not input_file.is_file():
+                self.logger.info(f"Removed file skipped: {relative_path}")
+                continue
+            if input_file.suffix.lower() not in CONVERTIBLE_EXTENSIONS:
+                self._copy_folder_entry(input_file,
+                                        output_folder / relative_path,
+                                        relative_path)
+                continue
+            conversions.append(relative_path)
 
+        success_count = 0
+        fail_count = 0
+        errors = []
+        for index, relative_path in enumerate(conversions, 1):
+            if self.cancel_event.is_set():
+                break
+            input_file = input_folder / relative_path
+            output_file, outputs = self._folder_outputs(
+                output_folder, relative_path, ext, output_formats)
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            self.logger.info(f"Converting changed file: {relative_path} -> "
+                             f"{output_file.relative_to(output_folder)}")
+            success, stderr, _entry, _skipped = (
+                self._convert_folder_entry(input_file, output_file,
+                                           java_path_override,
+                                           plantuml_jar_override, None, None,
+                                           outputs))
             if success:
                 success_count += 1
             else:
                 fail_count += 1
-                errors.append((relative_path, _stderr or "Unknown error"))
+                errors.append((relative_path, stderr or "Unknown error"))
+            if progress_callback:
+                progress_callback(index, len(conversions), relative_path)
 
-        # コピーファイルを処理
-        for input_file, output_file, relative_path in files_to_copy:
-            output_file.parent.mkdir(parents=True, exist_ok=True)
+        return (success_count, fail_count, errors)
 
-            try:
-                shutil.copy2(input_file, output_file)
-                self.logger.info(f"Copied file: {relative_path}")
-            except (OSError, IOError) as e:
-                self.logger.error(f"Copy failed: {relative_path}, {e}")
+    def create_folder_watcher(self,
+                              input_path: Path,
+                              output_path: Path,
+                              callback,
+                              **kwargs) -> FolderWatcher:
+        """入力の変更を監視する FolderWatcher を作成する（未開始）.
 
-        self.logger.info("Folder conversion complete")
+        Create a watcher for watch mode. A folder input is watched without
+        its excluded folders and without the output folder when it lies
+        inside the input; a file input is watched through its parent folder,
+        reporting only that file.
 
-        return (success_count, fail_count, errors)
+        Parameters
+        ----------
+        input_path : Path
+            入力ファイルまたはフォルダ
+        output_path : Path
+            出力ファイルまたはフォルダ
+        callback : callable
+            変更されたファイルのパスのリストを受け取る関数
+        **kwargs
+            FolderWatcher に渡す追加の引数
+
+        Returns
+        -------
+        FolderWatcher
+            監視オブジェクト（start() で開始する）
+        """
+        if input_path.is_file():
+            name = input_path.name
+
+            def should_ignore(relative_path):
+                return relative_path.parts[0] != name
+
+            return FolderWatcher(input_path.parent,
+                                 callback,
+                                 should_ignore,
+                                 logger=self.logger,
+                                 **kwargs)
+
+        # 入力フォルダ内の出力フォルダ（の相対パスの要素）
+        try:
+            output_parts = output_path.resolve().relative_to(
+                input_path.resolve()).parts
+        except ValueError:
+            output_parts = None
+
+        def should_ignore(relative_path):
+            if (output_parts is not None and relative_path.parts[:len(
+                    output_parts)] == output_parts):
+                return True
+            return self.should_exclude(relative_path)
+
+        return FolderWatcher(input_path,
+                             callback,
+                             should_ignore,
+                             logger=self.logger,
+                             **kwargs)
 
     def save_profile_data(self, name: str):
         """現在の設定をプロファイルに保存する.
@@ -1157,6 +4128,20 @@ class PandocService:
             "plantuml_use_server": self.plantuml_use_server,
             "plantuml_server_url": self.plantuml_server_url,
             "mermaid_mode": self.mermaid_mode,
+            "max_workers": self.max_workers,
+            "incremental": self.incremental,
+            "copy_strategy": self.copy_strategy,
+            "diagram_cache": self.diagram_cache,
+            "diagram_cache_max_mb": self.diagram_cache_max_mb,
+            "diagram_cache_max_age_days": self.diagram_cache_max_age_days,
+            "plantuml_daemon": self.plantuml_daemon,
+            "diagram_embed": self.diagram_embed,
+            "pandoc_server": self.pandoc_server,
+            "ast_cache": self.ast_cache,
+            "ast_cache_max_mb": self.ast_cache_max_mb,
+            "ast_cache_max_age_days": self.ast_cache_max_age_days,
+            "timings": self.timings,
+            "pandoc_timeout": self.pandoc_timeout,
         }
         save_profile(name, data)
         self.logger.info(f"Profile saved: {name}")
@@ -1194,6 +4179,21 @@ class PandocService:
         self.plantuml_server_url = data.get("plantuml_server_url",
                                             "http://www.plantuml.com/plantuml")
         self.mermaid_mode = data.get("mermaid_mode", "browser")
+        self.max_workers = data.get("max_workers")
+        self.incremental = data.get("incremental", False)
+        self.copy_strategy = data.get("copy_strategy", "reflink")
+        self.diagram_cache = data.get("diagram_cache", True)
+        self.diagram_cache_max_mb = data.get("diagram_cache_max_mb", 256)
+        self.diagram_cache_max_age_days = data.get(
+            "diagram_cache_max_age_days", 30)
+        self.plantuml_daemon = data.get("plantuml_daemon", True)
+        self.diagram_embed = data.get("diagram_embed", "base64")
+        self.pandoc_server = data.get("pandoc_server", False)
+        self.ast_cache = data.get("ast_cache", True)
+        self.ast_cache_max_mb = data.get("ast_cache_max_mb", 512)
+        self.ast_cache_max_age_days = data.get("ast_cache_max_age_days", 30)
+        self.timings = data.get("timings", False)
+        self.pandoc_timeout = data.get("pandoc_timeout", 0)
 
         self.logger.info(f"Profile loaded: {name}")
         return True
@@ -1,7 +1,26 @@
 # -*- coding: utf-8 -*-
 """subprocess extensions."""
+import os
+import signal
 import subprocess
 import sys
+import threading
+import time
+
+
+def _signal_process(proc: subprocess.Popen, sig: int) -> None:
+    """
+    Send a signal to the process, or to its whole process group when the
+    process leads its own group (started with start_new_session=True), so
+    that children such as mmdc or java spawned by Lua filters stop too.
+    """
+    try:
+        if os.getpgid(proc.pid) == proc.pid:
+            os.killpg(proc.pid, sig)
+            return
+    except OSError:
+        pass
+    proc.send_signal(sig)
 
 
 def terminate_process(proc: subprocess.Popen,
@@ -10,7 +29,9 @@ def terminate_process(proc: subprocess.Popen,
     """
     Safely terminate a subprocess according to the platform.
     On Windows, attempts to terminate the process tree using taskkill.
-    On failure or other OSes, uses terminate/kill.
+    On other OSes, uses SIGTERM/SIGKILL, sent to the whole process group
+    when the process leads its own group.
+    On failure, uses terminate/kill.
 
     :param proc: The Popen object to be terminated
     :param logger: Optional logger for logging
@@ -44,12 +65,183 @@ def terminate_process(proc: subprocess.Popen,
                     proc.kill()
         else:
             try:
-                proc.terminate()
+                _signal_process(proc, signal.SIGTERM)
                 proc.wait(timeout=timeout)
             except subprocess.TimeoutExpired:
                 if logger:
                     logger.warning("child_process_force_kill")
-                proc.kill()
+                _signal_process(proc, signal.SIGKILL)
     except (OSError, subprocess.TimeoutExpired) as e:
         if logger:
             logger.error(f"terminate_process_error: {e}")
+
+
+def process_usage(pid: int) -> dict:
+    """
+    Return the CPU time and resident memory of a process.
+    Read from /proc where available (Linux); elsewhere the values are None.
+
+    :param pid: Process ID
+    :return: {"cpu_seconds": float or None, "rss_bytes": int or None}
+    """
+    usage = {"cpu_seconds": None, "rss_bytes": None}
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+        # コマンド名に空白や括弧を含む場合があるため、最後の ")" 以降を分割する
+        fields = data[data.rindex(b")") + 2:].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        usage["cpu_seconds"] = (int(fields[11]) + int(fields[12])) / ticks
+        usage["rss_bytes"] = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    return usage
+
+
+class ProcessRegistry:
+    """
+    Keep track of the child processes started by the application, so that
+    they can be listed while running and terminated together on cancel or
+    shutdown.
+    """
+
+    def __init__(self, logger=None):
+        """
+        :param logger: Optional logger for logging
+        """
+        self.logger = logger
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def popen(self,
+              args,
+              label: str = None,
+              persistent: bool = False,
+              **kwargs) -> subprocess.Popen:
+        """
+        Start a process with subprocess.Popen and register it.
+
+        :param args: Command to run
+        :param label: Name shown in the job list (default: the executable)
+        :param persistent: True for long-lived helpers (servers) that are
+            only stopped on shutdown, not on cancel
+        :param kwargs: Passed to subprocess.Popen
+        :return: The started Popen object
+        """
+        proc = subprocess.Popen(args, **kwargs)
+        return self.register(proc, label, persistent)
+
+    def run(self,
+            args,
+            label: str = None,
+            timeout: float = None,
+            check: bool = False,
+            capture_output: bool = False,
+            **kwargs) -> subprocess.CompletedProcess:
+        """
+        Run a process to completion like subprocess.run, registered while
+        it runs. On timeout the process tree is terminated and
+        subprocess.TimeoutExpired is raised.
+        """
+        if capture_output:
+            kwargs["stdout"] = subprocess.PIPE
+            kwargs["stderr"] = subprocess.PIPE
+        proc = self.popen(args, label, **kwargs)
+        try:
+            try:
+                stdout, stderr = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                terminate_process(proc, logger=self.logger)
+                proc.communicate()
+                raise
+        finally:
+            self.unregister(proc)
+        result = subprocess.CompletedProcess(proc.args, proc.returncode,
+                                             stdout, stderr)
+        if check:
+            result.check_returncode()
+        return result
+
+    def register(self,
+                 proc: subprocess.Popen,
+                 label: str = None,
+                 persistent: bool = False) -> subprocess.Popen:
+        """
+        Register a process started elsewhere.
+
+        :return: The same Popen object
+        """
+        if not label:
+            args = proc.args if isinstance(proc.args, (list, tuple)) else [
+                proc.args
+            ]
+            label = os.path.basename(str(args[0])) if args else ""
+        with self._lock:
+            self._entries[proc] = {
+                "label": label,
+                "persistent": persistent,
+                "started_at": time.time(),
+                "started": time.monotonic(),
+            }
+        return proc
+
+    def unregister(self, proc: subprocess.Popen) -> None:
+        """Forget a process (after it has finished or been stopped)."""
+        with self._lock:
+            self._entries.pop(proc, None)
+
+    def running(self) -> list:
+        """
+        Return the processes that are still running, oldest first.
+        Finished processes are forgotten.
+
+        :return: List of dicts with pid, label, persistent, started_at (epoch
+            seconds), elapsed (seconds), cpu_seconds and rss_bytes
+        """
+        now = time.monotonic()
+        jobs = []
+        with self._lock:
+            for proc, entry in list(self._entries.items()):
+                if proc.poll() is not None:
+                    del self._entries[proc]
+                    continue
+                jobs.append({
+                    "pid": proc.pid,
+                    "label": entry["label"],
+                    "persistent": entry["persistent"],
+                    "started_at": entry["started_at"],
+                    "elapsed": now - entry["started"],
+                })
+        for job in jobs:
+            job.update(process_usage(job["pid"]))
+        return sorted(jobs, key=lambda job: job["started_at"])
+
+    def terminate_all(self,
+                      include_persistent: bool = True,
+                      timeout: float = 5.0) -> int:
+        """
+        Terminate the registered processes (with their process trees) in
+        parallel, so that stopping many children takes one timeout at most.
+
+        :param include_persistent: Also stop long-lived helpers
+        :param timeout: Timeout in seconds to wait for each termination
+        :return: Number of processes that were terminated
+        """
+        with self._lock:
+            targets = [
+                proc for proc, entry in self._entries.items()
+                if include_persistent or not entry["persistent"]
+            ]
+            for proc in targets:
+                del self._entries[proc]
+        targets = [proc for proc in targets if proc.poll() is None]
+        threads = [
+            threading.Thread(target=terminate_process,
+                             args=(proc, self.logger, timeout),
+                             daemon=True) for proc in targets
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(targets)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""benchmarkのテストコード."""
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmark import (SCENARIOS, PipelineBenchmark, compare_results,
+                       generate_tree)
+
+
+class TestGenerateTree(unittest.TestCase):
+    """合成文書ツリー作成のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def test_all_scenarios(self):
+        """すべてのシナリオでファイルが作成される."""
+        for scenario in SCENARIOS:
+            with self.subTest(scenario=scenario):
+                root = self.temp_path / scenario
+                info = generate_tree(root, scenario, scale=0.02)
+                files = [p for p in root.rglob("*") if p.is_file()]
+                self.assertEqual(info["files"], len(files))
+                self.assertGreater(info["files"], 0)
+
+    def test_same_seed_is_reproducible(self):
+        """同じシードでは同じ内容になる."""
+        first = self.temp_path / "first"
+        second = self.temp_path / "second"
+        generate_tree(first, "small_files", scale=0.01)
+        generate_tree(second, "small_files", scale=0.01)
+        for path in first.rglob("*.md"):
+            self.assertEqual(path.read_bytes(),
+                             (second / path.relative_to(first)).read_bytes())
+
+    def test_unknown_scenario(self):
+        """未知のシナリオはエラーになる."""
+        with self.assertRaises(ValueError):
+            generate_tree(self.temp_path, "unknown")
+
+
+class TestCompareResults(unittest.TestCase):
+    """ベースラインとの比較のテスト."""
+
+    def test_regression_detected(self):
+        """許容範囲を超えて遅くなった計測だけが劣化になる."""
+        baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}}}
+        current = {
+            "results": {
+                "a": {
+                    "median": 1.2
+                },
+                "b": {
+                    "median": 1.5
+                },
+                "c": {
+                    "median": 9.0
+                }
+            }
+        }
+
+        rows = compare_results(current, baseline, tolerance=0.25)
+
+        self.assertEqual([row[0] for row in rows], ["a", "b"])
+        self.assertFalse(rows[0][4])
+        self.assertTrue(rows[1][4])
+
+
+@unittest.skipIf(os.name == "nt", "stand-in tools need a POSIX shell")
+class TestPipelineBenchmark(unittest.TestCase):
+    """代替ツールを使ったベンチマーク実行のテスト."""
+
+    def test_convert_folder_with_stand_in_tools(self):
+        """代替ツールで図を含むフォルダ変換が失敗なく完了する."""
+        saved_path = os.environ["PATH"]
+        saved_java = os.environ.get("JAVA_PATH")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            benchmark = PipelineBenchmark(Path(temp_dir),
+                                          scale=0.05,
+                                          repeat=1,
+                                          jobs=1)
+            try:
+                benchmark.setup_tools()
+                result = benchmark.bench_convert_folder("diagrams")
+            finally:
+                os.environ["PATH"] = saved_path
+                if saved_java is None:
+                    os.environ.pop("JAVA_PATH", None)
+                else:
+                    os.environ["JAVA_PATH"] = saved_java
+
+        self.assertEqual(result["failures"], 0)
+        self.assertEqual(result["files"], 2)
+        self.assertEqual(len(result["runs"]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
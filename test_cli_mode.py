@@ -112,6 +112,49 @@ class TestCliMode(unittest.TestCase):
         self.assertEqual(result, 0)
         mock_service.convert_folder.assert_called_once()
 
+    @patch('main_window.check_pandoc_installed')
+    @patch('main_window.PandocService')
+    def test_cli_mode_jobs_sets_max_workers(self, mock_service_class,
+                                            mock_check_pandoc):
+        """--jobs指定時はmax_workersが上書きされる."""
+        mock_check_pandoc.return_value = True
+        mock_service = Mock()
+        mock_service_class.return_value = mock_service
+        mock_service.convert_folder.return_value = (2, 0, [])
+
+        args = argparse.Namespace(input=str(self.input_folder),
+                                  output=str(self.output_folder),
+                                  format='html',
+                                  profile='default',
+                                  jobs=4)
+
+        result = run_cli_mode(args)
+
+        self.assertEqual(result, 0)
+        self.assertEqual(mock_service.max_workers, 4)
+
+    @patch('main_window.check_pandoc_installed')
+    @patch('main_window.PandocService')
+    def test_cli_mode_timeout_and_interrupt(self, mock_service_class,
+                                            mock_check_pandoc):
+        """--timeout指定時は制限時間が上書きされ、Ctrl+Cで変換を中止する."""
+        mock_check_pandoc.return_value = True
+        mock_service = Mock()
+        mock_service_class.return_value = mock_service
+        mock_service.convert_folder.side_effect = KeyboardInterrupt
+
+        args = argparse.Namespace(input=str(self.input_folder),
+                                  output=str(self.output_folder),
+                                  format='html',
+                                  profile='default',
+                                  timeout=30.0)
+
+        result = run_cli_mode(args)
+
+        self.assertEqual(result, 130)
+        self.assertEqual(mock_service.pandoc_timeout, 30.0)
+        mock_service.stop_plantuml_daemon.assert_called_once()
+
     @patch('main_window.check_pandoc_installed')
     @patch('main_window.PandocService')
     def test_cli_mode_folder_conversion_partial_failure(self,
@@ -222,6 +265,82 @@ class TestCliMode(unittest.TestCase):
                 # output_formatが正しく設定されたか確認
                 self.assertEqual(mock_service.output_format, fmt)
 
+    @patch('main_window.check_pandoc_installed')
+    @patch('main_window.PandocService')
+    def test_cli_mode_multiple_formats(self, mock_service_class,
+                                       mock_check_pandoc):
+        """カンマ区切りの形式指定で一括出力するテスト."""
+        mock_check_pandoc.return_value = True
+        mock_service = Mock()
+        mock_service_class.return_value = mock_service
+        mock_service.convert_file_formats.return_value = {
+            'html': (True, "", "", 0),
+            'pdf': (True, "", "", 0)
+        }
+
+        args = argparse.Namespace(input=str(self.input_file),
+                                  output=str(self.output_file),
+                                  format='html,pdf',
+                                  profile='default')
+
+        result = run_cli_mode(args)
+
+        self.assertEqual(result, 0)
+        mock_service.convert_file.assert_not_called()
+        outputs = mock_service.convert_file_formats.call_args[0][1]
+        self.assertEqual(outputs, {
+            'html': self.temp_path / "test_output.html",
+            'pdf': self.temp_path / "test_output.pdf"
+        })
+
+    @patch('main_window.check_pandoc_installed')
+    def test_cli_mode_invalid_format(self, mock_check_pandoc):
+        """未対応の形式が含まれる場合はエラーになるテスト."""
+        mock_check_pandoc.return_value = True
+
+        args = argparse.Namespace(input=str(self.input_file),
+                                  output=str(self.output_file),
+                                  format='html,rtf',
+                                  profile='default')
+
+        result = run_cli_mode(args)
+
+        self.assertEqual(result, 1)
+
+    @patch('main_window.check_pandoc_installed')
+    @patch('main_window.PandocService')
+    def test_cli_mode_watch(self, mock_service_class, mock_check_pandoc):
+        """--watch指定時は変換後に監視し、Ctrl+Cで終了するテスト."""
+        mock_check_pandoc.return_value = True
+        mock_service = Mock()
+        mock_service_class.return_value = mock_service
+        mock_service.convert_folder.return_value = (2, 0, [])
+        watcher = Mock()
+        watcher.is_alive.return_value = True
+        watcher.join.side_effect = KeyboardInterrupt
+        mock_service.create_folder_watcher.return_value = watcher
+
+        args = argparse.Namespace(input=str(self.input_folder),
+                                  output=str(self.output_folder),
+                                  format='html',
+                                  profile='default',
+                                  watch=True)
+
+        result = run_cli_mode(args)
+
+        self.assertEqual(result, 0)
+        mock_service.convert_folder.assert_called_once()
+        watcher.start.assert_called_once()
+        watcher.stop.assert_called_once()
+
+        # 変更通知では変更されたファイルだけを変換する
+        on_change = mock_service.create_folder_watcher.call_args[0][2]
+        mock_service.convert_changed_files.return_value = (1, 0, [])
+        changed = [self.input_folder / "doc1.md"]
+        on_change(changed)
+        call_args = mock_service.convert_changed_files.call_args[0]
+        self.assertEqual(call_args[3], changed)
+
     @patch('main_window.check_pandoc_installed')
     @patch('main_window.PandocService')
     def test_cli_mode_custom_profile(self, mock_service_class,
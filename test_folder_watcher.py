@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""folder_watcherのテストコード."""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from folder_watcher import FolderWatcher, InotifyBackend, PollingBackend
+
+
+class WatcherTestMixin:
+    """監視方法ごとに共通のテスト."""
+
+    backend = None
+
+    def setUp(self):
+        """テストの初期化."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        (self.root / "doc.md").write_text("# Doc", encoding="utf-8")
+        (self.root / "ignored").mkdir()
+        self.batches = []
+        self.received = threading.Event()
+        self.watcher = None
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        if self.watcher:
+            self.watcher.stop()
+        self.temp_dir.cleanup()
+
+    def _callback(self, changed):
+        """通知された変更を記録する."""
+        self.batches.append(changed)
+        self.received.set()
+
+    def _start(self, debounce_sec=0.2):
+        """監視を開始する."""
+        self.watcher = FolderWatcher(
+            self.root,
+            self._callback,
+            lambda relative_path: relative_path.parts[0] == "ignored",
+            debounce_sec=debounce_sec,
+            poll_interval_sec=0.1,
+            backend=self.backend)
+        self.watcher.start()
+        self.assertEqual(self.watcher.backend_name, self.backend)
+
+    def _wait(self):
+        """次の通知を待って返す."""
+        self.assertTrue(self.received.wait(5), "no change reported")
+        self.received.clear()
+        return self.batches[-1]
+
+    def test_modified_file_is_reported(self):
+        """更新したファイルが通知される."""
+        self._start()
+        time.sleep(0.05)
+        (self.root / "doc.md").write_text("# Changed", encoding="utf-8")
+
+        self.assertEqual(self._wait(), [self.root / "doc.md"])
+
+    def test_burst_is_debounced(self):
+        """短時間に続く保存は1回の通知にまとめられる."""
+        self._start(debounce_sec=0.5)
+        time.sleep(0.05)
+        for i in range(5):
+            (self.root / f"new{i}.md").write_text(f"# {i}", encoding="utf-8")
+            time.sleep(0.02)
+
+        changed = self._wait()
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(changed,
+                         sorted(self.root / f"new{i}.md" for i in range(5)))
+
+    def test_ignored_and_deleted_files(self):
+        """無視対象は通知されず、削除は通知される."""
+        self._start()
+        time.sleep(0.05)
+        (self.root / "ignored" / "skip.md").write_text("x", encoding="utf-8")
+        (self.root / "doc.md").unlink()
+
+        self.assertEqual(self._wait(), [self.root / "doc.md"])
+
+    def test_files_in_new_folder(self):
+        """新しく作られたフォルダ内のファイルも通知される."""
+        self._start()
+        time.sleep(0.05)
+        sub = self.root / "sub" / "deeper"
+        sub.mkdir(parents=True)
+        (sub / "page.md").write_text("# Page", encoding="utf-8")
+
+        changed = set()
+        while sub / "page.md" not in changed:
+            changed.update(self._wait())
+        self.assertTrue(all("ignored" not in p.parts for p in changed))
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+class TestInotifyWatcher(WatcherTestMixin, unittest.TestCase):
+    """inotify による監視のテスト."""
+
+    backend = "inotify"
+
+
+class TestPollingWatcher(WatcherTestMixin, unittest.TestCase):
+    """ポーリングによる監視のテスト."""
+
+    backend = "polling"
+
+
+class TestBackends(unittest.TestCase):
+    """監視方法の個別のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def test_polling_detects_size_change(self):
+        """更新日時が同じでもサイズが変われば変更とみなす."""
+        path = self.root / "doc.md"
+        path.write_text("a", encoding="utf-8")
+        backend = PollingBackend(self.root, interval_sec=0)
+        stat = path.stat()
+        path.write_text("abc", encoding="utf-8")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.assertEqual(backend.read_changes(0), {path})
+        self.assertEqual(backend.read_changes(0), set())
+
+    @unittest.skipUnless(sys.platform.startswith("linux"),
+                         "inotify is Linux only")
+    def test_inotify_close(self):
+        """close で監視がすべて解除される."""
+        (self.root / "sub").mkdir()
+        backend = InotifyBackend(self.root)
+        self.assertEqual(len(backend.watches), 2)
+
+        backend.close()
+
+        self.assertEqual(backend.fd, -1)
+        self.assertEqual(backend.watches, {})
+
+    def test_callback_error_does_not_stop_watching(self):
+        """コールバックが例外を出しても監視は続く."""
+        calls = []
+        received = threading.Event()
+
+        def callback(changed):
+            calls.append(changed)
+            received.set()
+            raise RuntimeError("boom")
+
+        watcher = FolderWatcher(self.root,
+                                callback,
+                                debounce_sec=0.05,
+                                poll_interval_sec=0.05,
+                                backend="polling")
+        watcher.start()
+        try:
+            (self.root / "a.md").write_text("a", encoding="utf-8")
+            self.assertTrue(received.wait(5))
+            received.clear()
+            (self.root / "b.md").write_text("b", encoding="utf-8")
+            self.assertTrue(received.wait(5))
+            self.assertTrue(watcher.is_alive())
+        finally:
+            watcher.stop()
+        self.assertFalse(watcher.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """ログウィンドウのテストコード."""
 import logging
+import threading
 import unittest
 from unittest.mock import MagicMock, Mock, patch
 
@@ -10,25 +11,91 @@ from log_window import LogWindow, TextHandler
 class TestTextHandler(unittest.TestCase):
     """TextHandlerクラスのテスト."""
 
+    def _record(self, msg):
+        """テスト用のログレコードを作成する."""
+        return logging.LogRecord(name="test",
+                                 level=logging.INFO,
+                                 pathname="",
+                                 lineno=0,
+                                 msg=msg,
+                                 args=(),
+                                 exc_info=None)
+
+    def _handler(self, widget, max_lines=100):
+        """テスト用のハンドラーを作成する."""
+        widget.index.return_value = "1.0"
+        handler = TextHandler(widget, max_lines=max_lines)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        return handler
+
     def test_emit(self):
         """ログメッセージの出力テスト."""
         widget = MagicMock()  # Mock → MagicMock
-        handler = TextHandler(widget)
-        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler = self._handler(widget)
 
-        record = logging.LogRecord(name="test",
-                                   level=logging.INFO,
-                                   pathname="",
-                                   lineno=0,
-                                   msg="Test message",
-                                   args=(),
-                                   exc_info=None)
+        handler.emit(self._record("Test message"))
+        # emit はキューに積むだけでウィジェットには触れない
+        widget.insert.assert_not_called()
 
-        handler.emit(record)
+        handler.flush_queue()
 
-        widget.insert.assert_called_once()
+        widget.insert.assert_called_once_with("end", "Test message\n")
         widget.see.assert_called_once()
 
+    def test_flush_batches_records(self):
+        """複数のレコードを1回の書き込みにまとめる."""
+        widget = MagicMock()
+        handler = self._handler(widget)
+
+        threads = [
+            threading.Thread(target=handler.emit,
+                             args=(self._record(f"line {i}"),))
+            for i in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        handler.flush_queue()
+
+        widget.insert.assert_called_once()
+        self.assertEqual(widget.insert.call_args[0][1].count("\n"), 3)
+        # 次回の書き込みを予約する（初期化時と flush 後）
+        self.assertEqual(widget.after.call_count, 2)
+
+    def test_flush_keeps_only_max_lines(self):
+        """上限を超える未書き込みのレコードは古いものから捨てる."""
+        widget = MagicMock()
+        handler = self._handler(widget, max_lines=2)
+
+        for msg in ("a", "b", "c"):
+            handler.emit(self._record(msg))
+        handler.flush_queue()
+
+        widget.insert.assert_called_once_with("end", "b\nc\n")
+
+    def test_trim_old_lines(self):
+        """最大行数を超えた古い行を削除する."""
+        widget = MagicMock()
+        handler = self._handler(widget, max_lines=100)
+        widget.index.return_value = "151.0"
+
+        handler.emit(self._record("new"))
+        handler.flush_queue()
+
+        widget.delete.assert_called_once_with("1.0", "51.0")
+
+    def test_close_cancels_timer(self):
+        """close でタイマーを停止し、以後は予約しない."""
+        widget = MagicMock()
+        handler = self._handler(widget)
+
+        handler.close()
+        handler.flush_queue()
+
+        widget.after_cancel.assert_called_once()
+        self.assertEqual(widget.after.call_count, 1)
+
 
 class TestLogWindow(unittest.TestCase):
     """LogWindowクラスのテスト."""
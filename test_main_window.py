@@ -210,8 +210,6 @@ class TestMainWindow(unittest.TestCase):
         self.window.input_type_var = Mock()
         self.window.format_var = Mock()
         self.window.profile_var = Mock()
-        self.window.proc_lock = MagicMock()
-        self.window.current_proc = None
         # StringVarのモックを追加
         self.window.java_path_var = Mock()
         self.window.java_path_var.get = Mock(return_value="")
@@ -372,14 +370,14 @@ class TestMainWindow(unittest.TestCase):
                 encoding='utf-8')
             second_html.write_text("<html><body>No diagram</body></html>",
                                    encoding='utf-8')
-            open_html_with_server = Mock()
-            setattr(self.window, '_open_html_with_server',
-                    open_html_with_server)
+            renderer = Mock(return_value=1)
+            self.window.pandoc_service.render_htmls_in_background_browser = (
+                renderer)
 
             getattr(self.window,
                     '_open_mermaid_htmls_in_folder_with_server')(output_folder)
 
-        open_html_with_server.assert_called_once_with(first_html)
+        renderer.assert_called_once_with([first_html])
 
     def test_should_exclude_pattern_matching(self):
         """除外パターンのマッチングテスト."""
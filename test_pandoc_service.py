@@ -1,18 +1,27 @@
 # -*- coding: utf-8 -*-
 """PandocServiceのテストコード."""
+import gzip
+import http.client
+import http.server
+import io
 import json
 import logging
+import os
+import sys
 import tempfile
+import threading
 import time
 import unittest
 from pathlib import Path
-from unittest.mock import patch
-from urllib.error import URLError
+from unittest.mock import MagicMock, patch
+from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
-from pandoc_service import (PandocService, check_pandoc_installed, get_app_dir,
-                            get_data_dir, get_default_data_dir,
-                            get_settings_file)
+from pandoc_service import (BUILD_MANIFEST_NAME, PLANTUML_SCAN_CHUNK,
+                            PandocService,
+                            check_pandoc_installed, get_app_dir, get_data_dir,
+                            get_default_data_dir, get_settings_file,
+                            split_output_formats, split_timing_events)
 
 
 class TestPandocServiceMermaidMode(unittest.TestCase):
@@ -226,12 +235,19 @@ class TestPandocServiceLocalServer(unittest.TestCase):
             port1 = self.service.start_local_server(path1)
             self.assertIsNotNone(port1)
 
-            # 2番目のサーバを起動（自動的に最初のサーバが停止される）
+            # 2番目のディレクトリで起動（サーバは再利用され、別IDのルートになる）
             port2 = self.service.start_local_server(path2)
-            self.assertIsNotNone(port2)
-
-            # 出力ディレクトリが更新されている
-            self.assertEqual(self.service.output_dir, path2.resolve())
+            self.assertEqual(port2, port1)
+
+            # 最初のルートは切り替わらず、両方のルートを配信できる
+            self.assertEqual(self.service.output_dir, path1.resolve())
+            (path1 / "one.html").write_text("One", encoding='utf-8')
+            (path2 / "two.html").write_text("Two", encoding='utf-8')
+            for html_file, text in ((path1 / "one.html", "One"),
+                                    (path2 / "two.html", "Two")):
+                url = self.service.get_local_server_url(html_file)
+                with urlopen(url, timeout=2) as response:
+                    self.assertEqual(response.read().decode('utf-8'), text)
 
     def test_prepare_browser_mode_server_returns_url(self):
         """browserモード用サーバを起動してHTMLのURLを返せる."""
@@ -255,9 +271,249 @@ class TestPandocServiceLocalServer(unittest.TestCase):
                 content = response.read().decode('utf-8')
             self.assertIn("Test", content)
 
+    def _post_save_html(self, port, filename):
+        """save-htmlエンドポイントにHTMLをPOSTする."""
+        payload = {'html': '<html><svg/></html>', 'filename': filename}
+        req = Request(f"http://127.0.0.1:{port}/save-html",
+                      data=json.dumps(payload).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'})
+        with urlopen(req, timeout=2) as response:
+            self.assertEqual(response.status, 200)
+
+    def test_server_save_html_relative_path(self):
+        """save-htmlはルート配下のサブフォルダのHTMLを保存できる."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            temp_path = Path(tmpdir)
+            (temp_path / "sub").mkdir()
+            port = self.service.start_local_server(temp_path)
+
+            self._post_save_html(port, "sub/page.html")
+
+            self.assertTrue((temp_path / "sub" / "page.html").exists())
+
+    def test_server_save_html_rejects_outside_root(self):
+        """ルート外を指すファイル名はルート直下に保存される."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            temp_path = Path(tmpdir) / "root"
+            port = self.service.start_local_server(temp_path)
+
+            self._post_save_html(port, "../escape.html")
+
+            self.assertFalse((Path(tmpdir) / "escape.html").exists())
+            self.assertTrue((temp_path / "escape.html").exists())
+
+    def test_server_save_html_to_additional_root(self):
+        """追加ルート上のHTMLは、そのルート配下に保存される."""
+        with tempfile.TemporaryDirectory() as tmpdir1, \
+             tempfile.TemporaryDirectory() as tmpdir2:
+            port = self.service.start_local_server(Path(tmpdir1))
+            self.service.start_local_server(Path(tmpdir2))
+            url = self.service.get_local_server_url(Path(tmpdir2) / "p.html")
+            filename = url.split(f":{port}/", 1)[1]
+
+            self._post_save_html(port, filename)
+            self._post_save_html(port, filename.rsplit("/", 1)[0]
+                                 + "/../../escape.html")
+
+            self.assertTrue((Path(tmpdir2) / "p.html").exists())
+            self.assertTrue((Path(tmpdir2) / "escape.html").exists())
+            self.assertFalse((Path(tmpdir1) / "p.html").exists())
+
+    def test_server_save_svg_stays_inside_root(self):
+        """save-svgはルート外を指すファイル名をルート直下に保存する."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            temp_path = Path(tmpdir) / "root"
+            port = self.service.start_local_server(temp_path)
+            payload = {'svg': '<svg/>', 'filename': '../escape.svg'}
+            req = Request(f"http://127.0.0.1:{port}/save-svg",
+                          data=json.dumps(payload).encode('utf-8'),
+                          headers={'Content-Type': 'application/json'})
+            with urlopen(req, timeout=2) as response:
+                self.assertEqual(response.status, 200)
+
+            self.assertFalse((Path(tmpdir) / "escape.svg").exists())
+            self.assertTrue((temp_path / "escape.svg").exists())
+
+
+    def test_save_html_wakes_waiter(self):
+        """save-htmlの保存完了でポーリングせずに待機が解除される."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            temp_path = Path(tmpdir)
+            html_file = temp_path / "page.html"
+            html_file.write_text('<pre class="mermaid">graph TD</pre>',
+                                 encoding='utf-8')
+            port = self.service.start_local_server(temp_path)
+            saved_event = getattr(self.service,
+                                  '_expect_html_save')(html_file)
+            timer = threading.Timer(0.2, self._post_save_html,
+                                    (port, "page.html"))
+            timer.start()
 
-class TestMetadataFileCreation(unittest.TestCase):
-    """メタデータファイル作成のテスト."""
+            started = time.time()
+            finalized = getattr(self.service, '_wait_for_mermaid_finalized')(
+                html_file, 10, saved_event)
+            timer.join()
+
+            self.assertTrue(finalized)
+            self.assertLess(time.time() - started, 5)
+            self.assertEqual(getattr(self.service, '_html_save_events'), {})
+
+
+    def test_keep_alive_does_not_block_other_clients(self):
+        """keep-alive接続を保持したままでも他の接続に応答できる."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            temp_path = Path(tmpdir)
+            (temp_path / "a.html").write_text("A", encoding='utf-8')
+            port = self.service.start_local_server(temp_path)
+
+            first = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            second = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            try:
+                for _ in range(2):
+                    first.request("GET", "/a.html")
+                    response = first.getresponse()
+                    self.assertEqual(response.read(), b"A")
+                second.request("GET", "/a.html")
+                self.assertEqual(second.getresponse().read(), b"A")
+            finally:
+                first.close()
+                second.close()
+
+    def test_keep_alive_responses_are_not_delayed(self):
+        """keep-alive接続での連続した要求が応答ごとに待たされない."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "page.html").write_text("x" * 4000,
+                                                    encoding='utf-8')
+            port = self.service.start_local_server(Path(tmpdir))
+            connection = http.client.HTTPConnection("127.0.0.1", port,
+                                                    timeout=2)
+            started = time.monotonic()
+            try:
+                for _ in range(20):
+                    connection.request("GET", "/page.html")
+                    response = connection.getresponse()
+                    self.assertEqual(len(response.read()), 4000)
+            finally:
+                connection.close()
+
+        # Nagle と遅延ACKが重なると1要求あたり約40ms待たされる
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_serves_additional_roots(self):
+        """追加ルートのファイルも同じサーバから配信できる."""
+        with tempfile.TemporaryDirectory() as tmpdir1, \
+             tempfile.TemporaryDirectory() as tmpdir2:
+            extra_file = Path(tmpdir2) / "extra.html"
+            extra_file.write_text("Extra", encoding='utf-8')
+            port = self.service.start_local_server(Path(tmpdir1))
+
+            prefix = self.service.add_local_server_root(Path(tmpdir2))
+            url = self.service.get_local_server_url(extra_file)
+
+            self.assertEqual(url,
+                             f"http://127.0.0.1:{port}{prefix}extra.html")
+            with urlopen(url, timeout=2) as response:
+                self.assertEqual(response.read().decode('utf-8'), "Extra")
+
+
+    def test_mermaid_asset_is_cached_with_etag(self):
+        """mermaid.min.jsはメモリから配信され、ETagで304を返す."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            asset_file = Path(tmpdir) / "mermaid.min.js"
+            asset_file.write_text("var mermaid = {};" * 100, encoding='utf-8')
+            port = self.service.start_local_server(Path(tmpdir))
+            url = f"http://127.0.0.1:{port}/mermaid/mermaid.min.js"
+
+            with patch.object(self.service, 'get_mermaid_browser_asset_path',
+                              return_value=asset_file) as mock_path:
+                req = Request(url, headers={'Accept-Encoding': 'gzip'})
+                with urlopen(req, timeout=2) as response:
+                    etag = response.headers['ETag']
+                    self.assertEqual(response.headers['Content-Encoding'],
+                                     'gzip')
+                    self.assertIn('max-age', response.headers['Cache-Control'])
+                    self.assertEqual(gzip.decompress(response.read()),
+                                     asset_file.read_bytes())
+
+                req = Request(url, headers={'If-None-Match': etag})
+                with self.assertRaises(HTTPError) as ctx:
+                    urlopen(req, timeout=2)
+                self.assertEqual(ctx.exception.code, 304)
+
+            mock_path.assert_called_once()
+
+
+class TestBatchBrowserFinalization(unittest.TestCase):
+    """headlessブラウザによる一括最終化のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.service.output_format = "html"
+        self.service.mermaid_mode = "browser"
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        (root / "sub").mkdir()
+        self.html_files = [root / "a.html", root / "sub" / "b.html"]
+        for html_file in self.html_files:
+            html_file.write_text('<pre class="mermaid">graph TD</pre>',
+                                 encoding='utf-8')
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.service.stop_local_server()
+        self.temp_dir.cleanup()
+
+    @patch('pandoc_service.terminate_process')
+    @patch('pandoc_service.urlopen')
+    def test_single_browser_serves_all_files(self, mock_urlopen,
+                                             _mock_terminate):
+        """1つのブラウザで全ファイルをタブとして開く."""
+        response = MagicMock()
+        response.read.return_value = b'{"id": "T1"}'
+        mock_urlopen.return_value.__enter__.return_value = response
+        launch = MagicMock(return_value=(MagicMock(), 9222))
+
+        with patch.object(self.service, '_find_headless_browser_executable',
+                          return_value=Path("chrome")), \
+             patch.object(self.service, '_launch_devtools_browser', launch), \
+             patch.object(self.service, '_wait_for_mermaid_finalized',
+                          return_value=True):
+            finalized = self.service.render_htmls_in_background_browser(
+                self.html_files)
+
+        self.assertEqual(finalized, 2)
+        launch.assert_called_once()
+        opened = [
+            call.args[0].full_url for call in mock_urlopen.call_args_list
+            if isinstance(call.args[0], Request)
+        ]
+        self.assertEqual(len(opened), 2)
+        self.assertTrue(any(url.endswith("/sub/b.html") for url in opened))
+
+    def test_falls_back_per_file_without_devtools(self):
+        """DevToolsを起動できない場合はファイルごとに最終化する."""
+        with patch.object(self.service, '_find_headless_browser_executable',
+                          return_value=Path("chrome")), \
+             patch.object(self.service, '_launch_devtools_browser',
+                          return_value=(None, None)), \
+             patch.object(self.service, 'render_html_in_background_browser',
+                          return_value=True) as mock_render:
+            finalized = self.service.render_htmls_in_background_browser(
+                self.html_files)
+
+        self.assertEqual(finalized, 2)
+        self.assertEqual(mock_render.call_count, 2)
+
+
+def metadata_dict(args: list) -> dict:
+    """-M key=value 形式の引数リストを辞書に変換する."""
+    return dict(arg.split("=", 1) for arg in args[1::2])
+
+
+class TestMetadataArguments(unittest.TestCase):
+    """メタデータ引数作成のテスト."""
 
     def setUp(self):
         """テストの初期化."""
@@ -277,19 +533,10 @@ class TestMetadataFileCreation(unittest.TestCase):
             # Mermaidモードを設定
             self.service.mermaid_mode = "browser"
 
-            # メタデータファイルを作成
-            metadata_file = self.service.create_metadata_file(input_file)
-
-            if metadata_file:
-                # メタデータファイルの内容を確認
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                self.assertIn("mermaid_mode: browser", content)
+            # メタデータ引数を作成
+            args = self.service.build_metadata_args(input_file)
 
-                # クリーンアップ
-                if metadata_file.exists():
-                    metadata_file.unlink()
+            self.assertEqual(metadata_dict(args)["mermaid_mode"], "browser")
 
     def test_metadata_default_mmdc_mode(self):
         """mmdcモード（デフォルト）でメタデータファイルが正しく作成される."""
@@ -304,23 +551,1012 @@ class TestMetadataFileCreation(unittest.TestCase):
             # デフォルト設定（mmdc）
             self.service.mermaid_mode = "mmdc"
 
-            # メタデータファイルを作成
-            metadata_file = self.service.create_metadata_file(input_file)
+            # メタデータ引数を作成
+            args = self.service.build_metadata_args(input_file)
+
+            # -M key=value の組で構成される
+            self.assertEqual(len(args) % 2, 0)
+            self.assertTrue(all(flag == "-M" for flag in args[::2]))
+
+    def test_input_is_passed_untouched(self):
+        """入力ファイルは一時コピーを介さずそのままpandocに渡される."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_file = Path(tmpdir) / "test.md"
+            input_file.write_text("---\ntitle: T\n---\n# Test",
+                                  encoding='utf-8')
+            output_file = Path(tmpdir) / "test.html"
+            self.service.mermaid_mode = "browser"
+
+            args = self.service.build_metadata_args(input_file)
+            cmd = self.service.build_pandoc_command(input_file, output_file,
+                                                    args)
+
+            self.assertEqual(cmd[1], str(input_file))
+            self.assertIn("mermaid_mode=browser", cmd)
+
+
+class TestDiagramCache(unittest.TestCase):
+    """図のSVGキャッシュのテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.temp_dir.name) / "diagrams"
+        self.cache_dir.mkdir()
+        self.service.get_diagram_cache_dir = lambda: self.cache_dir
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def _make_entry(self, name, size, age_days):
+        """指定サイズ・経過日数のキャッシュエントリを作成する."""
+        path = self.cache_dir / name
+        path.write_bytes(b"x" * size)
+        mtime = time.time() - age_days * 86400
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_metadata_includes_cache_settings(self):
+        """キャッシュ有効時はキャッシュディレクトリとレンダラ識別子を渡す."""
+        input_file = Path(self.temp_dir.name) / "test.md"
+        input_file.write_text("# Test", encoding='utf-8')
+        self.service.diagram_cache = True
+
+        metadata = metadata_dict(
+            self.service.build_metadata_args(input_file))
+
+        self.assertIn("diagram_cache_dir", metadata)
+        self.assertIn("mermaid_renderer_version", metadata)
+        self.assertIn("plantuml_renderer_version", metadata)
+
+    def test_metadata_includes_inline_embed(self):
+        """インライン埋め込み指定時はdiagram_embedを渡す."""
+        input_file = Path(self.temp_dir.name) / "test.md"
+        input_file.write_text("# Test", encoding='utf-8')
+        self.service.diagram_embed = "inline"
+
+        metadata = metadata_dict(
+            self.service.build_metadata_args(input_file))
+
+        self.assertEqual(metadata["diagram_embed"], "inline")
+
+    def test_renderer_version_changes_with_server_url(self):
+        """PlantUMLサーバURLが変わるとレンダラ識別子も変わる."""
+        self.service.plantuml_use_server = True
+        self.service.plantuml_server_url = "http://a.example/plantuml"
+        _mermaid, first = self.service.get_diagram_renderer_versions("", "")
+        self.service.plantuml_server_url = "http://b.example/plantuml"
+        _mermaid, second = self.service.get_diagram_renderer_versions("", "")
+        self.assertNotEqual(first, second)
+
+    def test_prune_removes_expired_entries(self):
+        """期限切れのエントリは削除される."""
+        old = self._make_entry("old.svg", 10, age_days=40)
+        new = self._make_entry("new.svg", 10, age_days=1)
+        self.service.diagram_cache_max_age_days = 30
+
+        removed = self.service.prune_diagram_cache(force=True)
+
+        self.assertEqual(removed, 1)
+        self.assertFalse(old.exists())
+        self.assertTrue(new.exists())
+
+    def test_prune_enforces_size_limit_oldest_first(self):
+        """容量超過時は古いエントリから削除される."""
+        oldest = self._make_entry("a.svg", 600 * 1024, age_days=3)
+        middle = self._make_entry("b.svg", 600 * 1024, age_days=2)
+        newest = self._make_entry("c.svg", 600 * 1024, age_days=1)
+        self.service.diagram_cache_max_mb = 1
+
+        self.service.prune_diagram_cache(force=True)
+
+        self.assertFalse(oldest.exists())
+        self.assertFalse(middle.exists())
+        self.assertTrue(newest.exists())
+
+
+class TestPlantUMLDaemon(unittest.TestCase):
+    """常駐PlantUMLサーバのテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.jar = Path(self.temp_dir.name) / "plantuml.jar"
+        self.jar.write_bytes(b"")
 
-            # メタデータファイルが作成される
-            self.assertIsNotNone(metadata_file)
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        with patch('pandoc_service.terminate_process'):
+            self.service.stop_plantuml_daemon()
+        self.temp_dir.cleanup()
+
+    def _fake_proc(self):
+        """稼働中のプロセスを模したモックを返す."""
+        proc = MagicMock()
+        proc.poll.return_value = None
+        proc.pid = 1234
+        return proc
+
+    @patch('pandoc_service.socket.create_connection')
+    @patch('pandoc_service.subprocess.Popen')
+    def test_daemon_is_reused(self, mock_popen, _mock_connect):
+        """稼働中のデーモンは再利用される."""
+        mock_popen.return_value = self._fake_proc()
+
+        first = self.service.start_plantuml_daemon("java", str(self.jar))
+        second = self.service.start_plantuml_daemon("java", str(self.jar))
+
+        self.assertTrue(first.startswith("http://127.0.0.1:"))
+        self.assertEqual(first, second)
+        mock_popen.assert_called_once()
+        self.assertIn("-picoweb:", mock_popen.call_args[0][0][-1])
+
+    @patch('pandoc_service.terminate_process')
+    @patch('pandoc_service.socket.create_connection')
+    @patch('pandoc_service.subprocess.Popen')
+    def test_dead_daemon_is_restarted(self, mock_popen, _mock_connect,
+                                      _mock_terminate):
+        """終了したデーモンは再起動される."""
+        dead = self._fake_proc()
+        mock_popen.side_effect = [dead, self._fake_proc()]
+
+        self.service.start_plantuml_daemon("java", str(self.jar))
+        dead.poll.return_value = 1
+        self.service.start_plantuml_daemon("java", str(self.jar))
+
+        self.assertEqual(mock_popen.call_count, 2)
+
+    def test_metadata_skips_daemon_without_plantuml(self):
+        """PlantUMLを含まない文書ではデーモンを起動しない."""
+        input_file = Path(self.temp_dir.name) / "test.md"
+        input_file.write_text("# Test", encoding='utf-8')
+        self.service.plantuml_jar = str(self.jar)
+
+        with patch.object(self.service,
+                          'start_plantuml_daemon') as mock_start:
+            metadata = metadata_dict(
+                self.service.build_metadata_args(input_file))
+
+        mock_start.assert_not_called()
+        self.assertNotIn("plantuml_daemon_url", metadata)
+
+    def test_metadata_includes_daemon_url(self):
+        """PlantUMLを含む文書ではデーモンのURLを渡す."""
+        input_file = Path(self.temp_dir.name) / "test.md"
+        input_file.write_text("```plantuml\nA -> B\n```\n",
+                              encoding='utf-8')
+        self.service.plantuml_jar = str(self.jar)
+
+        with patch.object(self.service,
+                          'start_plantuml_daemon',
+                          return_value="http://127.0.0.1:1/plantuml"):
+            metadata = metadata_dict(
+                self.service.build_metadata_args(input_file))
+
+        self.assertEqual(metadata["plantuml_daemon_url"],
+                         "http://127.0.0.1:1/plantuml")
 
-            # 内容を確認（mmdcはデフォルトなので明示的に記載されない可能性がある）
-            if metadata_file.exists():
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
+    @unittest.skipUnless(check_pandoc_installed(), "pandoc is not installed")
+    def test_daemon_renders_svg_without_fallback(self):
+        """常駐サーバ（picoweb）のGET応答からSVGが生成され、JARは使われない."""
+        requests = []
+
+        class PicowebHandler(http.server.BaseHTTPRequestHandler):
+            """picoweb の GET /plantuml/svg/~h<16進> を模したハンドラ."""
+
+            def do_GET(self):  # pylint: disable=C0103
+                """16進で渡された図の内容を含むSVGを返す."""
+                requests.append(self.path)
+                prefix = "/plantuml/svg/~h"
+                if not self.path.startswith(prefix):
+                    self.send_error(404)
+                    return
+                text = bytes.fromhex(self.path[len(prefix):]).decode('utf-8')
+                body = ('<svg xmlns="http://www.w3.org/2000/svg">'
+                        f'<text>daemon:{text.count("->")}</text></svg>'
+                        ).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/svg+xml')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):  # pylint: disable=W0221
+                """ログ出力を抑制."""
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                                 PicowebHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        daemon_url = f"http://127.0.0.1:{server.server_address[1]}/plantuml"
+        input_file = Path(self.temp_dir.name) / "test.md"
+        input_file.write_text("```plantuml\n@startuml\nA -> B\n@enduml\n```\n",
+                              encoding='utf-8')
+        output_file = Path(self.temp_dir.name) / "test.html"
+        self.service.plantuml_jar = str(self.jar)
+        # JAR方式にフォールバックすると失敗するJava
+        self.service.java_path = str(Path(self.temp_dir.name) / "no-java")
+        self.service.enabled_filters = [
+            get_app_dir() / "filters" / "diaglam.lua"
+        ]
+        self.service.diagram_cache = False
+        self.service.ast_cache = False
+        self.service.mermaid_mode = "mmdc"
+        self.service.diagram_embed = "inline"
+
+        try:
+            with patch.object(self.service,
+                              'start_plantuml_daemon',
+                              return_value=daemon_url):
+                success, _, stderr, _ = self.service.convert_file(
+                    input_file, output_file)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertTrue(success, stderr)
+        self.assertEqual(len(requests), 1)
+        self.assertIn("PlantUML rendered by daemon", stderr)
+        self.assertIn("daemon:1", output_file.read_text(encoding='utf-8'))
+
+    def test_mentions_plantuml_across_chunk_boundary(self):
+        """読み込み単位の境界をまたぐPlantUMLブロックも検出する."""
+        input_file = Path(self.temp_dir.name) / "large.md"
+        marker = b"plantuml"
+        input_file.write_bytes(b"x" * (PLANTUML_SCAN_CHUNK - 4) + marker)
+        other_file = Path(self.temp_dir.name) / "other.md"
+        other_file.write_bytes(b"x" * (PLANTUML_SCAN_CHUNK * 2 + 5))
+
+        self.assertTrue(self.service._mentions_plantuml(input_file))
+        self.assertFalse(self.service._mentions_plantuml(other_file))
+
+    def test_folder_conversion_starts_daemon_before_workers(self):
+        """フォルダ変換はワーカーの投入前に常駐サーバを1回だけ起動する."""
+        input_folder = Path(self.temp_dir.name) / "in"
+        input_folder.mkdir()
+        for name in ("a.md", "b.md"):
+            (input_folder / name).write_text("```plantuml\nA -> B\n```\n",
+                                             encoding='utf-8')
+        self.service.plantuml_jar = str(self.jar)
+        self.service.diagram_cache = False
+        calls = []
+
+        def fake_start(*_args, **_kwargs):
+            calls.append(threading.current_thread())
+            return "http://127.0.0.1:1/plantuml"
+
+        with patch.object(self.service, 'start_plantuml_daemon',
+                          side_effect=fake_start), \
+                patch.object(self.service, 'convert_file',
+                             return_value=(True, "", "", 0)):
+            self.service.convert_folder(input_folder,
+                                        Path(self.temp_dir.name) / "out",
+                                        ".html")
+
+        self.assertEqual(calls, [threading.current_thread()])
+
+
+class TestPandocServer(unittest.TestCase):
+    """常駐 pandoc server バックエンドのテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.service.pandoc_server = True
+        self.service.ast_cache = False
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.input_file = self.temp_path / "doc.md"
+        self.input_file.write_text("# Title\n\nBody", encoding="utf-8")
+        self.output_file = self.temp_path / "doc.html"
 
-                # mmdcモードの場合も記載される、または記載されない
-                # （実装に依存するので、ファイルが作成されることだけ確認）
-                self.assertTrue(len(content) >= 0)
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        with patch('pandoc_service.terminate_process'):
+            self.service.stop_pandoc_server()
+        self.temp_dir.cleanup()
+
+    def _fake_response(self, payload: dict):
+        """urlopen の戻り値を模したモックを返す."""
+        response = MagicMock()
+        response.__enter__.return_value.read.return_value = json.dumps(
+            payload).encode("utf-8")
+        return response
+
+    def test_can_use_pandoc_server(self):
+        """フィルタなしのテキスト変換のみサーバを使用する."""
+        self.assertTrue(self.service.can_use_pandoc_server(self.input_file))
+
+        self.service.enabled_filters = [Path("filters/diaglam.lua")]
+        self.assertFalse(self.service.can_use_pandoc_server(self.input_file))
+        self.service.enabled_filters = []
+
+        self.service.output_format = "pdf"
+        self.assertFalse(self.service.can_use_pandoc_server(self.input_file))
+        self.service.output_format = "markdown"
+        self.assertFalse(
+            self.service.can_use_pandoc_server(self.temp_path / "a.html"))
+        self.assertFalse(
+            self.service.can_use_pandoc_server(self.temp_path / "a.docx"))
+
+    def test_embedded_css_uses_subprocess(self):
+        """CSS埋め込み時はサーバを使用しない."""
+        css = self.temp_path / "style.css"
+        css.write_text("body {}", encoding="utf-8")
+        self.service.css_file = css
+        self.service.embed_css = True
+
+        self.assertFalse(self.service.can_use_pandoc_server(self.input_file))
+
+        self.service.embed_css = False
+        self.assertTrue(self.service.can_use_pandoc_server(self.input_file))
+
+    @patch('pandoc_service.urlopen')
+    def test_convert_file_via_server(self, mock_urlopen):
+        """サーバの出力がファイルに書き込まれる."""
+        mock_urlopen.return_value = self._fake_response({
+            "output": "<h1>Title</h1>",
+            "base64": False,
+            "messages": []
+        })
+
+        with patch.object(self.service,
+                          'start_pandoc_server',
+                          return_value="http://127.0.0.1:1/"), \
+                patch.object(self.service, 'execute_pandoc') as mock_exec:
+            result = self.service.convert_file(self.input_file,
+                                               self.output_file)
+
+        self.assertEqual(result[0], True)
+        mock_exec.assert_not_called()
+        self.assertEqual(self.output_file.read_text(encoding="utf-8"),
+                         "<h1>Title</h1>")
+        request = mock_urlopen.call_args[0][0]
+        body = json.loads(request.data.decode("utf-8"))
+        self.assertEqual(body["from"], "markdown")
+        self.assertEqual(body["to"], "html")
+        self.assertTrue(body["standalone"])
+        self.assertEqual(body["html-math-method"], "mathjax")
+
+    @patch('pandoc_service.urlopen')
+    def test_pandoc_error_is_reported(self, mock_urlopen):
+        """pandoc のエラーはサブプロセスへフォールバックせず失敗になる."""
+        mock_urlopen.side_effect = HTTPError("http://127.0.0.1:1/", 500,
+                                             "Internal Server Error", {},
+                                             io.BytesIO(b"Unknown reader"))
+
+        with patch.object(self.service,
+                          'start_pandoc_server',
+                          return_value="http://127.0.0.1:1/"), \
+                patch.object(self.service, 'execute_pandoc') as mock_exec:
+            result = self.service.convert_file(self.input_file,
+                                               self.output_file)
+
+        self.assertEqual(result, (False, "", "Unknown reader", 1))
+        mock_exec.assert_not_called()
+
+    @patch('pandoc_service.urlopen')
+    def test_connection_error_falls_back(self, mock_urlopen):
+        """サーバへ接続できない場合はサブプロセスで変換する."""
+        mock_urlopen.side_effect = URLError("connection refused")
+
+        with patch.object(self.service,
+                          'start_pandoc_server',
+                          return_value="http://127.0.0.1:1/"), \
+                patch.object(self.service, 'execute_pandoc',
+                             return_value=(True, "", "", 0)) as mock_exec:
+            result = self.service.convert_file(self.input_file,
+                                               self.output_file)
+
+        self.assertEqual(result, (True, "", "", 0))
+        mock_exec.assert_called_once()
+
+    def test_filters_use_subprocess(self):
+        """Luaフィルタ使用時はサーバを起動しない."""
+        self.service.enabled_filters = [Path("filters/diaglam.lua")]
+
+        with patch.object(self.service, 'start_pandoc_server') as mock_start, \
+                patch.object(self.service, 'execute_pandoc',
+                             return_value=(True, "", "", 0)) as mock_exec:
+            self.service.convert_file(self.input_file, self.output_file)
+
+        mock_start.assert_not_called()
+        mock_exec.assert_called_once()
+
+    @patch('pandoc_service.subprocess.Popen')
+    def test_unavailable_server_is_not_retried(self, mock_popen):
+        """起動できなかった場合はセッション中に再試行しない."""
+        mock_popen.side_effect = OSError("not found")
+
+        self.assertIsNone(self.service.start_pandoc_server())
+        self.assertIsNone(self.service.start_pandoc_server())
+
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertEqual(mock_popen.call_args_list[0][0][0][:2],
+                         ["pandoc", "server"])
+
+    @patch('pandoc_service.socket.create_connection')
+    @patch('pandoc_service.subprocess.Popen')
+    def test_server_is_reused(self, mock_popen, _mock_connect):
+        """稼働中のサーバは再利用される."""
+        proc = MagicMock()
+        proc.poll.return_value = None
+        mock_popen.return_value = proc
+
+        first = self.service.start_pandoc_server()
+        second = self.service.start_pandoc_server()
+
+        self.assertTrue(first.startswith("http://127.0.0.1:"))
+        self.assertEqual(first, second)
+        mock_popen.assert_called_once()
+
+
+class TestMultiFormatConversion(unittest.TestCase):
+    """複数形式の一括出力のテスト."""
 
-                # クリーンアップ
-                metadata_file.unlink()
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.service.diagram_cache = False
+        self.service.mermaid_mode = "mmdc"
+        self.service.enabled_filters = [Path("filters/diaglam.lua")]
+        self.service.ast_cache = False
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.input_file = self.temp_path / "doc.md"
+        self.input_file.write_text("# Title", encoding="utf-8")
+        self.outputs = {
+            "html": self.temp_path / "doc.html",
+            "pdf": self.temp_path / "doc.pdf",
+            "docx": self.temp_path / "doc.docx",
+        }
+        self.commands = []
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def _fake_execute(self, cmd, output_file, stage="pandoc"):
+        """実行したコマンドを記録し、出力ファイルを作成する."""
+        self.commands.append(cmd)
+        Path(output_file).write_text("{}", encoding="utf-8")
+        return (True, "", "", 0)
+
+    def test_split_output_formats(self):
+        """カンマ区切りの出力形式を分割する."""
+        self.assertEqual(split_output_formats("html, PDF,docx,html"),
+                         ["html", "pdf", "docx"])
+        self.assertEqual(split_output_formats("markdown"), ["markdown"])
+        with self.assertRaises(ValueError):
+            split_output_formats("html,rtf")
+        with self.assertRaises(ValueError):
+            split_output_formats(",")
+
+    def test_filters_run_once(self):
+        """解析とフィルタは1回だけ実行し、各形式はASTから出力する."""
+        with patch.object(self.service,
+                          'execute_pandoc',
+                          side_effect=self._fake_execute):
+            results = self.service.convert_file_formats(
+                self.input_file, self.outputs)
+
+        self.assertEqual(set(results), {"html", "pdf", "docx"})
+        self.assertTrue(all(result[0] for result in results.values()))
+        self.assertEqual(len(self.commands), 4)
+
+        parse_cmd = self.commands[0]
+        self.assertEqual(parse_cmd[1], str(self.input_file))
+        self.assertEqual(parse_cmd[2:4], ["-t", "json"])
+        self.assertIn("--lua-filter", parse_cmd)
+        self.assertEqual(Path(parse_cmd[5]).name, "doc.json")
+
+        writer_cmds = {cmd[5]: cmd for cmd in self.commands[1:]}
+        self.assertEqual(set(writer_cmds),
+                         {str(path) for path in self.outputs.values()})
+        for cmd in writer_cmds.values():
+            self.assertEqual(cmd[2:4], ["-f", "json"])
+            self.assertNotIn("--lua-filter", cmd)
+        self.assertIn("--mathjax", writer_cmds[str(self.outputs["html"])])
+        self.assertIn("--pdf-engine=lualatex",
+                      writer_cmds[str(self.outputs["pdf"])])
+
+    def test_parse_failure_fails_all_formats(self):
+        """解析に失敗した場合は全形式が失敗になる."""
+        with patch.object(self.service,
+                          'execute_pandoc',
+                          return_value=(False, "", "parse error",
+                                        64)) as mock_exec:
+            results = self.service.convert_file_formats(
+                self.input_file, self.outputs)
+
+        mock_exec.assert_called_once()
+        self.assertEqual(set(results), {"html", "pdf", "docx"})
+        for result in results.values():
+            self.assertEqual(result, (False, "", "parse error", 64))
+
+    def test_binary_input_converts_per_format(self):
+        """DOCX入力は形式ごとに通常の変換を行う."""
+        input_file = self.temp_path / "doc.docx"
+        input_file.write_bytes(b"PK")
+
+        with patch.object(self.service,
+                          'convert_file',
+                          return_value=(True, "", "", 0)) as mock_convert:
+            self.service.convert_file_formats(input_file, self.outputs)
+
+        self.assertEqual(mock_convert.call_count, 3)
+        formats = [
+            call.kwargs["output_format"]
+            for call in mock_convert.call_args_list
+        ]
+        self.assertEqual(formats, ["html", "pdf", "docx"])
+
+    def test_folder_conversion_writes_each_format(self):
+        """フォルダ変換で形式ごとの拡張子で出力する."""
+        input_folder = self.temp_path / "in"
+        output_folder = self.temp_path / "out"
+        (input_folder / "sub").mkdir(parents=True)
+        (input_folder / "a.md").write_text("# A", encoding="utf-8")
+        (input_folder / "sub" / "b.md").write_text("# B", encoding="utf-8")
+        self.service.max_workers = 2
+
+        with patch.object(self.service,
+                          'execute_pandoc',
+                          side_effect=self._fake_execute):
+            success, failed, _errors = self.service.convert_folder(
+                input_folder,
+                output_folder,
+                ".html",
+                output_formats=["html", "markdown"])
+
+        self.assertEqual((success, failed), (2, 0))
+        self.assertEqual(len(self.commands), 6)
+        for name in ("a.html", "a.md", "sub/b.html", "sub/b.md"):
+            self.assertTrue((output_folder / name).exists(), name)
+
+
+class TestAstCache(unittest.TestCase):
+    """フィルタ適用済みASTキャッシュのテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.service.diagram_cache = False
+        self.service.mermaid_mode = "mmdc"
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.cache_dir = self.temp_path / "ast"
+        self.service.get_ast_cache_dir = lambda: self.cache_dir
+        self.filter_file = self.temp_path / "filter.lua"
+        self.filter_file.write_text("return {}", encoding="utf-8")
+        self.service.enabled_filters = [self.filter_file]
+        self.input_file = self.temp_path / "doc.md"
+        self.input_file.write_text("# Title", encoding="utf-8")
+        self.outputs = {
+            "html": self.temp_path / "doc.html",
+            "docx": self.temp_path / "doc.docx",
+        }
+        self.commands = []
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def _fake_execute(self, cmd, output_file, stage="pandoc"):
+        """実行したコマンドを記録し、出力ファイルを作成する."""
+        self.commands.append(cmd)
+        Path(output_file).write_text("{}", encoding="utf-8")
+        return (True, "", "", 0)
+
+    def _convert(self, outputs=None):
+        """複数形式への変換を実行し、実行したコマンドを返す."""
+        self.commands = []
+        with patch.object(self.service,
+                          'execute_pandoc',
+                          side_effect=self._fake_execute):
+            results = self.service.convert_file_formats(
+                self.input_file, outputs or self.outputs, max_writers=1)
+        self.assertTrue(all(result[0] for result in results.values()))
+        return self.commands
+
+    def test_writer_option_change_reuses_ast(self):
+        """CSSや出力形式だけの変更ではASTを再利用する."""
+        first = self._convert()
+        self.assertEqual(len(first), 3)
+        self.assertEqual(first[0][2:4], ["-t", "json"])
+        self.assertEqual(len(list(self.cache_dir.glob("*.json"))), 1)
+
+        css = self.temp_path / "style.css"
+        css.write_text("body {}", encoding="utf-8")
+        self.service.css_file = css
+        second = self._convert({
+            "pdf": self.temp_path / "doc.pdf",
+            "docx": self.temp_path / "doc.docx"
+        })
+
+        self.assertEqual(len(second), 2)
+        self.assertEqual(second[0][2:4], ["-f", "json"])
+        # 既定タイトル用に入力ファイルと同じ名前のASTから出力する
+        self.assertEqual(Path(second[0][1]).name, "doc.json")
+        self.assertIn("--pdf-engine=lualatex", second[0])
+
+    def test_writer_searches_resources_next_to_input(self):
+        """ASTからの出力では画像等を入力ファイルのフォルダからも探す."""
+        commands = self._convert()
+
+        writer = commands[1]
+        resource_path = writer[writer.index("--resource-path") + 1]
+        self.assertEqual(resource_path.split(os.pathsep),
+                         [".", str(self.temp_path.resolve())])
+
+    def _convert_single(self):
+        """1形式の変換を実行し、実行したコマンドを返す."""
+        self.commands = []
+        with patch.object(self.service,
+                          'execute_pandoc',
+                          side_effect=self._fake_execute):
+            result = self.service.convert_file(self.input_file,
+                                               self.outputs["html"])
+        self.assertTrue(result[0])
+        return self.commands
+
+    def test_single_format_rebuild_reuses_ast(self):
+        """1形式の変換でもCSSだけの変更ではフィルタを再実行しない."""
+        first = self._convert_single()
+        self.assertEqual(len(first), 2)
+        self.assertEqual(first[0][2:4], ["-t", "json"])
+
+        css = self.temp_path / "style.css"
+        css.write_text("body {}", encoding="utf-8")
+        self.service.css_file = css
+        second = self._convert_single()
+
+        self.assertEqual(len(second), 1)
+        self.assertEqual(second[0][2:4], ["-f", "json"])
+
+    def test_single_format_without_cache_is_converted_directly(self):
+        """ASTキャッシュが無効なら1形式の変換はpandoc 1回で行う."""
+        self.service.ast_cache = False
+
+        commands = self._convert_single()
+
+        self.assertEqual(len(commands), 1)
+        self.assertEqual(commands[0][1], str(self.input_file))
+        self.assertFalse(self.cache_dir.exists())
+
+    def test_source_change_invalidates_ast(self):
+        """入力内容が変わるとASTを作り直す."""
+        self._convert()
+        self.input_file.write_text("# Changed", encoding="utf-8")
+
+        self.assertEqual(len(self._convert()), 3)
+
+    def test_filter_change_invalidates_ast(self):
+        """フィルタの内容が変わるとASTを作り直す."""
+        self._convert()
+        self.filter_file.write_text("return {{}}", encoding="utf-8")
+
+        self.assertEqual(len(self._convert()), 3)
+
+    def test_daemon_url_is_not_part_of_key(self):
+        """常駐サーバのURLはキャッシュキーに含めない."""
+        args = ["-M", "mermaid_mode=mmdc"]
+        key = self.service.get_ast_cache_key(self.input_file, args)
+        with_daemon = self.service.get_ast_cache_key(
+            self.input_file,
+            args + ["-M", "plantuml_daemon_url=http://127.0.0.1:1/plantuml"])
+        changed = self.service.get_ast_cache_key(self.input_file,
+                                                 ["-M", "mermaid_mode=browser"])
+
+        self.assertEqual(key, with_daemon)
+        self.assertNotEqual(key, changed)
+
+    def test_same_content_in_other_folder_is_not_shared(self):
+        """同じ内容でもフォルダが異なる入力はASTを共有しない."""
+        other_dir = self.temp_path / "other"
+        other_dir.mkdir()
+        other = other_dir / "doc.md"
+        other.write_text("# Title", encoding="utf-8")
+
+        self.assertNotEqual(
+            self.service.get_ast_cache_key(self.input_file, []),
+            self.service.get_ast_cache_key(other, []))
+
+    def test_no_cache_without_filters(self):
+        """フィルタがない場合はASTをキャッシュしない."""
+        self.service.enabled_filters = []
+
+        self._convert()
+        commands = self._convert()
+
+        self.assertEqual(len(commands), 3)
+        self.assertFalse(self.cache_dir.exists())
+
+    def test_prune_removes_expired_entries(self):
+        """期限切れのエントリは削除される."""
+        self.cache_dir.mkdir()
+        old = self.cache_dir / "old.json"
+        new = self.cache_dir / "new.json"
+        for path, age_days in ((old, 40), (new, 1)):
+            path.write_text("{}", encoding="utf-8")
+            mtime = time.time() - age_days * 86400
+            os.utime(path, (mtime, mtime))
+        self.service.ast_cache_max_age_days = 30
+
+        removed = self.service.prune_ast_cache(force=True)
+
+        self.assertEqual(removed, 1)
+        self.assertFalse(old.exists())
+        self.assertTrue(new.exists())
+
+
+class TestTimings(unittest.TestCase):
+    """変換ステージのタイミング記録のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.mark_file = self.temp_path / "timing_mark.lua"
+        self.service.get_timing_mark_filter_path = lambda: self.mark_file
+        self.service.timings = True
+        self.service.timings_file = self.temp_path / "timings.jsonl"
+        self.input_file = self.temp_path / "doc.md"
+        self.input_file.write_text("# Title", encoding="utf-8")
+        self.output_file = self.temp_path / "doc.html"
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def _read_records(self):
+        """書き出されたタイミング記録を読み込む."""
+        with open(self.service.timings_file, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_split_timing_events(self):
+        """イベント行だけが取り出され、残りの標準エラー出力が保たれる."""
+        lines = [(1.0, "warning\n"),
+                 (2.0, '[pandoc-gui-timing] {"mark":true}\n'),
+                 (3.0, "[pandoc-gui-timing] not json\n")]
+
+        text, events = split_timing_events(lines)
+
+        self.assertEqual(text, "warning\n[pandoc-gui-timing] not json\n")
+        self.assertEqual(events, [(2.0, {"mark": True})])
+
+    def test_build_filter_args_interleaves_marker(self):
+        """計測時は各フィルタの前後にマーカーフィルタが入る."""
+        first = self.temp_path / "a.lua"
+        second = self.temp_path / "b.lua"
+        self.service.enabled_filters = [first, second]
+
+        args = self.service.build_filter_args()
+
+        mark = str(self.mark_file)
+        self.assertEqual(args, [
+            "--lua-filter", mark, "--lua-filter",
+            str(first), "--lua-filter", mark, "--lua-filter",
+            str(second), "--lua-filter", mark
+        ])
+        self.assertTrue(self.mark_file.exists())
+
+        self.service.timings = False
+        self.assertEqual(self.service.build_filter_args(),
+                         ["--lua-filter",
+                          str(first), "--lua-filter",
+                          str(second)])
+
+    def test_execute_pandoc_records_stages_and_diagrams(self):
+        """マーカーと図のイベントからステージ別の時間が記録される."""
+        script = ("import sys, time\n"
+                  "p = '[pandoc-gui-timing] '\n"
+                  "def emit(s):\n"
+                  "    sys.stderr.write(s + '\\n'); sys.stderr.flush()\n"
+                  "emit(p + '{\"mark\":true}')\n"
+                  "emit(p + '{\"diagram\":\"mermaid\",\"phase\":\"start\"}')\n"
+                  "time.sleep(0.05)\n"
+                  "emit(p + '{\"diagram\":\"mermaid\",\"phase\":\"end\","
+                  "\"source\":\"cache\"}')\n"
+                  "emit('filter message')\n"
+                  "emit(p + '{\"mark\":true}')\n")
+        mark = str(self.mark_file)
+        cmd = [
+            sys.executable, "-c", script, "--lua-filter", mark,
+            "--lua-filter", "diaglam.lua", "--lua-filter", mark
+        ]
+
+        with self.service._timing_record(self.input_file,
+                                         {"html": self.output_file}) as record:
+            success, _, stderr, _ = self.service.execute_pandoc(
+                cmd, self.output_file)
+
+        self.assertTrue(success)
+        self.assertEqual(stderr, "filter message\n")
+        stages = record["stages"]
+        for name in ("pandoc", "read", "filter:diaglam.lua", "write", "total"):
+            self.assertIn(name, stages)
+        self.assertGreaterEqual(stages["filter:diaglam.lua"], 0.04)
+        self.assertEqual(record["diagrams"]["count"], 1)
+        self.assertIn("mermaid:cache", record["diagrams"]["by_source"])
+
+        records = self._read_records()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["type"], "file")
+        self.assertEqual(records[0]["input"], str(self.input_file))
+        self.assertEqual(records[0]["input_bytes"], 7)
+
+    def test_execute_pandoc_records_given_stage_and_dependencies(self):
+        """ステージ名は呼び出し元が指定し、参照ファイル通知は別の接頭辞で受け取る."""
+        script = ("import sys\n"
+                  "sys.stderr.write('[pandoc-gui-dependency] "
+                  "{\"dependency\":\"img.png\",\"kind\":\"resource\"}\\n')\n")
+        cmd = [sys.executable, "-c", script, "-t", "json"]
+
+        with self.service._timing_record(self.input_file,
+                                         {"html": self.output_file}) as record:
+            with self.service._collect_dependencies() as files:
+                success, _, stderr, _ = self.service.execute_pandoc(
+                    cmd, self.output_file, stage="write:docx")
+
+        self.assertTrue(success)
+        self.assertEqual(stderr, "")
+        self.assertIn("write:docx", record["stages"])
+        self.assertNotIn("parse", record["stages"])
+        self.assertEqual(files,
+                         {("resource", os.path.abspath("img.png"))})
+
+    def test_nested_records_are_written_once(self):
+        """入れ子の変換は外側の記録にまとめて1件だけ書き出す."""
+        outputs = {"html": self.output_file}
+        with self.service._timing_record(self.input_file, outputs) as outer:
+            with self.service._timing_record(self.input_file,
+                                             outputs) as inner:
+                self.assertIs(inner, outer)
+                with self.service._timed_stage("metadata"):
+                    pass
+
+        records = self._read_records()
+        self.assertEqual(len(records), 1)
+        self.assertIn("metadata", records[0]["stages"])
+
+    def test_disabled_timings_write_nothing(self):
+        """計測が無効なら記録は作成されない."""
+        self.service.timings = False
+
+        with self.service._timing_record(self.input_file,
+                                         {"html": self.output_file}) as record:
+            self.assertIsNone(record)
+
+        self.assertFalse(self.service.timings_file.exists())
+
+
+class TestPandocTimeout(unittest.TestCase):
+    """pandoc実行の制限時間と中止のテスト."""
+
+    # 子プロセス（mmdc等の代わり）を起動し、両方とも終了しないコマンド
+    HANGING = [
+        sys.executable, "-c",
+        "import subprocess, sys, time; "
+        "subprocess.Popen([sys.executable, '-c', 'import time; "
+        "time.sleep(60)']); time.sleep(60)"
+    ]
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+
+    def test_timeout_stops_process_tree(self):
+        """制限時間を超えた実行は子プロセスごと終了して失敗を返す."""
+        self.service.pandoc_timeout = 0.5
+        started = time.monotonic()
+
+        success, _stdout, stderr, _code = self.service.execute_pandoc(
+            self.HANGING, Path("out.html"))
+
+        self.assertFalse(success)
+        self.assertIn("Timed out", stderr)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_cancel_stops_running_and_pending_runs(self):
+        """中止要求で実行中の変換が終わり、以降の実行は開始しない."""
+        self.service.pandoc_timeout = 0
+        results = []
+        worker = threading.Thread(target=lambda: results.append(
+            self.service.execute_pandoc(self.HANGING, Path("out.html"))))
+        worker.start()
+        time.sleep(0.3)
+        self.service.cancel()
+        worker.join(5)
+
+        self.assertFalse(worker.is_alive())
+        self.assertFalse(results[0][0])
+        self.assertIn("cancelled", results[0][2])
+        with patch("subprocess.Popen") as mock_popen:
+            self.assertFalse(
+                self.service.execute_pandoc(["pandoc"], Path("out.html"))[0])
+        mock_popen.assert_not_called()
+
+    def test_running_jobs_lists_pandoc(self):
+        """実行中のpandocが一覧に表示され、終了後は消える."""
+        self.service.pandoc_timeout = 0.5
+        worker = threading.Thread(target=self.service.execute_pandoc,
+                                  args=(self.HANGING, Path("out.html")))
+        worker.start()
+        deadline = time.monotonic() + 5
+        jobs = []
+        while not jobs and time.monotonic() < deadline:
+            jobs = self.service.running_jobs()
+            time.sleep(0.05)
+        worker.join(5)
+
+        self.assertEqual(jobs[0]["label"], "pandoc: out.html")
+        self.assertFalse(jobs[0]["persistent"])
+        self.assertEqual(self.service.running_jobs(), [])
+
+    def test_cancel_stops_folder_conversion(self):
+        """中止後のフォルダ変換は新しいファイルの変換を開始せず、次の実行は再開する."""
+        self.service.max_workers = 1
+
+        def cancel_on_convert(*_args, **_kwargs):
+            self.service.cancel()
+            return (True, "", "", 0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_folder = Path(tmpdir) / "in"
+            input_folder.mkdir()
+            for index in range(20):
+                (input_folder / f"{index:02}.md").write_text(
+                    "# A", encoding='utf-8')
+            with patch.object(self.service, "convert_file",
+                              side_effect=cancel_on_convert) as mock_convert:
+                self.service.convert_folder(input_folder,
+                                            Path(tmpdir) / "out", ".html")
+            self.assertLess(mock_convert.call_count, 20)
+            self.assertTrue(self.service.cancel_event.is_set())
+
+            with patch.object(self.service, "convert_file",
+                              return_value=(True, "", "", 0)) as mock_convert:
+                result = self.service.convert_folder(input_folder,
+                                                     Path(tmpdir) / "out",
+                                                     ".html")
+
+        self.assertEqual(result, (20, 0, []))
+        self.assertEqual(mock_convert.call_count, 20)
+
+    def test_server_request_uses_timeout_and_cancel(self):
+        """pandoc serverへの要求は制限時間を使い、中止後は送信しない."""
+        self.service.pandoc_timeout = 0
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_file = Path(tmpdir) / "a.md"
+            input_file.write_text("# A", encoding='utf-8')
+            output_file = Path(tmpdir) / "a.html"
+            with patch.object(self.service, "start_pandoc_server",
+                              return_value="http://127.0.0.1:1"), \
+                    patch("pandoc_service.urlopen",
+                          side_effect=TimeoutError) as mock_urlopen:
+                result = self.service.execute_pandoc_server(
+                    input_file, output_file, "html")
+                self.assertIsNone(mock_urlopen.call_args.kwargs["timeout"])
+                self.assertFalse(result[0])
+                self.assertIn("Timed out", result[2])
+
+                self.service.cancel()
+                result = self.service.execute_pandoc_server(
+                    input_file, output_file, "html")
+
+        self.assertEqual(mock_urlopen.call_count, 1)
+        self.assertIn("cancelled", result[2])
 
 
 class TestBrowserModeConversion(unittest.TestCase):
@@ -368,6 +1604,585 @@ class TestBrowserModeConversion(unittest.TestCase):
                 (output_file.parent / "mermaid" / "mermaid.min.js").exists())
 
 
+class TestFolderConversionParallel(unittest.TestCase):
+    """フォルダ変換のワーカープールのテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+
+    def test_get_max_workers(self):
+        """max_workers未設定時はCPU数、設定時はその値を使う."""
+        self.service.max_workers = None
+        self.assertGreaterEqual(self.service.get_max_workers(), 1)
+        self.service.max_workers = 3
+        self.assertEqual(self.service.get_max_workers(), 3)
+
+    def test_parallel_results_keep_input_order(self):
+        """並列変換でも進捗とエラーは入力順に報告される."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_folder = Path(tmpdir) / "in"
+            output_folder = Path(tmpdir) / "out"
+            input_folder.mkdir()
+            names = [f"doc{i}.md" for i in range(8)]
+            for name in names:
+                (input_folder / name).write_text("# Doc", encoding='utf-8')
+
+            def fake_convert(input_file, _output_file, *_args):
+                # 後ろのファイルほど早く終わるようにする
+                index = int(input_file.stem[3:])
+                time.sleep(0.01 * (8 - index))
+                if index % 3 == 0:
+                    return (False, "", f"error {index}", 1)
+                return (True, "", "", 0)
+
+            progress = []
+            self.service.max_workers = 4
+            with patch.object(self.service,
+                              "convert_file",
+                              side_effect=fake_convert):
+                success, fail, errors = self.service.convert_folder(
+                    input_folder,
+                    output_folder,
+                    ".html",
+                    progress_callback=lambda cur, total, rel: progress.append(
+                        (cur, total, rel)))
+
+        converted = [rel for _cur, _total, rel in progress]
+        self.assertEqual([cur for cur, _total, _rel in progress],
+                         list(range(1, 9)))
+        self.assertEqual(sorted(converted), converted)
+        self.assertEqual((success, fail), (5, 3))
+        self.assertEqual([str(rel) for rel, _err in errors],
+                         ["doc0.md", "doc3.md", "doc6.md"])
+
+    def test_conversion_starts_before_scan_finishes(self):
+        """走査の完了を待たずに最初のファイルの変換が始まる."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_folder = Path(tmpdir) / "in"
+            output_folder = Path(tmpdir) / "out"
+            input_folder.mkdir()
+            started = threading.Event()
+            started_during_scan = []
+
+            def slow_scan(_folder):
+                for index in range(5):
+                    relative = Path(f"doc{index}.md")
+                    (input_folder / relative).write_text("# Doc",
+                                                         encoding='utf-8')
+                    yield relative, None
+                    started_during_scan.append(started.wait(2))
+
+            def fake_convert(*_args):
+                started.set()
+                return (True, "", "", 0)
+
+            progress = []
+            self.service.max_workers = 1
+            with patch.object(self.service, "iter_folder_files",
+                              side_effect=slow_scan), \
+                 patch.object(self.service, "convert_file",
+                              side_effect=fake_convert):
+                success, fail, _errors = self.service.convert_folder(
+                    input_folder,
+                    output_folder,
+                    ".html",
+                    progress_callback=lambda cur, total, rel: progress.append(
+                        (cur, total)))
+
+        self.assertTrue(started_during_scan[0])
+        self.assertEqual((success, fail), (5, 0))
+        totals = [total for _cur, total in progress]
+        self.assertEqual(totals, sorted(totals))
+        self.assertEqual(progress[-1], (5, 5))
+
+
+class TestIncrementalFolderConversion(unittest.TestCase):
+    """インクリメンタルなフォルダ変換のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.service.incremental = True
+        self.service.max_workers = 2
+
+    @staticmethod
+    def fake_convert(_input_file, output_file, *_args):
+        """出力ファイルを作成するだけの変換."""
+        output_file.write_text("<html></html>", encoding='utf-8')
+        return (True, "", "", 0)
+
+    def test_unchanged_files_are_skipped(self):
+        """内容と設定が変わらないファイルは再変換されない."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_folder = Path(tmpdir) / "in"
+            output_folder = Path(tmpdir) / "out"
+            input_folder.mkdir()
+            (input_folder / "a.md").write_text("# A", encoding='utf-8')
+            (input_folder / "b.md").write_text("# B", encoding='utf-8')
+
+            with patch.object(self.service,
+                              "convert_file",
+                              side_effect=self.fake_convert) as mock_convert:
+                result = self.service.convert_folder(input_folder,
+                                                     output_folder, ".html")
+                self.assertEqual(result, (2, 0, []))
+                self.assertEqual(mock_convert.call_count, 2)
+                self.assertTrue(
+                    (output_folder / BUILD_MANIFEST_NAME).exists())
+
+                # 変更なし: 変換は実行されない
+                mock_convert.reset_mock()
+                result = self.service.convert_folder(input_folder,
+                                                     output_folder, ".html")
+                self.assertEqual(result, (2, 0, []))
+                mock_convert.assert_not_called()
+
+                # 1ファイルのみ変更
+                (input_folder / "b.md").write_text("# B2", encoding='utf-8')
+                self.service.convert_folder(input_folder, output_folder,
+                                            ".html")
+                self.assertEqual(mock_convert.call_count, 1)
+                self.assertEqual(mock_convert.call_args[0][0].name, "b.md")
+
+                # 設定変更時は全ファイルを再変換
+                mock_convert.reset_mock()
+                self.service.mermaid_mode = "mmdc"
+                self.service.convert_folder(input_folder, output_folder,
+                                            ".html")
+                self.assertEqual(mock_convert.call_count, 2)
+
+    def test_css_change_rebuilds_only_affected_outputs(self):
+        """CSSの変更ではCSSを取り込む出力だけが再変換される."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_folder = Path(tmpdir) / "in"
+            output_folder = Path(tmpdir) / "out"
+            input_folder.mkdir()
+            (input_folder / "a.md").write_text("# A", encoding='utf-8')
+            css_file = Path(tmpdir) / "style.css"
+            css_file.write_text("body {}", encoding='utf-8')
+            self.service.css_file = css_file
+            self.service.embed_css = True
+
+            def fake_convert_formats(_input_file, outputs, *_args):
+                for path in outputs.values():
+                    path.write_text("output", encoding='utf-8')
+                return {fmt: (True, "", "", 0) for fmt in outputs}
+
+            with patch.object(
+                    self.service,
+                    "convert_file_formats",
+                    side_effect=fake_convert_formats) as mock_convert:
+                self.service.convert_folder(input_folder,
+                                            output_folder,
+                                            ".html",
+                                            output_formats=["html", "docx"])
+                self.assertEqual(set(mock_convert.call_args[0][1]),
+                                 {"html", "docx"})
+
+                mock_convert.reset_mock()
+                css_file.write_text("body { color: red; }", encoding='utf-8')
+                result = self.service.convert_folder(
+                    input_folder,
+                    output_folder,
+                    ".html",
+                    output_formats=["html", "docx"])
+                self.assertEqual(result, (1, 0, []))
+                self.assertEqual(mock_convert.call_count, 1)
+                self.assertEqual(set(mock_convert.call_args[0][1]), {"html"})
+
+                # 再変換しなかった出力の依存関係も引き継がれる
+                mock_convert.reset_mock()
+                self.service.convert_folder(input_folder,
+                                            output_folder,
+                                            ".html",
+                                            output_formats=["html", "docx"])
+                mock_convert.assert_not_called()
+
+    def test_failed_format_keeps_successful_outputs(self):
+        """一部の形式が失敗しても、成功した出力は次回スキップされる."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_folder = Path(tmpdir) / "in"
+            output_folder = Path(tmpdir) / "out"
+            input_folder.mkdir()
+            (input_folder / "a.md").write_text("# A", encoding='utf-8')
+            failing = {"docx"}
+
+            def fake_convert_formats(_input_file, outputs, *_args):
+                results = {}
+                for fmt, path in outputs.items():
+                    if fmt in failing:
+                        results[fmt] = (False, "", "error", 1)
+                        continue
+                    path.write_text("output", encoding='utf-8')
+                    results[fmt] = (True, "", "", 0)
+                return results
+
+            with patch.object(
+                    self.service,
+                    "convert_file_formats",
+                    side_effect=fake_convert_formats) as mock_convert:
+                result = self.service.convert_folder(
+                    input_folder,
+                    output_folder,
+                    ".html",
+                    output_formats=["html", "docx"])
+                self.assertEqual(result[:2], (0, 1))
+
+                failing.clear()
+                mock_convert.reset_mock()
+                self.service.convert_folder(input_folder,
+                                            output_folder,
+                                            ".html",
+                                            output_formats=["html", "docx"])
+                self.assertEqual(set(mock_convert.call_args[0][1]), {"docx"})
+
+    def test_cancelled_run_keeps_previous_records(self):
+        """中止した実行でも、処理しなかった入力の記録は失われない."""
+        self.service.max_workers = 1
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_folder = Path(tmpdir) / "in"
+            output_folder = Path(tmpdir) / "out"
+            input_folder.mkdir()
+            names = [f"{index:02}.md" for index in range(20)]
+            for name in names:
+                (input_folder / name).write_text("# A", encoding='utf-8')
+
+            def cancel_on_convert(*args):
+                self.service.cancel()
+                return self.fake_convert(*args)
+
+            with patch.object(self.service,
+                              "convert_file",
+                              side_effect=self.fake_convert):
+                self.service.convert_folder(input_folder, output_folder,
+                                            ".html")
+            for name in (names[0], names[-1]):
+                (input_folder / name).write_text("# B", encoding='utf-8')
+            with patch.object(self.service,
+                              "convert_file",
+                              side_effect=cancel_on_convert) as mock_convert:
+                self.service.convert_folder(input_folder, output_folder,
+                                            ".html")
+                self.assertEqual(mock_convert.call_count, 1)
+
+            manifest = self.service.load_build_manifest(output_folder)
+            self.assertEqual(sorted(manifest), names)
+
+            # 完走した実行では削除された入力の記録を除く
+            (input_folder / names[1]).unlink()
+            with patch.object(self.service,
+                              "convert_file",
+                              side_effect=self.fake_convert) as mock_convert:
+                self.service.convert_folder(input_folder, output_folder,
+                                            ".html")
+            self.assertEqual(
+                [call[0][0].name for call in mock_convert.call_args_list],
+                [names[-1]])
+            manifest = self.service.load_build_manifest(output_folder)
+            self.assertEqual(sorted(manifest), names[:1] + names[2:])
+
+    def test_referenced_file_and_filter_changes_rebuild(self):
+        """フィルタが通知した参照ファイルや有効なフィルタの変更で再変換される."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_folder = Path(tmpdir) / "in"
+            output_folder = Path(tmpdir) / "out"
+            input_folder.mkdir()
+            (input_folder / "a.md").write_text("![](img.png)",
+                                               encoding='utf-8')
+            (input_folder / "b.md").write_text("# B", encoding='utf-8')
+            image = input_folder / "img.png"
+            image.write_bytes(b"png")
+            lua_filter = Path(tmpdir) / "filter.lua"
+            lua_filter.write_text("-- v1", encoding='utf-8')
+            self.service.enabled_filters = [lua_filter]
+            self.service.output_format = "docx"
+
+            def fake_convert(input_file, output_file, *_args):
+                if input_file.name == "a.md":
+                    self.service._record_dependencies([(0, {
+                        "dependency": str(image),
+                        "kind": "resource"
+                    })])
+                output_file.write_text("output", encoding='utf-8')
+                return (True, "", "", 0)
+
+            with patch.object(self.service,
+                              "convert_file",
+                              side_effect=fake_convert) as mock_convert:
+                self.service.convert_folder(input_folder, output_folder,
+                                            ".docx")
+                self.assertEqual(mock_convert.call_count, 2)
+
+                mock_convert.reset_mock()
+                image.write_bytes(b"png2")
+                self.service.convert_folder(input_folder, output_folder,
+                                            ".docx")
+                self.assertEqual(
+                    [call[0][0].name for call in mock_convert.call_args_list],
+                    ["a.md"])
+
+                mock_convert.reset_mock()
+                lua_filter.write_text("-- v2", encoding='utf-8')
+                self.service.convert_folder(input_folder, output_folder,
+                                            ".docx")
+                self.assertEqual(mock_convert.call_count, 2)
+
+    def test_ast_cache_hit_keeps_dependencies(self):
+        """ASTキャッシュを使った変換でも作成時の参照ファイルが得られる."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            input_file = tmp / "a.md"
+            input_file.write_text("![](img.png)", encoding='utf-8')
+            lua_filter = tmp / "filter.lua"
+            lua_filter.write_text("", encoding='utf-8')
+            image = str(tmp / "img.png")
+            self.service.enabled_filters = [lua_filter]
+            self.service.diagram_cache = False
+            self.service.get_ast_cache_dir = lambda: tmp / "cache"
+            self.service.get_dependency_filter_path = (
+                lambda: tmp / "dependencies.lua")
+
+            def fake_execute(cmd, output_file, stage="pandoc"):
+                if stage == "parse":
+                    # 参照ファイル通知フィルタは利用者のフィルタより前に実行する
+                    self.assertEqual(cmd[cmd.index("--lua-filter") + 1],
+                                     str(tmp / "dependencies.lua"))
+                    self.service._record_dependencies([(0, {
+                        "dependency": image,
+                        "kind": "resource"
+                    })])
+                output_file.write_text("{}", encoding='utf-8')
+                return (True, "", "", 0)
+
+            outputs = {"html": tmp / "a.html", "docx": tmp / "a.docx"}
+            with patch.object(self.service,
+                              "execute_pandoc",
+                              side_effect=fake_execute) as mock_execute:
+                for _ in range(2):
+                    with self.service._collect_dependencies() as files:
+                        self.service.convert_file_formats(input_file, outputs)
+                    self.assertEqual(files, {("resource", image)})
+
+            parses = [
+                call for call in mock_execute.call_args_list
+                if "-t" in call[0][0]
+            ]
+            self.assertEqual(len(parses), 1)
+
+
+class TestExcludeMatcher(unittest.TestCase):
+    """事前コンパイルした除外パターン照合のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+
+    def test_matches_names_components_and_full_path(self):
+        """ファイル名・フォルダ名・パス全体のいずれでも一致する."""
+        self.service.exclude_patterns = ["*.tmp", ".git", "docs/*.md"]
+
+        self.assertTrue(self.service.should_exclude(Path("a/b.tmp")))
+        self.assertTrue(self.service.should_exclude(Path(".git/config")))
+        self.assertTrue(
+            self.service.should_exclude(Path("docs") / "readme.md"))
+        self.assertFalse(self.service.should_exclude(Path("src/readme.md")))
+
+    def test_matcher_is_rebuilt_only_when_patterns_change(self):
+        """パターンが変わらない限り照合器は再利用される."""
+        self.service.exclude_patterns = ["*.tmp"]
+        first = self.service.get_exclude_matcher()
+        self.assertIs(self.service.get_exclude_matcher(), first)
+
+        self.service.exclude_patterns.append("build")
+        second = self.service.get_exclude_matcher()
+
+        self.assertIsNot(second, first)
+        self.assertTrue(self.service.should_exclude(Path("build/out.md")))
+
+
+class TestFolderWalk(unittest.TestCase):
+    """除外フォルダを辿らないフォルダ走査のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        for relative in ("b.md", "a/z.md", "a.md", "node_modules/pkg/x.md",
+                         "docs/tmp.tmp"):
+            path = self.root / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("x", encoding='utf-8')
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def test_excluded_folders_are_not_scanned(self):
+        """除外フォルダは走査されず、結果はパス順に並ぶ."""
+        self.service.exclude_patterns = ["node_modules", "*.tmp"]
+        scanned = []
+        real_scandir = os.scandir
+
+        def recording_scandir(path):
+            scanned.append(Path(path).name)
+            return real_scandir(path)
+
+        with patch('pandoc_service.os.scandir', side_effect=recording_scandir):
+            found = [
+                relative.as_posix()
+                for relative, _entry in self.service.iter_folder_files(
+                    self.root)
+            ]
+
+        self.assertEqual(found, ["a/z.md", "a.md", "b.md"])
+        self.assertNotIn("node_modules", scanned)
+        self.assertNotIn("pkg", scanned)
+
+
+class TestWatchConversion(unittest.TestCase):
+    """監視モードでの変更ファイルの変換のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = Path(self.temp_dir.name) / "docs"
+        self.output_folder = Path(self.temp_dir.name) / "out"
+        (self.input_folder / "sub").mkdir(parents=True)
+        (self.input_folder / "sub" / "page.md").write_text("# Page",
+                                                           encoding="utf-8")
+        (self.input_folder / "draft.md").write_text("# Draft",
+                                                    encoding="utf-8")
+        (self.input_folder / "image.png").write_bytes(b"png")
+        self.service.exclude_patterns = ["draft.md"]
+        self.converted = []
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def _fake_convert(self, input_file, output_file, *_args, **_kwargs):
+        """変換を記録して出力ファイルを作成する."""
+        self.converted.append((input_file, output_file))
+        output_file.write_text("<html></html>", encoding="utf-8")
+        return (True, "", "", 0)
+
+    def test_convert_changed_files(self):
+        """変更されたファイルだけが変換・コピーされる."""
+        changed = [
+            self.input_folder / "sub" / "page.md",
+            self.input_folder / "draft.md",
+            self.input_folder / "image.png",
+            self.input_folder / "deleted.md",
+        ]
+        with patch.object(self.service,
+                          'convert_file',
+                          side_effect=self._fake_convert):
+            result = self.service.convert_changed_files(
+                self.input_folder, self.output_folder, ".html", changed)
+
+        self.assertEqual(result, (1, 0, []))
+        self.assertEqual(self.converted,
+                         [(self.input_folder / "sub" / "page.md",
+                           self.output_folder / "sub" / "page.html")])
+        self.assertTrue((self.output_folder / "image.png").exists())
+        self.assertFalse((self.output_folder / "draft.html").exists())
+
+    def test_watcher_ignores_excluded_and_output_folder(self):
+        """監視は除外パターンと入力内の出力フォルダを無視する."""
+        output_folder = self.input_folder / "build"
+        watcher = self.service.create_folder_watcher(
+            self.input_folder, output_folder, lambda changed: None)
+
+        self.assertTrue(watcher.should_ignore(Path("build") / "page.html"))
+        self.assertTrue(watcher.should_ignore(Path("draft.md")))
+        self.assertFalse(watcher.should_ignore(Path("sub") / "page.md"))
+
+    def test_watcher_for_single_file(self):
+        """ファイル入力では親フォルダのそのファイルだけを監視する."""
+        input_file = self.input_folder / "sub" / "page.md"
+        watcher = self.service.create_folder_watcher(
+            input_file, self.output_folder / "page.html", lambda changed: None)
+
+        self.assertEqual(watcher.root, input_file.parent)
+        self.assertFalse(watcher.should_ignore(Path("page.md")))
+        self.assertTrue(watcher.should_ignore(Path("other.md")))
+
+
+class TestFolderCopyStrategy(unittest.TestCase):
+    """変換対象外ファイルのコピー方式のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.logger = logging.getLogger("test")
+        self.service = PandocService(self.logger)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source = Path(self.temp_dir.name) / "image.png"
+        self.source.write_bytes(b"png" * 100)
+        self.output = Path(self.temp_dir.name) / "out" / "image.png"
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.temp_dir.cleanup()
+
+    def _copy(self):
+        """コピー処理を実行して方法を返す."""
+        return getattr(self.service, '_copy_folder_entry')(
+            self.source, self.output, Path("image.png"))
+
+    def test_unchanged_copy_is_skipped(self):
+        """サイズと更新日時が一致する出力はコピーしない."""
+        self.service.copy_strategy = "skip"
+
+        self.assertEqual(self._copy(), "copy")
+        self.assertEqual(self._copy(), "skipped")
+
+        self.source.write_bytes(b"changed")
+        self.assertEqual(self._copy(), "copy")
+        self.assertEqual(self.output.read_bytes(), b"changed")
+
+    def test_default_strategy_skips_unchanged(self):
+        """既定では未変更のファイルをスキップし、変更時は複製する."""
+        self.assertEqual(self.service.copy_strategy, "reflink")
+
+        self.assertIn(self._copy(), ("reflink", "copy"))
+        self.assertEqual(self._copy(), "skipped")
+
+    def test_copy_strategy_always_copies(self):
+        """copy指定時は未変更でも毎回コピーする."""
+        self.service.copy_strategy = "copy"
+
+        self.assertEqual(self._copy(), "copy")
+        self.assertEqual(self._copy(), "copy")
+
+    def test_hardlink_strategy_links_on_same_filesystem(self):
+        """hardlink指定時は同一ファイルシステム上でリンクを作る."""
+        self.service.copy_strategy = "hardlink"
+
+        method = self._copy()
+
+        self.assertIn(method, ("hardlink", "reflink", "copy"))
+        if method == "hardlink":
+            self.assertTrue(os.path.samefile(self.source, self.output))
+        self.assertEqual(self.output.read_bytes(), self.source.read_bytes())
+        self.assertEqual(list(self.output.parent.glob(".*.tmp")), [])
+
+    def test_reflink_falls_back_to_copy(self):
+        """reflink非対応の場合は通常のコピーになる."""
+        self.service.copy_strategy = "reflink"
+
+        with patch('pandoc_service.reflink_file', return_value=False):
+            self.assertEqual(self._copy(), "copy")
+        self.assertEqual(self.output.read_bytes(), self.source.read_bytes())
+
+
 class TestProfileManagement(unittest.TestCase):
     """プロファイル管理のテスト."""
 
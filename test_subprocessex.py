@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""subprocessexのテストコード."""
+import subprocess
+import sys
+import time
+import unittest
+
+from subprocessex import ProcessRegistry
+
+SLEEP = [sys.executable, "-c", "import time; time.sleep(60)"]
+
+
+class TestProcessRegistry(unittest.TestCase):
+    """子プロセス管理のテスト."""
+
+    def setUp(self):
+        """テストの初期化."""
+        self.registry = ProcessRegistry()
+
+    def tearDown(self):
+        """テストのクリーンアップ."""
+        self.registry.terminate_all(timeout=1.0)
+
+    def test_running_lists_jobs_until_they_finish(self):
+        """実行中のプロセスが起動時刻・使用量付きで列挙され、終了後は消える."""
+        proc = self.registry.popen(SLEEP, label="sleep")
+        quick = self.registry.popen([sys.executable, "-c", "pass"])
+        quick.wait()
+
+        jobs = self.registry.running()
+
+        self.assertEqual([job["pid"] for job in jobs], [proc.pid])
+        self.assertEqual(jobs[0]["label"], "sleep")
+        self.assertGreaterEqual(jobs[0]["elapsed"], 0)
+        self.assertIn("cpu_seconds", jobs[0])
+        self.assertIn("rss_bytes", jobs[0])
+        if sys.platform.startswith("linux"):
+            self.assertGreater(jobs[0]["rss_bytes"], 0)
+
+    def test_terminate_all_keeps_persistent_on_cancel(self):
+        """常駐プロセスを除いて一括終了でき、最後にすべて終了できる."""
+        jobs = [self.registry.popen(SLEEP) for _ in range(3)]
+        server = self.registry.popen(SLEEP, persistent=True)
+        started = time.monotonic()
+
+        self.assertEqual(
+            self.registry.terminate_all(include_persistent=False), 3)
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(all(proc.poll() is not None for proc in jobs))
+        self.assertIsNone(server.poll())
+        self.assertEqual(self.registry.terminate_all(), 1)
+        self.assertIsNotNone(server.wait(5))
+        self.assertEqual(self.registry.running(), [])
+
+    def test_run_timeout_stops_process(self):
+        """run は制限時間を超えるとプロセスを終了させて例外を送出する."""
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self.registry.run(SLEEP, timeout=0.3, capture_output=True)
+        self.assertEqual(self.registry.running(), [])
+
+        result = self.registry.run(
+            [sys.executable, "-c", "print('ok')"],
+            capture_output=True,
+            text=True)
+        self.assertEqual((result.returncode, result.stdout.strip()),
+                         (0, "ok"))
+
+
+if __name__ == '__main__':
+    unittest.main()